@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+NetWatch - IDS engine benchmark
+Times load_rules, match_packet and handle_packet on synthetic traffic as the
+rule count grows, and writes the results as JSON for comparison across versions.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from rich.console import Console
+from rich.table import Table
+from scapy.all import Ether, IP, TCP, UDP, DNS, DNSQR, Raw
+
+import ids_dashboard as ids
+
+console = Console()
+
+BENCHMARK_DIR = "data/benchmarks"
+PAYLOAD_SIZES = (64, 256, 512, 1460, 4096, 9000)  # bytes; 9000 models jumbo frames
+TRAFFIC_MIX = {"http": 0.35, "dns": 0.2, "tls": 0.25, "udp": 0.2}
+
+# ============================
+# Synthetic Traffic
+# ============================
+def pad(payload, size, rng):
+    """Extend a payload with printable filler up to size bytes"""
+    if len(payload) >= size:
+        return payload[:size]
+    return payload + bytes(rng.choice(b"abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(size - len(payload)))
+
+def random_address(rng, prefix):
+    return f"{prefix}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+def make_http(rng, size):
+    path = "/" + "/".join(rng.choice(("index.html", "api", "login.php", "static", "admin", "cgi-bin"))
+                          for _ in range(rng.randint(1, 3)))
+    request = (f"GET {path} HTTP/1.1\r\nHost: www.example{rng.randint(1, 50)}.com\r\n"
+               f"User-Agent: Mozilla/5.0\r\nAccept: */*\r\nX-Filler: ").encode()
+    payload = pad(request, size - 4, rng) + b"\r\n\r\n"
+    return (Ether() / IP(src=random_address(rng, "10.0"), dst=random_address(rng, "192.168")) /
+            TCP(sport=rng.randint(1024, 65535), dport=rng.choice((80, 8080)), flags="PA",
+                seq=rng.randint(0, 1 << 31)) / Raw(payload))
+
+def make_dns(rng, size):
+    labels = ".".join(rng.choice(("www", "mail", "cdn", "api", "update", "login")) for _ in range(rng.randint(1, 3)))
+    query = DNS(rd=1, qd=DNSQR(qname=f"{labels}.example{rng.randint(1, 500)}.com"))
+    return (Ether() / IP(src=random_address(rng, "10.0"), dst="8.8.8.8") /
+            UDP(sport=rng.randint(1024, 65535), dport=53) / query)
+
+def make_tls(rng, size):
+    # TLS 1.2 ClientHello record header followed by opaque handshake bytes
+    hello = (b"\x16\x03\x01" + min(size, 0xFFFF).to_bytes(2, "big") + b"\x01\x00" +
+             bytes(rng.getrandbits(8) for _ in range(32)))
+    return (Ether() / IP(src=random_address(rng, "10.0"), dst=random_address(rng, "172.16")) /
+            TCP(sport=rng.randint(1024, 65535), dport=443, flags="PA", seq=rng.randint(0, 1 << 31)) /
+            Raw(hello + bytes(rng.getrandbits(8) for _ in range(max(0, size - len(hello))))))
+
+def make_udp(rng, size):
+    return (Ether() / IP(src=random_address(rng, "10.0"), dst=random_address(rng, "10.1")) /
+            UDP(sport=rng.randint(1024, 65535), dport=rng.randint(1, 65535)) /
+            Raw(bytes(rng.getrandbits(8) for _ in range(size))))
+
+GENERATORS = {"http": make_http, "dns": make_dns, "tls": make_tls, "udp": make_udp}
+
+def generate_traffic(count, seed=1):
+    """Build count Ethernet frames drawn from TRAFFIC_MIX and PAYLOAD_SIZES"""
+    rng = random.Random(seed)
+    kinds = list(TRAFFIC_MIX)
+    weights = [TRAFFIC_MIX[kind] for kind in kinds]
+    frames = []
+    now = time.time()
+    for i in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        pkt = GENERATORS[kind](rng, rng.choice(PAYLOAD_SIZES))
+        frames.append((kind, bytes(pkt), now + i * 1e-4))
+    return frames
+
+def dissect(frames):
+    """Scapy packets for the frames, timestamped as a capture would be"""
+    packets = []
+    for _, raw, timestamp in frames:
+        pkt = Ether(raw)
+        pkt.time = timestamp
+        packets.append(pkt)
+    return packets
+
+# ============================
+# Measurement
+# ============================
+def reset_engine_state():
+    """Fresh flow, stream, threshold, baseline and top talker state so every run starts cold"""
+    ids.FLOW_TABLE = ids.FlowTable()
+    ids.STREAM_REASSEMBLER = ids.StreamReassembler()
+    ids.FLOW_TABLE.on_evict = ids.STREAM_REASSEMBLER.release
+    ids.THRESHOLD_TABLE = ids.ThresholdTable()
+    ids.CORRELATION = ids.CorrelationEngine()
+    ids.BEHAVIORAL_BASELINE = ids.BehavioralBaseline()
+    ids.TOP_TALKERS_TABLE = ids.TopTalkers()
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def time_packets(function, packets, rules):
+    """Run function(pkt, rules) over every packet; pps, latency percentiles and alerts"""
+    reset_engine_state()
+    latencies = []
+    alerts = 0
+    clock = time.perf_counter_ns
+    started = clock()
+    for pkt in packets:
+        before = clock()
+        result = function(pkt, rules)
+        latencies.append(clock() - before)
+        alerts += len(result or ())
+    total = (clock() - started) / 1e9
+    latencies.sort()
+    return {
+        "packets": len(packets),
+        "seconds": total,
+        "pps": len(packets) / total if total else 0.0,
+        "p50_us": percentile(latencies, 0.50) / 1000,
+        "p99_us": percentile(latencies, 0.99) / 1000,
+        "max_us": latencies[-1] / 1000 if latencies else 0.0,
+        "alerts": alerts,
+    }
+
+def time_load_rules(repeat):
+    """Best wall time of load_rules over repeat runs, and the ruleset it produced"""
+    best = None
+    rules = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rules = ids.load_rules()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rules
+
+def rule_counts(total, start=100):
+    """100, 200, 400, ... doubling up to the full ruleset"""
+    counts = []
+    count = start
+    while count < total:
+        counts.append(count)
+        count *= 2
+    counts.append(total)
+    return counts
+
+def quiet_reporting():
+    """Send alert output to nowhere so handle_packet timing excludes the terminal"""
+    ids.console.file = open(os.devnull, "w")
+    for handler in list(ids.logger.handlers):
+        ids.logger.removeHandler(handler)
+    null_handler = logging.StreamHandler(open(os.devnull, "w"))
+    null_handler.setFormatter(ids.formatter)
+    ids.logger.addHandler(null_handler)
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmark(packet_count, seed, load_repeat, handle_count):
+    console.print("[cyan]Loading rules...[/cyan]")
+    load_seconds, full = time_load_rules(load_repeat)
+    console.print(f"[cyan]Generating {packet_count} packets...[/cyan]")
+    frames = generate_traffic(packet_count, seed)
+    packets = dissect(frames)
+    mix = {kind: sum(1 for frame in frames if frame[0] == kind) for kind in TRAFFIC_MIX}
+    quiet_reporting()
+
+    scaling = []
+    for count in rule_counts(len(full)):
+        rules = ids.RuleSet(full.rules[:count])
+        row = {"rules": count, "match_packet": time_packets(ids.match_packet, packets, rules)}
+        if handle_count:
+            row["handle_packet"] = time_packets(ids.handle_packet, packets[:handle_count], rules)
+        scaling.append(row)
+        console.print(f"[green]{count} rules:[/green] {row['match_packet']['pps']:,.0f} pps")
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "packets": packet_count,
+        "mix": mix,
+        "payload_sizes": list(PAYLOAD_SIZES),
+        "load_rules": {"seconds": load_seconds, "rules": len(full), "repeat": load_repeat},
+        "scaling": scaling,
+    }
+
+# ============================
+# Reporting
+# ============================
+def show_results(results, baseline=None):
+    """Print the scaling table, with pps change against a previous result file"""
+    previous = {}
+    if baseline:
+        previous = {row["rules"]: row for row in baseline.get("scaling", [])}
+    console.print(f"[green]load_rules:[/green] {results['load_rules']['rules']} rules in "
+                  f"{results['load_rules']['seconds']:.2f}s")
+    table = Table(title="match_packet by Rule Count", show_header=True, header_style="bold green")
+    for column in ("Rules", "pps", "p50 us", "p99 us", "Alerts", "vs baseline"):
+        table.add_column(column)
+    for row in results["scaling"]:
+        stats = row["match_packet"]
+        change = "-"
+        old = previous.get(row["rules"])
+        if old and old["match_packet"]["pps"]:
+            change = f"{stats['pps'] / old['match_packet']['pps'] - 1:+.1%}"
+        table.add_row(str(row["rules"]), f"{stats['pps']:,.0f}", f"{stats['p50_us']:.1f}",
+                      f"{stats['p99_us']:.1f}", str(stats["alerts"]), change)
+    console.print(table)
+    if results["scaling"] and "handle_packet" in results["scaling"][0]:
+        table = Table(title="handle_packet by Rule Count", show_header=True, header_style="bold green")
+        for column in ("Rules", "pps", "p50 us", "p99 us"):
+            table.add_column(column)
+        for row in results["scaling"]:
+            stats = row["handle_packet"]
+            table.add_row(str(row["rules"]), f"{stats['pps']:,.0f}", f"{stats['p50_us']:.1f}",
+                          f"{stats['p99_us']:.1f}")
+        console.print(table)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NetWatch IDS engine")
+    parser.add_argument("--packets", type=int, default=5000, help="synthetic packets per run")
+    parser.add_argument("--seed", type=int, default=1, help="traffic generator seed")
+    parser.add_argument("--load-repeat", type=int, default=1, help="load_rules runs; the best is kept")
+    parser.add_argument("--handle-packets", type=int, default=200,
+                        help="packets timed through handle_packet, which also reports every alert (0 to skip)")
+    parser.add_argument("--output", default=None, help="JSON result path (default: data/benchmarks/)")
+    parser.add_argument("--baseline", default=None, help="earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.packets, args.seed, args.load_repeat, args.handle_packets)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    show_results(results, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        output = os.path.join(BENCHMARK_DIR, f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    console.print(f"[cyan]Results written to {output}[/cyan]")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -3,22 +3,39 @@ import json
 import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime, timedelta
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict, deque
 import re
 import os
 import time
 import hashlib
+import pickle
 import ipaddress
+import socket
+import struct
+import select
+import mmap
+import math
+import ctypes
+import bisect
+import heapq
+from array import array
 import threading
+import sys
+import argparse
+import multiprocessing
+import queue
+import shlex
+import signal
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 from rich.panel import Panel
 from rich.layout import Layout
 from pyfiglet import Figlet
-from scapy.all import AsyncSniffer, IP, TCP, UDP, sniff
+from scapy.all import AsyncSniffer, Ether, IP, TCP, UDP, ICMP, Padding, RawPcapReader, conf, sniff
 
 # ============================
 # Console & Banner Setup
@@ -26,7 +43,86 @@ from scapy.all import AsyncSniffer, IP, TCP, UDP, sniff
 console = Console()
 
 RULES_DIR = "rules/professional"
+RULE_VARS_FILE = "rules/professional/community-rules/snort.conf"
+RULE_CACHE_DIR = "data/rule_cache"  # compiled rules per file plus the whole indexed ruleset
+RULE_CACHE = True
+ENGINE_VERSION = "2.1.3"  # bump whenever compiled rule structures change; invalidates the rule cache
 MAX_HISTORY = 100
+PORT_BUCKET_EXPAND_LIMIT = 1024  # port ranges wider than this go to the "any" bucket
+CONTENT_BACKTRACK_LIMIT = 64  # retries of earlier contents when a relative one fails
+
+# Flow tracking
+FLOW_MEMCAP = 128 * 1024 * 1024  # bytes; least recently used flows spill past this
+FLOW_TIMEOUTS = {"new": 30, "established": 600, "closed": 10}  # idle seconds per state
+FLOW_MIDSTREAM = True  # treat TCP flows picked up mid-connection as established
+
+# TCP stream reassembly
+STREAM_REASSEMBLY = True  # match content rules on reassembled TCP streams
+STREAM_DEPTH = 1024 * 1024  # bytes reassembled per direction before falling back to packets
+STREAM_MEMCAP = 64 * 1024 * 1024  # bytes held across all reassembly buffers
+STREAM_MAX_OOO_SEGMENTS = 64  # out-of-order segments queued per direction
+STREAM_PCRE_OVERLAP = 1024  # bytes before new stream data a non-relative pcre match may start
+
+# Capture queue
+CAPTURE_QUEUE_SIZE = 65536  # packets buffered between the sniffer thread and the matcher
+CAPTURE_QUEUE_POLICY = "drop-newest"  # or "drop-oldest" / "block" when the queue is full
+CAPTURE_BATCH_SIZE = 256  # packets matched per event-loop wakeup
+
+# Raw AF_PACKET capture
+CAPTURE_BACKEND = "scapy"  # or "afpacket" for raw sockets with lazy dissection (Linux)
+CAPTURE_RING_FRAME_SIZE = 2048  # TPACKET_V2 frame size; longer packets are truncated
+CAPTURE_RING_FRAMES = 32768  # frames in the mmap'ed receive ring
+CAPTURE_BPF = True  # attach a kernel filter derived from the loaded rules
+BPF_MAX_PORT_RANGES = 48  # per transport; more and the whole transport is passed
+
+# Multi-process matching
+WORKER_QUEUE_SIZE = 10000  # packets queued per worker before the capture thread drops
+WORKER_STATS_INTERVAL = 2.0  # seconds between worker stat snapshots
+
+# Threat intelligence
+DOMAIN_CACHE_SIZE = 65536  # qname verdicts remembered by the domain intel LRU
+DNS_INTEL_SID = 1000001  # sid reported for DNS lookups of listed domains
+DNS_PORT = 53
+INTEL_BLOOM = True  # probabilistic front tier for the IP, domain and hash feeds
+INTEL_BLOOM_FP_RATE = 0.001  # false-positive rate the Bloom filters are sized for
+INTEL_BLOOM_MIN_ENTRIES = 100000  # smaller feeds are cheaper to check exactly
+INTEL_BLOOM_DIR = "data/intel"  # memory-mapped Bloom files, shared by every engine process
+INTEL_EXACT_CHECK = True  # confirm Bloom hits in exact stores; False keeps only the Bloom filters
+INTEL_FEEDS = {
+    "malicious_ips": "threat_intel/malicious_ips.txt",
+    "malicious_domains": "threat_intel/malicious_domains.txt",
+    "malicious_hashes": "threat_intel/malicious_hashes.txt",
+}
+
+# Rule profiling
+RULE_PROFILING = False  # per-sid check counts and time; toggle with the profile command
+RULE_PROFILE_FILE = "data/rule_profile.json"
+
+# Alert thresholding
+THRESHOLD_BUCKET_SECONDS = 300  # idle threshold trackers are dropped after one to two buckets
+THRESHOLD_MAX_TRACKERS = 100000  # trackers per bucket before it rotates early
+
+# Behavioral baseline
+BASELINE_HALF_LIFE = 3600  # seconds for baseline port, protocol and volume counts to halve
+BASELINE_DECAY_INTERVAL = 10  # seconds between applying the decay to the baseline arrays
+BASELINE_MIN_PORT_COUNT = 5  # decayed packets to a port below which its use is unusual
+BASELINE_LARGE_TRANSFER = 1000000  # bytes in one packet flagged as a large transfer
+
+# Top talkers
+TOP_TALKERS = True  # heavy-hitter tracking of packets and bytes per src, dst and src-dst pair
+TOP_TALKERS_K = 20  # entries kept per dimension and metric
+TOP_TALKERS_WIDTH = 4096  # Count-Min counters per row; overestimate <= e / width of the total
+TOP_TALKERS_DEPTH = 4  # Count-Min rows; that bound fails with probability e ** -depth
+TOP_TALKERS_FILE = "data/top_talkers.json"  # export read by the web dashboard
+TOP_TALKERS_EXPORT_INTERVAL = 10  # seconds between exports while capturing
+
+# Alert correlation
+CORRELATION_WINDOW = 60  # seconds of alerts counted per correlation key
+CORRELATION_KEYS = {"sid": 5}  # "sid", "sid_src" or "src" -> alerts within the window that escalate
+CORRELATION_MAX_KEYS = 100000  # least recently alerting keys are dropped past this
+THREAT_SCORE_HALF_LIFE = 3600  # seconds for a host's accumulated threat score to halve
+THREAT_SCORE_MIN = 1.0  # decayed host scores below this are evicted
+THREAT_SCORE_MAX_HOSTS = 100000  # least recently scored hosts are dropped past this
 
 # ============================
 # Logging Setup
@@ -52,305 +148,3689 @@ def banner():
 # ============================
 # Rule Parsing & Loading
 # ============================
-def load_rules():
+class RuleSet:
+    """Loaded rules plus the structures compiled from them at load time"""
+
+    def __init__(self, rules=None):
+        self.rules = rules or []
+        self.prefilter = ContentPrefilter()
+        for rule_id, rule in enumerate(self.rules):
+            if rule.fast_pattern:
+                self.prefilter.add(rule.fast_pattern.lower(), rule_id)
+        self.prefilter.build()
+        self.index = RuleIndex(self.rules)
+        self.capture_filter = CaptureFilter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+def load_rules(use_cache=None):
+    """Compile every .rules file under RULES_DIR into a RuleSet.
+
+    Compiled rules are cached per file, keyed by the file's content hash, the
+    resolved rule variables, the port indexing limits and ENGINE_VERSION, so an
+    edit recompiles only that file.
+    The indexed RuleSet is cached too and a warm start just unpickles it.
+    use_cache defaults to RULE_CACHE as set when the call is made.
+    """
+    if use_cache is None:
+        use_cache = RULE_CACHE
     rules = []
+    skipped = 0
+    variables = load_rule_variables(RULE_VARS_FILE)
     if not os.path.exists(RULES_DIR):
         console.log(f"[yellow]Professional rules directory not found: {RULES_DIR}[/yellow]")
-        return rules
+        return RuleSet(rules)
+
+    started = time.perf_counter()
+    rule_files = []
+    for dirpath, _, fnames in os.walk(RULES_DIR):
+        for fname in sorted(fnames):
+            if fname.endswith(".rules"):
+                path = os.path.join(dirpath, fname)
+                with open(path, "rb") as f:
+                    data = f.read()
+                rule_files.append((path, data, hashlib.sha256(data).hexdigest()))
+    # Anything that changes how a rule compiles or is indexed belongs in the key
+    resolved = sorted(f"{name}={resolve_variables(value, variables)}" for name, value in variables.items())
+    base_key = rule_cache_key(ENGINE_VERSION, sys.version, file_digest(RULE_VARS_FILE),
+                              str(PORT_BUCKET_EXPAND_LIMIT), str(BPF_MAX_PORT_RANGES), *resolved)
+    ruleset_key = rule_cache_key(base_key, *(f"{path}:{digest}" for path, _, digest in rule_files))
+    ruleset_path = os.path.join(RULE_CACHE_DIR, f"ruleset.{ruleset_key[:24]}.pickle")
+    if use_cache:
+        entry = read_rule_cache(ruleset_path)
+        if entry is not None:
+            ruleset = entry["ruleset"]
+            adopt_cached_rules(ruleset.rules, entry["flowbits"])
+            console.log(f"[green]Total professional rules loaded: {len(ruleset)} from the compiled cache "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms[/green]")
+            return ruleset
+
+    cached_files = 0
+    for path, data, digest in rule_files:
+        fname = os.path.basename(path)
+        file_path = rule_file_cache_path(path, rule_cache_key(base_key, digest))
+        entry = read_rule_cache(file_path) if use_cache else None
+        if entry is not None:
+            adopt_cached_rules(entry["rules"], entry["flowbits"])
+            rules.extend(entry["rules"])
+            skipped += entry["skipped"]
+            cached_files += 1
+            continue
+        try:
+            file_rules, file_skipped = compile_rule_lines(data.decode("utf-8").splitlines(), variables)
+            console.log(f"[green]Loaded professional rules from {fname}[/green]")
+        except Exception as e:
+            console.log(f"[red]Error loading {fname}: {e}[/red]")
+            continue
+        rules.extend(file_rules)
+        skipped += file_skipped
+        if use_cache:
+            write_rule_cache(file_path, {"rules": file_rules, "skipped": file_skipped,
+                                         "flowbits": list(FLOWBIT_INDEX)})
     
-    for fname in os.listdir(RULES_DIR):
-        if fname.endswith(".rules"):
+    ruleset = RuleSet(rules)
+    if use_cache:
+        write_rule_cache(ruleset_path, {"ruleset": ruleset, "flowbits": list(FLOWBIT_INDEX)})
+    console.log(f"[green]Total professional rules loaded: {len(ruleset)} "
+                f"({ruleset.prefilter.pattern_count} prefilter patterns, {len(PCRE_CACHE)} pcre, "
+                f"{skipped} skipped, {cached_files}/{len(rule_files)} files from cache) "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms[/green]")
+    return ruleset
+
+def compile_rule_lines(lines, variables):
+    """Compile the rules in one file's lines; returns (rules, skipped count)"""
+    rules = []
+    skipped = 0
+    continued = ""
+    for line in lines:
+        line = line.strip()
+        # A trailing backslash continues the rule on the next line
+        if line.endswith("\\"):
+            continued += line[:-1]
+            continue
+        line, continued = continued + line, ""
+        if not line or line.startswith("#"):
+            continue
+        try:
+            rule = parse_rule(line)
+            if rule:
+                rules.append(compile_rule(rule, variables))
+            elif line.startswith("alert"):
+                skipped += 1  # parse_rule has logged why
+        except Exception as e:
+            # Skip malformed or unsupported rules (e.g. untranslatable pcre or
+            # a keyword the matcher cannot evaluate)
+            skipped += 1
+    return rules, skipped
+
+class ContentMatch:
+    """One content option with its modifiers, decoded to bytes at compile time"""
+
+    __slots__ = ("pattern", "nocase", "negated", "offset", "depth", "distance", "within",
+                 "relative", "fast_pattern")
+
+    def __init__(self, pattern, negated=False):
+        self.pattern = pattern
+        self.nocase = False
+        self.negated = negated
+        self.offset = 0
+        self.depth = None
+        self.distance = 0
+        self.within = None
+        self.relative = False
+        self.fast_pattern = False
+
+class CompiledRule:
+    """A parsed rule with every option the matcher needs decoded up front"""
+
+    __slots__ = ("sid", "rev", "msg", "classtype", "action", "proto", "src", "sport",
+                 "direction", "dst", "dport", "src_set", "sport_set", "dst_set", "dport_set",
+                 "flow", "flowbits", "thresholds", "contents", "fast_pattern", "dsize", "pcres")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+def compile_rule(rule, variables=None):
+    """Turn a parse_rule() dict into a CompiledRule, resolving header variables"""
+    variables = variables or {}
+    opts = {}
+    contents = []
+    pcres = []
+    flowbits = None
+    thresholds = []
+    for key, value in rule["options"]:
+        if key not in RULE_KEYWORDS:
+            # Ignoring a constraint would turn the rule into a match-all
+            raise ValueError(f"unsupported rule keyword: {key}")
+        if key in ("threshold", "detection_filter"):
+            thresholds.append(compile_threshold(key, value))
+        elif key in ("flowbits", "noalert"):
+            flowbits = flowbits or FlowbitsOption()
+            flowbits.add(value or key)
+        elif key == "pcre":
+            negated = value.startswith("!")
+            pcres.append((compile_pcre(unquote(value.lstrip("!").strip())), negated))
+        elif key == "content":
+            negated = value.startswith("!")
+            contents.append(ContentMatch(decode_content(unquote(value.lstrip("!").strip())), negated))
+        elif contents and key in CONTENT_MODIFIERS:
+            apply_content_modifier(contents[-1], key, value)
+        elif value is not None:
+            opts[key] = unquote(value)
+    for content in contents:
+        if content.nocase:
+            content.pattern = content.pattern.lower()
+    return CompiledRule(
+        sid=int(opts.get("sid", 0)),
+        rev=int(opts.get("rev", 0)),
+        msg=opts.get("msg", "Suspicious traffic detected"),
+        classtype=sys.intern(opts.get("classtype", "unknown")),
+        action=sys.intern(rule["action"]),
+        proto=sys.intern(rule["proto"].lower()),
+        src=sys.intern(rule["src"]),
+        sport=sys.intern(rule["sport"]),
+        direction=sys.intern(rule["direction"]),
+        dst=sys.intern(rule["dst"]),
+        dport=sys.intern(rule["dport"]),
+        src_set=compile_address_group(rule["src"], variables),
+        sport_set=compile_port_group(rule["sport"], variables),
+        dst_set=compile_address_group(rule["dst"], variables),
+        dport_set=compile_port_group(rule["dport"], variables),
+        contents=tuple(contents),
+        fast_pattern=select_fast_pattern(contents),
+        dsize=compile_dsize(opts["dsize"]) if "dsize" in opts else None,
+        pcres=tuple(pcres),
+        flow=compile_flow(opts["flow"]) if "flow" in opts else None,
+        flowbits=flowbits,
+        thresholds=tuple(thresholds),
+    )
+
+CONTENT_MODIFIERS = ("nocase", "offset", "depth", "distance", "within", "fast_pattern")
+# Keywords compile_rule evaluates, and the descriptive ones that never affect a
+# match; a rule using anything else is skipped. rawbytes is a no-op because
+# content is always matched against the raw payload.
+RULE_KEYWORDS = frozenset(CONTENT_MODIFIERS + (
+    "content", "pcre", "flow", "flowbits", "noalert", "dsize", "threshold", "detection_filter",
+    "rawbytes", "msg", "sid", "rev", "gid", "classtype", "priority", "metadata", "reference", "target"))
+
+def apply_content_modifier(content, key, value):
+    """Attach a modifier option to the content it follows.
+
+    Offsets that name a byte_extract variable cannot be resolved statically
+    and are left unbounded, so the rule errs towards matching.
+    """
+    if key == "nocase":
+        content.nocase = True
+        return
+    if key == "fast_pattern":
+        content.fast_pattern = value.strip() if value else True
+        return
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        number = None
+    if key in ("distance", "within"):
+        content.relative = True
+    if number is None:
+        return
+    if key == "offset":
+        content.offset = number
+    elif key == "depth":
+        content.depth = number
+    elif key == "distance":
+        content.distance = number
+    elif key == "within":
+        content.within = number
+
+def unquote(value):
+    """Remove one surrounding pair of double quotes, leaving escaped quotes inside intact"""
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+def decode_content(text):
+    """Decode a content string with |hex| blocks and backslash escapes into bytes"""
+    out = bytearray()
+    in_hex = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "|":
+            in_hex = not in_hex
+        elif in_hex:
+            if not ch.isspace():
+                out.append(int(text[i:i + 2], 16))
+                i += 1
+        elif ch == "\\" and i + 1 < len(text):
+            i += 1
+            out.extend(text[i].encode())
+        else:
+            out.extend(ch.encode())
+        i += 1
+    return bytes(out)
+
+def select_fast_pattern(contents):
+    """Pick the bytes a rule is prefiltered on.
+
+    Only non-negated contents qualify. The first one flagged fast_pattern wins,
+    otherwise the longest; fast_pattern:offset,length narrows it to that slice.
+    """
+    positive = [content for content in contents if not content.negated]
+    if not positive:
+        return None
+    flagged = [content for content in positive if content.fast_pattern]
+    chosen = flagged[0] if flagged else max(positive, key=lambda content: len(content.pattern))
+    if isinstance(chosen.fast_pattern, str) and "," in chosen.fast_pattern:
+        start, length = (int(part) for part in chosen.fast_pattern.split(",", 1))
+        return chosen.pattern[start:start + length]
+    return chosen.pattern
+
+# Flowbit names interned to bit positions; append-only so flow state survives reloads
+FLOWBIT_INDEX = {}
+
+def flowbit_mask(names, separator):
+    mask = 0
+    for name in names.split(separator):
+        name = name.strip()
+        if name not in FLOWBIT_INDEX:
+            FLOWBIT_INDEX[name] = len(FLOWBIT_INDEX)
+        mask |= 1 << FLOWBIT_INDEX[name]
+    return mask
+
+class FlowbitsOption:
+    """All flowbits options of a rule folded into integer masks"""
+
+    __slots__ = ("isset_all", "isset_any", "isnotset", "set", "unset", "toggle", "noalert")
+
+    def __init__(self):
+        self.isset_all = self.isset_any = self.isnotset = 0
+        self.set = self.unset = self.toggle = 0
+        self.noalert = False
+
+    def add(self, value):
+        command, _, names = value.partition(",")
+        command = command.strip()
+        names = names.split(",")[0].strip()  # a trailing group name is not used
+        if command == "noalert":
+            self.noalert = True
+        elif command == "isset" and "|" in names:
+            self.isset_any |= flowbit_mask(names, "|")
+        elif command == "isset":
+            self.isset_all |= flowbit_mask(names, "&")
+        elif command == "isnotset":
+            self.isnotset |= flowbit_mask(names, "|" if "|" in names else "&")
+        elif command in ("set", "setx"):
+            self.set |= flowbit_mask(names, "&")
+        elif command == "unset":
+            self.unset |= flowbit_mask(names, "|" if "|" in names else "&")
+        elif command == "toggle":
+            self.toggle |= flowbit_mask(names, "&")
+
+    def check(self, bits):
+        """The isset/isnotset conditions, evaluated before any payload work"""
+        if bits & self.isset_all != self.isset_all:
+            return False
+        if self.isset_any and not bits & self.isset_any:
+            return False
+        return not bits & self.isnotset
+
+    def apply(self, bits):
+        """The set/unset/toggle actions of a rule that matched"""
+        return ((bits | self.set) & ~self.unset) ^ self.toggle
+
+def compile_flow(spec):
+    """Parse a flow option into (established, to_server), each True/False/None"""
+    established = to_server = None
+    for keyword in spec.replace(" ", "").split(","):
+        if keyword == "established":
+            established = True
+        elif keyword == "not_established":
+            established = False
+        elif keyword in ("to_server", "from_client"):
+            to_server = True
+        elif keyword in ("to_client", "from_server"):
+            to_server = False
+    if established is None and to_server is None:
+        return None
+    return established, to_server
+
+class ThresholdOption:
+    """A threshold or detection_filter option"""
+
+    __slots__ = ("kind", "track", "count", "seconds", "multiplier")
+
+    def __init__(self, kind, track, count, seconds, multiplier):
+        self.kind = kind
+        self.track = track
+        self.count = count
+        self.seconds = seconds
+        self.multiplier = multiplier
+
+def compile_threshold(key, spec):
+    """Parse threshold:type .., track .., count .., seconds|multiplier .. or detection_filter"""
+    fields = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition(" ")
+        fields[name] = value.strip()
+    kind = "detection_filter" if key == "detection_filter" else fields.get("type", "limit")
+    return ThresholdOption(sys.intern(kind), sys.intern(fields.get("track", "by_src")),
+                           int(fields.get("count", 1)), int(fields.get("seconds", 60)),
+                           int(fields.get("multiplier", 2)))
+
+def compile_dsize(spec):
+    """Parse a dsize option into an inclusive (low, high) size range"""
+    spec = spec.replace(" ", "")
+    if "<>" in spec:
+        low, high = spec.split("<>", 1)
+        return int(low) + 1, int(high) - 1
+    if "<=>" in spec:
+        low, high = spec.split("<=>", 1)
+        return int(low), int(high)
+    if spec.startswith(">="):
+        return int(spec[2:]), sys.maxsize
+    if spec.startswith("<="):
+        return 0, int(spec[2:])
+    if spec.startswith(">"):
+        return int(spec[1:]) + 1, sys.maxsize
+    if spec.startswith("<"):
+        return 0, int(spec[1:]) - 1
+    size = int(spec.lstrip("="))
+    return size, size
+
+# ============================
+# Compiled Rule Cache
+# ============================
+def rule_cache_key(*parts):
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+def file_digest(path):
+    """Content hash of a file, or of nothing if it does not exist"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return hashlib.sha256(b"").hexdigest()
+
+def rule_file_cache_path(path, key):
+    name = os.path.relpath(path, RULES_DIR).replace(os.sep, "__")
+    return os.path.join(RULE_CACHE_DIR, f"{name}.{key[:24]}.pickle")
+
+def read_rule_cache(path):
+    """Unpickle a cache entry; None if missing or unreadable"""
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        console.log(f"[yellow]Ignoring unreadable rule cache {path}: {e}[/yellow]")
+        return None
+
+def write_rule_cache(path, entry):
+    """Atomically store an entry and drop older entries for the same file"""
+    directory, name = os.path.split(path)
+    prefix = name.rsplit(".", 2)[0] + "."
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for old in os.listdir(directory):
+            if old.startswith(prefix) and old != name and old.count(".") == name.count("."):
+                os.remove(os.path.join(directory, old))
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except OSError as e:
+        console.log(f"[yellow]Could not write rule cache {path}: {e}[/yellow]")
+
+def adopt_cached_rules(rules, flowbit_names):
+    """Fit unpickled rules into this process: flowbit indices and the shared PCRE cache.
+
+    Flowbit masks were built against the FLOWBIT_INDEX of the process that
+    compiled them (flowbit_names, in index order) and are renumbered if ours
+    differs.
+    """
+    mapping = {}
+    for old, name in enumerate(flowbit_names):
+        if name not in FLOWBIT_INDEX:
+            FLOWBIT_INDEX[name] = len(FLOWBIT_INDEX)
+        mapping[old] = FLOWBIT_INDEX[name]
+    renumber = any(old != new for old, new in mapping.items())
+    for rule in rules:
+        if rule.pcres:
+            rule.pcres = tuple((PCRE_CACHE.setdefault(pattern.source, pattern), negated)
+                               for pattern, negated in rule.pcres)
+        if renumber and rule.flowbits is not None:
+            option = rule.flowbits
+            for name in ("isset_all", "isset_any", "isnotset", "set", "unset", "toggle"):
+                mask = getattr(option, name)
+                remapped = 0
+                while mask:
+                    low = mask & -mask
+                    remapped |= 1 << mapping[low.bit_length() - 1]
+                    mask ^= low
+                setattr(option, name, remapped)
+
+# ============================
+# Ruleset Variables & Header Groups
+# ============================
+MAX_ADDRESS = {4: (1 << 32) - 1, 6: (1 << 128) - 1}
+# Compiled header groups shared by every rule with the same resolved spec
+ADDRESS_GROUP_CACHE = {}
+PORT_GROUP_CACHE = {}
+
+def load_rule_variables(path):
+    """Read ipvar/portvar/var definitions from a snort.conf style file"""
+    variables = {}
+    if not os.path.exists(path):
+        return variables
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            parts = line.split(None, 2)
+            if len(parts) == 3 and parts[0] in ("ipvar", "portvar", "var"):
+                variables[parts[1]] = parts[2].strip()
+    return variables
+
+def resolve_variables(spec, variables, depth=0):
+    """Substitute $NAME references recursively; undefined variables mean any"""
+    if "$" not in spec or depth > 16:
+        return spec
+    def substitute(match):
+        return resolve_variables(variables.get(match.group(1), "any"), variables, depth + 1)
+    return re.sub(r"\$(\w+)", substitute, spec)
+
+def split_group(spec):
+    """Split "[a,[b,c],!d]" into its top-level items"""
+    spec = spec.strip()
+    if spec.startswith("[") and spec.endswith("]"):
+        spec = spec[1:-1]
+    items, depth, current = [], 0, []
+    for ch in spec:
+        if ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    items.append("".join(current).strip())
+    return [item for item in items if item]
+
+def group_ranges(spec, literal_ranges, universe):
+    """Resolve a nested, possibly negated group to {key: merged ranges}.
+
+    A list is the union of its plain items, or universe if it has none, minus
+    the union of its negated items; a leading ! complements a whole item.
+    literal_ranges maps one literal to (key, low, high) tuples.
+    """
+    spec = spec.strip()
+    negated = False
+    while spec.startswith("!"):
+        negated = not negated
+        spec = spec[1:].strip()
+    if spec == "any":
+        ranges = {key: [list(span) for span in spans] for key, spans in universe.items()}
+    elif spec.startswith("["):
+        include = {key: [] for key in universe}
+        exclude = {key: [] for key in universe}
+        saw_positive = False
+        for item in split_group(spec):
+            bare = item.lstrip("!").strip()
+            target = exclude if (len(item) - len(item.lstrip("!"))) % 2 else include
+            saw_positive |= target is include
+            for key, spans in group_ranges(bare, literal_ranges, universe).items():
+                target[key].extend(spans)
+        if not saw_positive:
+            include = universe
+        ranges = {key: subtract_ranges(merge_ranges(include[key]), merge_ranges(exclude[key]))
+                  for key in universe}
+    else:
+        ranges = {key: [] for key in universe}
+        for key, low, high in literal_ranges(spec):
+            ranges[key].append([low, high])
+    if negated:
+        ranges = {key: subtract_ranges(merge_ranges(universe[key]), merge_ranges(ranges[key]))
+                  for key in universe}
+    return ranges
+
+def merge_ranges(ranges):
+    """Sort and coalesce (low, high) ranges"""
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            if high > merged[-1][1]:
+                merged[-1][1] = high
+        else:
+            merged.append([low, high])
+    return merged
+
+def subtract_ranges(ranges, holes):
+    """Remove every (low, high) in holes from the merged ranges"""
+    result = []
+    for low, high in ranges:
+        for hole_low, hole_high in holes:
+            if hole_high < low or hole_low > high:
+                continue
+            if hole_low > low:
+                result.append([low, hole_low - 1])
+            low = hole_high + 1
+            if low > high:
+                break
+        if low <= high:
+            result.append([low, high])
+    return result
+
+class AddressSet:
+    """Resolved address group as sorted, disjoint integer ranges per IP version"""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, include, exclude):
+        self.starts = {}
+        self.ends = {}
+        for version in (4, 6):
+            ranges = subtract_ranges(merge_ranges(include[version]), merge_ranges(exclude[version]))
+            self.starts[version] = [low for low, _ in ranges]
+            self.ends[version] = [high for _, high in ranges]
+
+    def contains(self, address, version=4):
+        starts = self.starts[version]
+        pos = bisect.bisect_right(starts, address) - 1
+        return pos >= 0 and address <= self.ends[version][pos]
+
+def address_literal_ranges(literal):
+    network = ipaddress.ip_network(literal, strict=False)
+    return [(network.version, int(network.network_address), int(network.broadcast_address))]
+
+def compile_address_group(spec, variables):
+    """Compile a header address spec into an AddressSet, or None for any"""
+    spec = resolve_variables(spec, variables)
+    if spec.strip() == "any":
+        return None
+    cached = ADDRESS_GROUP_CACHE.get(spec)
+    if cached is not None:
+        return cached
+    include = group_ranges(spec, address_literal_ranges, {4: [(0, MAX_ADDRESS[4])], 6: [(0, MAX_ADDRESS[6])]})
+    compiled = AddressSet(include, {4: [], 6: []})
+    if not compiled.starts[4] and not compiled.starts[6]:
+        # e.g. !$HOME_NET with HOME_NET any; the rule could never match
+        raise ValueError(f"address group matches nothing: {spec}")
+    ADDRESS_GROUP_CACHE[spec] = compiled
+    return compiled
+
+class PortSet:
+    """Resolved port group as a 65,536-bit bitmap"""
+
+    __slots__ = ("bitmap", "count")
+
+    def __init__(self, bitmap):
+        self.bitmap = bytes(bitmap)
+        self.count = bin(int.from_bytes(self.bitmap, "little")).count("1")
+
+    def contains(self, port):
+        return bool(self.bitmap[port >> 3] & (1 << (port & 7)))
+
+    def ports(self):
+        return [port for low, high in self.ranges() for port in range(low, high + 1)]
+
+    def ranges(self):
+        """The set as merged (low, high) ranges, scanning whole bytes where possible"""
+        ranges = []
+        start = None
+        for index, byte in enumerate(self.bitmap):
+            if byte in (0, 0xFF):
+                if byte and start is None:
+                    start = index << 3
+                elif not byte and start is not None:
+                    ranges.append((start, (index << 3) - 1))
+                    start = None
+                continue
+            for bit in range(8):
+                port = (index << 3) | bit
+                if byte & (1 << bit):
+                    if start is None:
+                        start = port
+                elif start is not None:
+                    ranges.append((start, port - 1))
+                    start = None
+        if start is not None:
+            ranges.append((start, 65535))
+        return ranges
+
+def port_literal_ranges(literal):
+    if ":" in literal:
+        low, high = literal.split(":", 1)
+        return [(0, int(low or 0), int(high or 65535))]
+    return [(0, int(literal), int(literal))]
+
+def compile_port_group(spec, variables):
+    """Compile a header port spec into a PortSet, or None for any"""
+    spec = resolve_variables(spec, variables)
+    if spec.strip() == "any":
+        return None
+    cached = PORT_GROUP_CACHE.get(spec)
+    if cached is not None:
+        return cached
+    bitmap = bytearray(8192)
+    for low, high in group_ranges(spec, port_literal_ranges, {0: [(0, 65535)]})[0]:
+        for port in range(low, high + 1):
+            bitmap[port >> 3] |= 1 << (port & 7)
+    compiled = PortSet(bitmap)
+    if not compiled.count:
+        raise ValueError(f"port group matches nothing: {spec}")
+    PORT_GROUP_CACHE[spec] = compiled
+    return compiled
+
+# ============================
+# PCRE Translation & Cache
+# ============================
+PCRE_FLAGS = {"i": re.IGNORECASE, "s": re.DOTALL, "m": re.MULTILINE, "x": re.VERBOSE}
+PCRE_SYNTAX = [
+    (re.compile(r"\(\?<([A-Za-z_]\w*)>"), r"(?P<\1>"),
+    (re.compile(r"\\k<([A-Za-z_]\w*)>"), r"(?P=\1)"),
+    (re.compile(r"\\z"), r"\\Z"),
+    (re.compile(r"\\h"), r"[ \\t]"),
+    (re.compile(r"\[:alpha:\]"), "a-zA-Z"),
+    (re.compile(r"\[:digit:\]"), "0-9"),
+    (re.compile(r"\[:alnum:\]"), "a-zA-Z0-9"),
+    (re.compile(r"\[:space:\]"), r"\\s"),
+    (re.compile(r"\[:xdigit:\]"), "0-9a-fA-F"),
+]
+# Compiled patterns shared by every rule carrying the same pcre text
+PCRE_CACHE = {}
+
+class PcrePattern:
+    """A pcre option translated to a Python regex, with its evaluation counters"""
+
+    __slots__ = ("source", "regex", "relative", "anchored", "evaluations", "matches", "total_time")
+
+    def __init__(self, source, regex, relative, anchored):
+        self.source = source
+        self.regex = regex
+        self.relative = relative
+        self.anchored = anchored
+        self.evaluations = 0
+        self.matches = 0
+        self.total_time = 0.0
+
+    def search(self, payload, start=0, min_end=0):
+        """True if the regex matches from start with a match ending at or after min_end"""
+        began = time.perf_counter()
+        if self.relative and start:
+            # Like Snort, a relative pattern sees the buffer from start on, so ^ anchors there
+            payload = memoryview(payload)[start:]
+            min_end -= start
+            start = 0
+        if self.anchored:
+            match = self.regex.match(payload, start)
+            found = match is not None and match.end() >= min_end
+        else:
+            match = self.regex.search(payload, start)
+            while match is not None and match.end() < min_end:
+                match = self.regex.search(payload, match.start() + 1)
+            found = match is not None
+        self.total_time += time.perf_counter() - began
+        self.evaluations += 1
+        self.matches += found
+        return found
+
+def compile_pcre(source):
+    """Translate a "/pattern/flags" pcre option, reusing the cached regex for repeats.
+
+    Snort buffer flags (U, P, H, C, ...) are approximated by the payload; R makes
+    the search start at the end of the last content match and A anchors it.
+    """
+    cached = PCRE_CACHE.get(source)
+    if cached is not None:
+        return cached
+    body, _, modifiers = source[1:].rpartition("/")
+    flags = 0
+    for flag in modifiers:
+        flags |= PCRE_FLAGS.get(flag, 0)
+    for pattern, replacement in PCRE_SYNTAX:
+        body = pattern.sub(replacement, body)
+    regex = re.compile(body.encode("latin-1", errors="backslashreplace"), flags)
+    compiled = PcrePattern(source, regex, "R" in modifiers, "A" in modifiers)
+    PCRE_CACHE[source] = compiled
+    return compiled
+
+def pcre_stats(top=10):
+    """Cached pcre patterns ordered by cumulative evaluation time"""
+    patterns = sorted(PCRE_CACHE.values(), key=lambda pattern: pattern.total_time, reverse=True)
+    return patterns[:top]
+
+def split_options(options):
+    """Split a rule body on ';' outside quoted strings, honouring backslash escapes"""
+    parts = []
+    current = []
+    in_quotes = False
+    escaped = False
+    for ch in options:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ";" and not in_quotes:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    parts.append("".join(current))
+    return parts
+
+# Simplified Snort/Suricata style parser
+def parse_rule(line):
+    if not line.startswith("alert"):
+        return None
+    try:
+        header, options = line.split("(", 1)
+        options = options.rsplit(")", 1)[0]
+        parts = header.split()
+        action, proto, src, sport, direction, dst, dport = parts[:7]
+        opt_list = []
+        for opt in split_options(options):
+            opt = opt.strip()
+            if not opt:
+                continue
+            if ":" in opt:
+                k, v = opt.split(":", 1)
+                opt_list.append((k.strip(), v.strip()))
+            else:
+                opt_list.append((opt, None))
+        return {
+            "action": action,
+            "proto": proto,
+            "src": src,
+            "sport": sport,
+            "direction": direction,
+            "dst": dst,
+            "dport": dport,
+            "options": opt_list
+        }
+    except Exception as e:
+        console.log(f"[red]Error parsing rule:[/red] {line} ({e})")
+        return None
+
+# ============================
+# Multi-pattern Content Prefilter
+# ============================
+class ContentPrefilter:
+    """Aho-Corasick automaton over one content pattern per rule.
+
+    Patterns are added lowercased and the payload is scanned lowercased, so a
+    single pass yields a superset of the rules whose content can match; each
+    candidate is then verified in full by match_packet.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [()]
+        self.pattern_count = 0
+        self.max_length = 0
+
+    def add(self, pattern, rule_id):
+        self.max_length = max(self.max_length, len(pattern))
+        state = 0
+        for byte in pattern:
+            nxt = self.goto[state].get(byte)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][byte] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(())
+            state = nxt
+        self.out[state] = self.out[state] + (rule_id,)
+        self.pattern_count += 1
+
+    def build(self):
+        """Compute failure links breadth-first and fold outputs along them"""
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for byte, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and byte not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(byte, 0)
+                if self.out[self.fail[nxt]]:
+                    self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def scan(self, data):
+        """Return the set of rule ids whose pattern occurs in data (already lowercased)"""
+        hits = set()
+        if not self.pattern_count:
+            return hits
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for byte in data:
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+# ============================
+# Protocol / Port Rule Index
+# ============================
+# Transport(s) each application-layer rule protocol can ride on
+APP_LAYER_TRANSPORTS = {
+    "http": ("tcp",), "http2": ("tcp",), "tls": ("tcp",), "ssh": ("tcp",),
+    "smtp": ("tcp",), "ftp": ("tcp",), "ftp-data": ("tcp",), "smb": ("tcp",),
+    "pop3": ("tcp",), "imap": ("tcp",), "modbus": ("tcp",), "mqtt": ("tcp",),
+    "pgsql": ("tcp",), "rfb": ("tcp",), "websocket": ("tcp",), "rdp": ("tcp",),
+    "dns": ("tcp", "udp"), "krb5": ("tcp", "udp"), "nfs": ("tcp", "udp"),
+    "dnp3": ("tcp", "udp"), "enip": ("tcp", "udp"), "sip": ("tcp", "udp"),
+    "dcerpc": ("tcp", "udp"), "mdns": ("udp",), "quic": ("udp",), "ntp": ("udp",),
+    "dhcp": ("udp",), "ike": ("udp",), "snmp": ("udp",), "tftp": ("udp",),
+}
+PACKET_PROTOS = ("tcp", "udp", "icmp", "ip")
+
+def rule_transports(proto):
+    """Packet protocols a rule with the given header protocol can match"""
+    proto = proto.lower()
+    if proto in ("tcp", "udp", "icmp"):
+        return (proto,)
+    return APP_LAYER_TRANSPORTS.get(proto, PACKET_PROTOS)
+
+def bucket_ports(port_set):
+    """Ports a rule should be filed under, or None when it needs the "any" bucket"""
+    if port_set is None or port_set.count > PORT_BUCKET_EXPAND_LIMIT:
+        return None
+    return port_set.ports()
+
+class RuleIndex:
+    """Rule ids bucketed by packet protocol and destination/source port.
+
+    Each rule lands in exactly one bucket kind per protocol: its destination
+    ports if it names any, else its source ports, else the "any" bucket, so
+    the buckets visited for one packet never overlap.
+    """
+
+    def __init__(self, rules):
+        self.buckets = {}
+        self.visits = Counter()
+        for rule_id, rule in enumerate(rules):
+            self.add(rule_id, rule)
+
+    def add(self, rule_id, rule):
+        if rule.direction == "<>":
+            dports = sports = None
+        else:
+            dports = bucket_ports(rule.dport_set)
+            sports = bucket_ports(rule.sport_set)
+        for proto in rule_transports(rule.proto):
+            if dports is not None:
+                keys = [(proto, "dport", port) for port in dports]
+            elif sports is not None:
+                keys = [(proto, "sport", port) for port in sports]
+            else:
+                keys = [(proto, "any", None)]
+            for key in keys:
+                self.buckets.setdefault(key, []).append(rule_id)
+
+    def lookup(self, proto, sport, dport):
+        """Buckets of rule ids that could match a packet with this header"""
+        found = []
+        for key in ((proto, "dport", dport), (proto, "sport", sport), (proto, "any", None)):
+            bucket = self.buckets.get(key)
+            if bucket:
+                found.append(bucket)
+                self.visits[key] += 1
+        return found
+
+    def bucket_sizes(self, top=None):
+        """(proto, kind, port, size, visits) rows, largest buckets first"""
+        rows = [(proto, kind, port, len(ids), self.visits[(proto, kind, port)])
+                for (proto, kind, port), ids in self.buckets.items()]
+        rows.sort(key=lambda row: (row[3], row[4]), reverse=True)
+        return rows[:top] if top else rows
+
+# ============================
+# Ruleset Capture Filter (BPF)
+# ============================
+IP_PROTO_NUMBERS = {"tcp": (6,), "udp": (17,), "icmp": (1, 58)}
+SO_ATTACH_FILTER, SO_DETACH_FILTER = 26, 27
+BPF_LD_H_ABS, BPF_LD_B_ABS, BPF_LD_H_IND = 0x28, 0x30, 0x48
+BPF_LDX_IMM, BPF_LDX_B_MSH = 0x01, 0xB1
+BPF_JEQ, BPF_JGT, BPF_JGE, BPF_JSET = 0x15, 0x25, 0x35, 0x45
+BPF_JA, BPF_RET = 0x05, 0x06
+BPF_ACCEPT = 0x40000
+
+class CaptureFilter:
+    """Kernel capture filter covering every packet some loaded rule could match.
+
+    Per transport the filter either passes everything (a rule with no port
+    constraint, or too many distinct port ranges) or only packets with a
+    port in one of the referenced ranges. A port may sit on either side so
+    both directions of a flow reach flow tracking and reassembly. Rules that
+    cannot be narrowed by packet protocol (on "ip" or a protocol such as
+    pkthdr) are left out, as the prefilter leaves out rules without content;
+    they only see the packets the other rules let through. Non-IP frames are
+    always dropped and IP fragments are passed since their ports cannot be read.
+    """
+
+    def __init__(self, rules):
+        self.unfiltered = 0  # rules left out of the filter
+        self.transports = {}  # transport -> merged port ranges, or None for every port
+        for rule in rules:
+            transports = rule_transports(rule.proto)
+            if "ip" in transports:
+                self.unfiltered += 1
+                continue
+            for transport in transports:
+                if self.transports.get(transport, []) is None:
+                    continue
+                ranges = self.rule_ranges(rule) if transport != "icmp" else None
+                if ranges is None:
+                    self.transports[transport] = None
+                else:
+                    self.transports[transport] = self.transports.get(transport, []) + ranges
+        for transport, ranges in self.transports.items():
+            if ranges is not None:
+                ranges = [tuple(r) for r in merge_ranges(ranges)]
+                self.transports[transport] = ranges if len(ranges) <= BPF_MAX_PORT_RANGES else None
+        self.expression = self.build_expression()
+        self.program = self.compile()
+
+    @staticmethod
+    def rule_ranges(rule):
+        """Ports one side of the rule's packets must use, or None for any"""
+        candidates = [port_set.ranges() for port_set in (rule.sport_set, rule.dport_set) if port_set is not None]
+        if not candidates:
+            return None
+        return min(candidates, key=len)
+
+    @property
+    def passthrough(self):
+        return not self.transports
+
+    def build_expression(self):
+        """The filter in tcpdump syntax, for display and use with external tools"""
+        if self.passthrough:
+            return ""
+        terms = []
+        for transport, ranges in sorted(self.transports.items()):
+            name = "(icmp or icmp6)" if transport == "icmp" else transport
+            if ranges is None:
+                terms.append(name)
+                continue
+            ports = " or ".join(f"port {low}" if low == high else f"portrange {low}-{high}" for low, high in ranges)
+            terms.append(f"({name} and ({ports}))")
+        return " or ".join(terms)
+
+    def compile(self):
+        """Classic BPF for Ethernet frames as (code, jt, jf, k) tuples; None for pass-through"""
+        if self.passthrough:
+            return None
+        program = [
+            (BPF_LD_H_ABS, 0, 0, 12),
+            (BPF_JEQ, 0, 6, 0x0800),
+            # IPv4: pass fragments, then X = IP header length, A = protocol
+            (BPF_LD_H_ABS, 0, 0, 20),
+            (BPF_JSET, 0, 1, 0x1FFF),
+            (BPF_RET, 0, 0, BPF_ACCEPT),
+            (BPF_LDX_B_MSH, 0, 0, 14),
+            (BPF_LD_B_ABS, 0, 0, 23),
+            (BPF_JA, 0, 0, 4),
+            (BPF_JEQ, 1, 0, 0x86DD),
+            (BPF_RET, 0, 0, 0),
+            # IPv6 without extension headers: X = 40, A = next header
+            (BPF_LDX_IMM, 0, 0, 40),
+            (BPF_LD_B_ABS, 0, 0, 20),
+        ]
+        dispatch = []
+        sections = []
+        for transport, ranges in sorted(self.transports.items()):
+            for number in IP_PROTO_NUMBERS[transport]:
+                dispatch.append((number, ranges))
+        dispatch_start = len(program)
+        section_start = dispatch_start + len(dispatch) + 1
+        for number, ranges in dispatch:
+            if ranges is None:
+                sections.append([(BPF_RET, 0, 0, BPF_ACCEPT)])
+            else:
+                sections.append(self.port_section(ranges))
+        offset = section_start
+        for i, (number, _) in enumerate(dispatch):
+            jump = offset - (dispatch_start + i) - 1
+            if jump > 255:
+                return None
+            program.append((BPF_JEQ, jump, 0, number))
+            offset += len(sections[i])
+        program.append((BPF_RET, 0, 0, 0))
+        for section in sections:
+            program.extend(section)
+        return program
+
+    @staticmethod
+    def port_section(ranges):
+        """Accept when the port at [14 + X] or [16 + X] falls in one of the ranges"""
+        section = []
+        for field in (14, 16):
+            section.append((BPF_LD_H_IND, 0, 0, field))
+            for low, high in ranges:
+                section.append((BPF_JGE, 0, 1, low))
+                section.append((BPF_JGT, 0, None, high))
+        section.append((BPF_RET, 0, 0, 0))
+        section.append((BPF_RET, 0, 0, BPF_ACCEPT))
+        accept = len(section) - 1
+        return [(code, jt, accept - i - 1 if jf is None else jf, k)
+                for i, (code, jt, jf, k) in enumerate(section)]
+
+    def accepts(self, proto, sport, dport):
+        """Whether the filter would pass a packet, mirroring the compiled program"""
+        if proto not in self.transports:
+            return self.passthrough
+        ranges = self.transports[proto]
+        if ranges is None:
+            return True
+        return any(low <= port <= high for port in (sport, dport) for low, high in ranges)
+
+    def estimate(self, flows):
+        """Share of packets in the tracked flows the filter would have dropped"""
+        total = dropped = 0
+        for key, flow in flows.items():
+            packets = flow.packets_toserver + flow.packets_toclient
+            total += packets
+            if not self.accepts(key[0], key[2], key[4]):
+                dropped += packets
+        return dropped, total
+
+    def attach(self, sock):
+        """Install the program on a packet socket with SO_ATTACH_FILTER"""
+        if self.program is None:
+            return False
+        insns = b"".join(struct.pack("HBBI", *insn) for insn in self.program)
+        buffer = ctypes.create_string_buffer(insns)
+        fprog = struct.pack("HL", len(self.program), ctypes.addressof(buffer))
+        sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+        return True
+
+# ============================
+# Advanced Threat Intelligence
+# ============================
+class BloomFilter:
+    """Read-only Bloom filter over a memory-mapped file.
+
+    The file is a header followed by the bit array. Opening it maps the
+    pages shared, so every process using the same feed shares one copy.
+    Bit positions come from double hashing one 128-bit BLAKE2b digest.
+    """
+
+    MAGIC = b"NWBLOOM1"
+    # magic, bits, hashes, entries, fp rate, feed digest, IPv4 prefix mask, IPv6 prefix mask (hi, lo)
+    HEADER = struct.Struct("!8sQIQd32sQQQ")
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.bits, self.hashes, self.entries, self.fp_rate, self.digest,
+         v4_mask, v6_high, v6_low) = self.HEADER.unpack_from(self.map, 0)
+        if magic != self.MAGIC or len(self.map) < self.HEADER.size + (self.bits + 7) // 8:
+            raise ValueError(f"not a NetWatch Bloom file: {path}")
+        # (key prefix, netmask) per prefix length in an IP feed, most specific first
+        self.prefixes = {
+            version: [(bytes((version, length)), (1 << width) - (1 << (width - length)))
+                      for length in range(width, -1, -1) if mask >> length & 1]
+            for version, width, mask in ((4, 32, v4_mask), (6, 128, v6_high << 64 | v6_low))
+        }
+        self.queries = 0
+        self.passes = 0
+        self.false_positives = 0
+
+    @staticmethod
+    def positions(key, bits, hashes):
+        value = int.from_bytes(hashlib.blake2b(key, digest_size=16).digest(), "little")
+        first = value & 0xFFFFFFFFFFFFFFFF
+        step = (value >> 64) % (bits - 1) + 1
+        return [position % bits for position in range(first, first + hashes * step, step)]
+
+    def __contains__(self, key):
+        # Same positions as positions(), but stops at the first clear bit so misses stay cheap
+        value = int.from_bytes(hashlib.blake2b(key, digest_size=16).digest(), "little")
+        position = value & 0xFFFFFFFFFFFFFFFF
+        bits = self.bits
+        step = (value >> 64) % (bits - 1) + 1
+        data = self.map
+        base = self.HEADER.size
+        for _ in range(self.hashes):
+            bit = position % bits
+            if not data[base + (bit >> 3)] >> (bit & 7) & 1:
+                return False
+            position += step
+        return True
+
+    def check(self, keys):
+        """True if any key may be present; counted in the filter's stats"""
+        self.queries += 1
+        if any(key in self for key in keys):
+            self.passes += 1
+            return True
+        return False
+
+    @classmethod
+    def build(cls, path, keys, count, fp_rate, digest, prefixes=None, probes=1):
+        """Size a filter for count keys at fp_rate over probes lookups, write it to path and open it"""
+        count = max(count, 1)
+        # A prime size keeps every nonzero double-hashing step coprime with it, so the k positions stay distinct
+        bits = next_prime(max(64, int(-count * math.log(fp_rate / probes) / math.log(2) ** 2)))
+        hashes = max(1, round(bits / count * math.log(2)))
+        array_bits = bytearray((bits + 7) // 8)
+        for key in keys:
+            for bit in cls.positions(key, bits, hashes):
+                array_bits[bit >> 3] |= 1 << (bit & 7)
+        v4_mask = sum(1 << length for length in (prefixes or {}).get(4, ()))
+        v6_mask = sum(1 << length for length in (prefixes or {}).get(6, ()))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, bits, hashes, count, fp_rate, digest,
+                                    v4_mask, v6_mask >> 64, v6_mask & (1 << 64) - 1))
+            f.write(array_bits)
+        os.replace(temp, path)
+        return cls(path)
+
+    def stats(self):
+        return {"entries": self.entries, "bits": self.bits, "hashes": self.hashes,
+                "fp_rate": self.fp_rate, "bytes": len(self.map), "queries": self.queries,
+                "passes": self.passes, "false_positives": self.false_positives}
+
+def next_prime(n):
+    candidate = n | 1
+    while any(candidate % d == 0 for d in range(3, math.isqrt(candidate) + 1, 2)):
+        candidate += 2
+    return candidate
+
+def intel_token(line):
+    """The indicator on a feed line, without comments and extra columns; None if blank"""
+    token = line.split("#", 1)[0].strip().split(",", 1)[0].split(None, 1)
+    return token[0] if token else None
+
+def ip_bloom_key(version, length, network):
+    return bytes((version, length)) + network.to_bytes(16 if version == 6 else 4, "big")
+
+def domain_bloom_keys(name):
+    """The name and each parent domain, longest first"""
+    labels = name.split(".")
+    return (".".join(labels[i:]).encode() for i in range(len(labels)))
+
+def load_intel_bloom(kind, path):
+    """Open the Bloom file for a feed, rebuilding it if the feed or FP rate changed.
+
+    None when the feed has fewer than INTEL_BLOOM_MIN_ENTRIES indicators.
+    """
+    digest = bytes.fromhex(file_digest(path))
+    bloom_path = os.path.join(INTEL_BLOOM_DIR, f"{kind}.bloom")
+    try:
+        bloom = BloomFilter(bloom_path)
+        if bloom.digest == digest and bloom.fp_rate == INTEL_BLOOM_FP_RATE:
+            return bloom if bloom.entries >= INTEL_BLOOM_MIN_ENTRIES else None
+    except (OSError, ValueError, struct.error):
+        pass
+    started = time.perf_counter()
+    prefixes = {4: set(), 6: set()}
+
+    def keys():
+        with open(path, "r", errors="ignore") as f:
+            for line in f:
+                token = intel_token(line)
+                if token is None:
+                    continue
+                if kind == "malicious_ips":
+                    parsed = parse_intel_network(token)
+                    if parsed is None:
+                        continue
+                    version, low, high = parsed
+                    length = (128 if version == 6 else 32) - (high - low).bit_length()
+                    prefixes[version].add(length)
+                    yield ip_bloom_key(version, length, low)
+                else:
+                    yield token.strip(".").lower().encode()
+
+    count = sum(1 for _ in keys())
+    if count < INTEL_BLOOM_MIN_ENTRIES:
+        return None
+    # An address is probed once per prefix length in the feed, so each probe gets a share of the rate
+    probes = max(len(prefixes[4]), len(prefixes[6]), 1)
+    bloom = BloomFilter.build(bloom_path, keys(), count, INTEL_BLOOM_FP_RATE, digest, prefixes, probes)
+    console.log(f"[green]Built {kind} Bloom filter: {count} entries, {bloom.bits // 8 / 1048576:.1f} MB, "
+                f"{bloom.hashes} hashes in {time.perf_counter() - started:.1f}s[/green]")
+    return bloom
+
+class IntelRangeSet:
+    """IP threat intel as sorted, merged integer ranges searched with bisect.
+
+    IPv4 ranges live in two uint32 arrays (8 bytes per range however many
+    entries a feed has); IPv6 ranges, which arrays cannot hold, in int lists.
+    Single addresses and CIDR blocks are both accepted.
+    """
+
+    __slots__ = ("starts", "ends", "entries", "invalid", "bloom")
+
+    def __init__(self):
+        self.starts = {4: array("I"), 6: []}
+        self.ends = {4: array("I"), 6: []}
+        self.entries = 0
+        self.invalid = 0
+        self.bloom = None
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Parse one IP or CIDR per line; '#' comments, blanks and extra columns are ignored"""
+        intel = cls()
+        pending = {4: array("Q"), 6: []}  # IPv4 packed as start << 32 | end so one sort orders both
+        for line in lines:
+            text = line.strip()
+            if not text or text[0] == "#":
+                continue
             try:
-                with open(os.path.join(RULES_DIR, fname), "r") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith("#"):
-                            continue
-                        try:
-                            rule = parse_rule(line)
-                            if rule:
-                                rules.append(rule)
-                        except Exception as e:
-                            # Skip malformed rules silently for professional rulesets
-                            pass
-                console.log(f"[green]Loaded professional rules from {fname}[/green]")
-            except Exception as e:
-                console.log(f"[red]Error loading {fname}: {e}[/red]")
+                # Fast path for the common bare IPv4 address line
+                value = int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+                pending[4].append(value << 32 | value)
+                intel.entries += 1
+                continue
+            except OSError:
+                pass
+            token = intel_token(text)
+            if token is None:
+                continue
+            parsed = parse_intel_network(token)
+            if parsed is None:
+                intel.invalid += 1
+                continue
+            version, low, high = parsed
+            if version == 4:
+                pending[4].append(low << 32 | high)
+            else:
+                pending[6].append((low, high))
+            intel.entries += 1
+        if pending[4]:
+            # Sort the packed IPv4 words in place rather than as a list of Python ints
+            np.frombuffer(pending[4], dtype=np.uint64).sort()
+        pending[6].sort()
+        for version, packed in pending.items():
+            previous_end = -1
+            starts, ends = intel.starts[version], intel.ends[version]
+            for item in packed:
+                low, high = (item >> 32, item & 0xFFFFFFFF) if version == 4 else item
+                if starts and low <= previous_end + 1:
+                    if high > previous_end:
+                        ends[-1] = previous_end = high
+                    continue
+                starts.append(low)
+                ends.append(high)
+                previous_end = high
+        return intel
+
+    def contains(self, address, version=4):
+        bloom = self.bloom
+        if bloom is not None:
+            # One probe per prefix length present in the feed
+            bloom.queries += 1
+            size = 16 if version == 6 else 4
+            for head, mask in bloom.prefixes[version]:
+                if head + (address & mask).to_bytes(size, "big") in bloom:
+                    bloom.passes += 1
+                    break
+            else:
+                return False
+            if not INTEL_EXACT_CHECK:
+                return True
+        starts = self.starts[version]
+        pos = bisect.bisect_right(starts, address) - 1
+        if pos >= 0 and address <= self.ends[version][pos]:
+            return True
+        if bloom is not None:
+            bloom.false_positives += 1
+        return False
+
+    def __contains__(self, ip):
+        try:
+            packed = socket.inet_pton(socket.AF_INET6 if ":" in ip else socket.AF_INET, ip)
+        except (OSError, TypeError):
+            return False
+        return self.contains(int.from_bytes(packed, "big"), 6 if len(packed) == 16 else 4)
+
+    def __len__(self):
+        return self.entries if self.entries or self.bloom is None else self.bloom.entries
+
+    def ranges(self):
+        return len(self.starts[4]) + len(self.starts[6])
+
+    def memory_bytes(self):
+        return (self.starts[4].itemsize * len(self.starts[4]) * 2 +
+                sum(sys.getsizeof(value) for value in self.starts[6]) * 2)
+
+def parse_intel_network(text):
+    """(version, first, last) for an IP or CIDR string, or None if it is neither"""
+    address, _, prefix = text.partition("/")
+    family = socket.AF_INET6 if ":" in address else socket.AF_INET
+    try:
+        value = int.from_bytes(socket.inet_pton(family, address), "big")
+    except OSError:
+        return None
+    bits = 128 if family == socket.AF_INET6 else 32
+    length = bits
+    if prefix:
+        if not prefix.isdigit() or int(prefix) > bits:
+            return None
+        length = int(prefix)
+    host_mask = (1 << (bits - length)) - 1
+    low = value & ~host_mask
+    return (6 if bits == 128 else 4), low, low | host_mask
+
+class DomainIntel:
+    """Listed domains in a reversed-label suffix trie with an LRU of qname verdicts.
+
+    Listing evil.com also matches a.b.evil.com; a lookup walks at most one
+    trie level per label of the queried name.
+    """
+
+    def __init__(self, domains=(), cache_size=DOMAIN_CACHE_SIZE):
+        self.trie = {}
+        self.bloom = None
+        self.entries = 0
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain):
+        domain = domain.strip().strip(".").lower()
+        if not domain:
+            return
+        node = self.trie
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if "" not in node:
+            self.entries += 1
+        node[""] = domain  # labels are never empty, so "" marks a listed suffix
+        self.cache.clear()
+
+    def match(self, name):
+        """The listed domain that name is, or is under; None if it is clean"""
+        name = name.rstrip(".").lower()
+        cache = self.cache
+        if name in cache:
+            self.hits += 1
+            cache.move_to_end(name)
+            return cache[name]
+        self.misses += 1
+        listed = self.lookup(name)
+        cache[name] = listed
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return listed
+
+    def lookup(self, name):
+        """Uncached match: the Bloom filter first, the trie only on a Bloom hit"""
+        bloom = self.bloom
+        if bloom is not None:
+            if not INTEL_EXACT_CHECK:
+                hit = next((key for key in domain_bloom_keys(name) if key in bloom), None)
+                bloom.queries += 1
+                bloom.passes += hit is not None
+                return hit.decode() if hit is not None else None
+            if not bloom.check(domain_bloom_keys(name)):
+                return None
+        node = self.trie
+        for label in reversed(name.split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            if "" in node:
+                return node[""]
+        if bloom is not None:
+            bloom.false_positives += 1
+        return None
+
+    def __contains__(self, name):
+        return self.match(name) is not None
+
+    def __len__(self):
+        return self.entries if self.entries or self.bloom is None else self.bloom.entries
+
+class HashIntel:
+    """File hash indicators: a Bloom filter and, with INTEL_EXACT_CHECK, the exact set"""
+
+    def __init__(self, hashes=(), bloom=None):
+        self.hashes = set(value.lower() for value in hashes)
+        self.bloom = bloom
+
+    def __contains__(self, value):
+        value = value.lower()
+        bloom = self.bloom
+        if bloom is not None:
+            if not bloom.check((value.encode(),)):
+                return False
+            if not INTEL_EXACT_CHECK:
+                return True
+        if value in self.hashes:
+            return True
+        if bloom is not None:
+            bloom.false_positives += 1
+        return False
+
+    def __len__(self):
+        return len(self.hashes) if self.hashes or self.bloom is None else self.bloom.entries
+
+def read_dns_name(data, offset):
+    """Decode a possibly compressed DNS name; (name, offset after it) or (None, None)"""
+    labels = []
+    end = None
+    for _ in range(128):  # bounds label count and compression pointer chains
+        if offset >= len(data):
+            return None, None
+        length = data[offset]
+        if length == 0:
+            name = b".".join(labels).decode("ascii", "replace").lower()
+            return name, end if end is not None else offset + 1
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                return None, None
+            if end is None:
+                end = offset + 2
+            offset = (length & 0x3F) << 8 | data[offset + 1]
+        elif length & 0xC0:
+            return None, None
+        else:
+            labels.append(data[offset + 1:offset + 1 + length])
+            offset += 1 + length
+    return None, None
+
+DNS_NAME_RDATA = (2, 5, 12)  # NS, CNAME and PTR answers carry a domain name
+
+def parse_dns_names(payload, tcp=False):
+    """Query names, answer owner names and NS/CNAME/PTR targets of a DNS message"""
+    if tcp:
+        payload = payload[2:]  # DNS over TCP has a two-byte length prefix
+    if len(payload) < 12:
+        return []
+    questions, answers = struct.unpack_from("!HH", payload, 4)
+    names = []
+    offset = 12
+    for _ in range(min(questions, 16)):
+        name, offset = read_dns_name(payload, offset)
+        if name is None:
+            return names
+        names.append(name)
+        offset += 4  # qtype, qclass
+    for _ in range(min(answers, 32)):
+        name, offset = read_dns_name(payload, offset)
+        if name is None or offset + 10 > len(payload):
+            break
+        names.append(name)
+        rtype, _, _, rdlength = struct.unpack_from("!HHIH", payload, offset)
+        offset += 10
+        if rtype in DNS_NAME_RDATA:
+            target, _ = read_dns_name(payload, offset)
+            if target:
+                names.append(target)
+        offset += rdlength
+    return list(dict.fromkeys(name for name in names if name))
+
+DNS_STATS = Counter()
+
+def dns_intel_alerts(info, anomalies):
+    """Alerts for DNS names in the packet that fall under a listed domain"""
+    if info.proto not in ("udp", "tcp") or DNS_PORT not in (info.sport, info.dport):
+        return [], None
+    names = parse_dns_names(info.payload, info.proto == "tcp")
+    DNS_STATS["messages"] += 1
+    DNS_STATS["names"] += len(names)
+    alerts = []
+    for name in names:
+        listed = THREAT_INTEL["malicious_domains"].match(name)
+        if listed is None:
+            continue
+        DNS_STATS["intel_hits"] += 1
+        alerts.append({
+            "msg": f"THREAT-INTEL DNS name {name} is under listed domain {listed}",
+            "sid": DNS_INTEL_SID,
+            "src": info.src,
+            "dst": info.dst,
+            "sport": info.sport,
+            "dport": info.dport,
+            "proto": info.proto,
+            "timestamp": time.time(),
+            "packet_size": info.length,
+            "rule_class": "threat-intel",
+            "behavioral_anomalies": anomalies,
+            "domain": name,
+        })
+    return alerts, names[0] if names else None
+
+THREAT_INTEL = {
+    "malicious_ips": IntelRangeSet(),
+    "malicious_domains": DomainIntel(),
+    "malicious_hashes": HashIntel(),
+    "cve_database": {},
+    "reputation_cache": {}
+}
+
+# Behavioral Analysis
+BASELINE_PORT_ROWS = {"tcp": 0, "udp": 1}
+BASELINE_PROTOCOLS = ("tcp", "udp", "icmp", "ip")
+
+class BehavioralBaseline:
+    """Exponentially decayed traffic baseline in fixed-size NumPy arrays.
+
+    Ports are counted in one 65,536-slot array per protocol with ports, so
+    memory stays constant whatever the traffic. Rather than touching every
+    slot per packet, the decay is applied to the whole arrays at most once
+    per decay_interval seconds of packet time.
+    """
+
+    def __init__(self, half_life=BASELINE_HALF_LIFE, decay_interval=BASELINE_DECAY_INTERVAL):
+        self.half_life = half_life
+        self.decay_interval = decay_interval
+        self.ports = np.zeros((len(BASELINE_PORT_ROWS), 65536), dtype=np.float32)
+        self.slots = self.ports.reshape(-1)  # row * 65536 + port, a view of ports
+        self.protocols = np.zeros(len(BASELINE_PROTOCOLS))
+        self.volume = 0.0
+        self.packets = 0
+        self.anomalies = 0
+        self.decayed_at = None
+
+    def decay(self, now):
+        if self.decayed_at is None:
+            self.decayed_at = now
+            return
+        elapsed = now - self.decayed_at
+        if elapsed < self.decay_interval:
+            return
+        factor = 0.5 ** (elapsed / self.half_life)
+        self.ports *= factor
+        self.protocols *= factor
+        self.volume *= factor
+        self.decayed_at = now
+
+    def observe(self, info):
+        """Add one packet"""
+        self.decay(info.timestamp)
+        row = BASELINE_PORT_ROWS.get(info.proto)
+        if row is not None:
+            ports = self.ports[row]
+            if info.sport is not None:
+                ports[info.sport] += 1
+            if info.dport is not None:
+                ports[info.dport] += 1
+        self.protocols[BASELINE_PROTOCOLS.index(info.proto)] += 1
+        self.volume += info.length
+        self.packets += 1
+
+    def port_count(self, proto, port):
+        row = BASELINE_PORT_ROWS.get(proto)
+        return float(self.ports[row, port]) if row is not None and port is not None else None
+
+    def observe_batch(self, infos):
+        """Add a batch of packets; (unusual port, large transfer) boolean arrays for it"""
+        count = len(infos)
+        self.decay(max(info.timestamp for info in infos))
+        rows = np.fromiter((BASELINE_PORT_ROWS.get(info.proto, -1) for info in infos), np.int64, count)
+        sports = np.fromiter((-1 if info.sport is None else info.sport for info in infos), np.int64, count)
+        dports = np.fromiter((-1 if info.dport is None else info.dport for info in infos), np.int64, count)
+        lengths = np.fromiter((info.length for info in infos), np.int64, count)
+        protocols = np.fromiter((BASELINE_PROTOCOLS.index(info.proto) for info in infos), np.int64, count)
+        has_dport = (rows >= 0) & (dports >= 0)
+        # Each packet's source then destination slot, in arrival order; -1 where there is none
+        pairs = np.stack((np.where((rows >= 0) & (sports >= 0), rows * 65536 + sports, -1),
+                          np.where(has_dport, rows * 65536 + dports, -1)), axis=1).ravel()
+        valid = pairs >= 0
+        slots = pairs[valid]
+        # Occurrences of each slot so far within the batch, this one included
+        order = np.argsort(slots, kind="stable")
+        ordered = slots[order]
+        positions = np.arange(len(ordered))
+        run_starts = np.maximum.accumulate(np.where(np.r_[True, ordered[1:] != ordered[:-1]], positions, 0))
+        seen = np.empty(len(slots))
+        seen[order] = positions - run_starts + 1
+        # Score against the pre-batch counts plus the running count, as the per-packet path would
+        running = np.zeros(len(pairs))
+        running[valid] = self.slots[slots] + seen
+        unusual = has_dport & (running[1::2] < BASELINE_MIN_PORT_COUNT)
+        # Repeated slots in a batch must all count, which plain fancy-index += would not do
+        distinct, hits = np.unique(slots, return_counts=True)
+        self.slots[distinct] += hits
+        self.protocols += np.bincount(protocols, minlength=len(BASELINE_PROTOCOLS))
+        self.volume += float(lengths.sum())
+        self.packets += count
+        return unusual, lengths > BASELINE_LARGE_TRANSFER
+
+    def memory_bytes(self):
+        return self.ports.nbytes + self.protocols.nbytes
+
+    def stats(self):
+        return {"packets": self.packets, "anomalies": self.anomalies, "decayed_bytes": self.volume,
+                "protocols": dict(zip(BASELINE_PROTOCOLS, self.protocols.round(1).tolist())),
+                "ports_seen": int(np.count_nonzero(self.ports >= BASELINE_MIN_PORT_COUNT)),
+                "memory_bytes": self.memory_bytes()}
+
+BEHAVIORAL_BASELINE = BehavioralBaseline()
+
+# ============================
+# Event / Alert Handling
+# ============================
+def load_threat_intelligence():
+    """Load threat intelligence feeds.
+
+    With INTEL_BLOOM, feeds of INTEL_BLOOM_MIN_ENTRIES or more get a memory-mapped
+    Bloom filter in front of their exact store; INTEL_EXACT_CHECK = False skips
+    loading those exact stores.
+    """
+    blooms = {}
+    for kind, path in INTEL_FEEDS.items():
+        bloom = load_intel_bloom(kind, path) if INTEL_BLOOM and os.path.exists(path) else None
+        if bloom is not None:
+            blooms[kind] = bloom
+    
+    # Load malicious IPs
+    malicious_ips_file = INTEL_FEEDS["malicious_ips"]
+    if os.path.exists(malicious_ips_file):
+        with open(malicious_ips_file, 'r') as f:
+            ips = IntelRangeSet.from_lines(f if INTEL_EXACT_CHECK or "malicious_ips" not in blooms else ())
+        ips.bloom = blooms.get("malicious_ips")
+        THREAT_INTEL["malicious_ips"] = ips
+    
+    # Load malicious domains
+    malicious_domains_file = INTEL_FEEDS["malicious_domains"]
+    if os.path.exists(malicious_domains_file):
+        with open(malicious_domains_file, 'r') as f:
+            domains = DomainIntel(line.split("#", 1)[0] for line in f
+                                  if INTEL_EXACT_CHECK or "malicious_domains" not in blooms)
+        domains.bloom = blooms.get("malicious_domains")
+        THREAT_INTEL["malicious_domains"] = domains
+    
+    # Load malicious file hashes
+    malicious_hashes_file = INTEL_FEEDS["malicious_hashes"]
+    if os.path.exists(malicious_hashes_file):
+        with open(malicious_hashes_file, 'r') as f:
+            hashes = (intel_token(line) for line in f
+                      if INTEL_EXACT_CHECK or "malicious_hashes" not in blooms)
+            THREAT_INTEL["malicious_hashes"] = HashIntel((value for value in hashes if value),
+                                                         blooms.get("malicious_hashes"))
+    
+    ips = THREAT_INTEL["malicious_ips"]
+    console.log(f"[green]Loaded {len(ips)} malicious IPs/CIDRs ({ips.ranges()} ranges, {ips.invalid} invalid), "
+                f"{len(THREAT_INTEL['malicious_domains'])} malicious domains and "
+                f"{len(THREAT_INTEL['malicious_hashes'])} malicious hashes[/green]")
+
+def check_threat_intelligence(ip, domain=None, file_hash=None):
+    """Check if IP/domain/file hash is in threat intelligence"""
+    threat_score = 0
+    if ip in THREAT_INTEL["malicious_ips"]:
+        threat_score += 100
+    if domain and domain in THREAT_INTEL["malicious_domains"]:
+        threat_score += 100
+    if file_hash and file_hash in THREAT_INTEL["malicious_hashes"]:
+        threat_score += 100
+    return threat_score
+
+def update_behavioral_baseline(info):
+    """Update behavioral baseline for anomaly detection"""
+    BEHAVIORAL_BASELINE.observe(info)
+
+def unusual_port_anomaly(port):
+    return {
+        "type": "unusual_port",
+        "severity": "medium",
+        "description": f"Unusual port {port} usage detected"
+    }
+
+def large_transfer_anomaly(length):
+    return {
+        "type": "large_transfer",
+        "severity": "high",
+        "description": f"Large data transfer detected: {length} bytes"
+    }
+
+def detect_anomalies(info):
+    """Detect behavioral anomalies"""
+    anomalies = []
+    
+    # Check for unusual port usage
+    count = BEHAVIORAL_BASELINE.port_count(info.proto, info.dport)
+    if count is not None and count < BASELINE_MIN_PORT_COUNT:
+        anomalies.append(unusual_port_anomaly(info.dport))
     
-    console.log(f"[green]Total professional rules loaded: {len(rules)}[/green]")
-    return rules
+    # Check for large data transfers
+    if info.length > BASELINE_LARGE_TRANSFER:
+        anomalies.append(large_transfer_anomaly(info.length))
+    
+    BEHAVIORAL_BASELINE.anomalies += len(anomalies)
+    return anomalies
+
+def detect_batch_anomalies(infos):
+    """Baseline update and anomaly check for a whole batch; one anomaly list per packet"""
+    anomalies = [[] for _ in infos]
+    if not infos:
+        return anomalies
+    unusual, large = BEHAVIORAL_BASELINE.observe_batch(infos)
+    for i in np.flatnonzero(unusual).tolist():
+        anomalies[i].append(unusual_port_anomaly(infos[i].dport))
+    for i in np.flatnonzero(large).tolist():
+        anomalies[i].append(large_transfer_anomaly(infos[i].length))
+    BEHAVIORAL_BASELINE.anomalies += int(unusual.sum() + large.sum())
+    return anomalies
+
+class CorrelationEngine:
+    """Sliding-window alert counts per correlation key and decaying host threat scores.
+
+    Each key holds a deque of [second, count] buckets covering the window, so a
+    key costs at most one bucket per second however fast it alerts. Keys sit in
+    an OrderedDict in order of their last alert and idle ones are popped off the
+    front, keeping the work per alert O(1) amortized. Host scores halve every
+    half_life seconds and are evicted from the least recently scored end once
+    they fade below min_score.
+    """
+
+    def __init__(self, keys=None, window=CORRELATION_WINDOW, max_keys=CORRELATION_MAX_KEYS,
+                 half_life=THREAT_SCORE_HALF_LIFE, min_score=THREAT_SCORE_MIN,
+                 max_hosts=THREAT_SCORE_MAX_HOSTS):
+        self.keys = dict(CORRELATION_KEYS if keys is None else keys)
+        for kind in self.keys:
+            if kind not in ("sid", "sid_src", "src"):
+                raise ValueError(f"unknown correlation key: {kind}")
+        self.window = window
+        self.max_keys = max_keys
+        self.half_life = half_life
+        self.min_score = min_score
+        self.max_hosts = max_hosts
+        self.windows = OrderedDict()  # key -> [buckets, alerts in window, last alert time, last src]
+        self.scores = OrderedDict()  # host -> [score, time it was last updated]
+        self.escalations = 0
+        self.expired_keys = 0
+        self.evicted_hosts = 0
+
+    @staticmethod
+    def key(kind, alert):
+        if kind == "sid":
+            return kind, alert.get("sid", "0")
+        if kind == "sid_src":
+            return kind, alert.get("sid", "0"), alert.get("src", "")
+        return kind, alert.get("src", "")
+
+    def count(self, key, now, src=""):
+        """Record one alert for key; the number of its alerts inside the window"""
+        windows = self.windows
+        state = windows.get(key)
+        if state is None:
+            state = windows[key] = [deque(), 0, now, src]
+        else:
+            windows.move_to_end(key)
+        buckets = state[0]
+        second = int(now)
+        if buckets and buckets[-1][0] >= second:
+            buckets[-1][1] += 1
+        else:
+            buckets.append([second, 1])
+        state[1] += 1
+        state[2] = now
+        state[3] = src
+        horizon = second - self.window
+        while buckets[0][0] <= horizon:
+            state[1] -= buckets.popleft()[1]
+        self.expire(now)
+        return state[1]
+
+    def expire(self, now):
+        """Drop keys with no alert inside the window, and the oldest past max_keys"""
+        windows = self.windows
+        horizon = now - self.window
+        while windows:
+            key, state = next(iter(windows.items()))
+            if state[2] > horizon and len(windows) <= self.max_keys:
+                break
+            del windows[key]
+            self.expired_keys += 1
+
+    def decayed(self, entry, now):
+        return entry[0] * 0.5 ** (max(0.0, now - entry[1]) / self.half_life)
+
+    def add_score(self, host, points, now):
+        scores = self.scores
+        entry = scores.get(host)
+        if entry is None:
+            scores[host] = [points, now]
+        else:
+            entry[0] = self.decayed(entry, now) + points
+            entry[1] = now
+            scores.move_to_end(host)
+        while scores:
+            oldest, entry = next(iter(scores.items()))
+            if len(scores) <= self.max_hosts and self.decayed(entry, now) >= self.min_score:
+                break
+            del scores[oldest]
+            self.evicted_hosts += 1
+
+    def score(self, host, now=None):
+        """A host's threat score decayed to now"""
+        entry = self.scores.get(host)
+        if entry is None:
+            return 0.0
+        return self.decayed(entry, time.time() if now is None else now)
+
+    def correlate(self, alert, threat_score, now):
+        """Count the alert under every configured key; the counts and the keys that escalated"""
+        src = alert.get("src", "")
+        counts = {kind: self.count(self.key(kind, alert), now, src) for kind in self.keys}
+        if threat_score:
+            self.add_score(src, threat_score, now)
+            self.add_score(alert.get("dst", ""), threat_score, now)
+        escalated = [kind for kind, count in counts.items() if count >= self.keys[kind]]
+        if escalated:
+            self.escalations += 1
+        return counts, escalated
+
+    def recent(self, limit=10):
+        """(key, last alert time, alerts in window, last src) for the most recently alerting keys"""
+        now = time.time()
+        rows = []
+        for key in reversed(self.windows):
+            buckets, alerts, last, src = self.windows[key]
+            if last <= now - self.window:
+                break
+            rows.append((key, last, alerts, src))
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def active(self):
+        self.expire(time.time())
+        return len(self.windows)
+
+    def clear(self):
+        self.windows.clear()
+        self.scores.clear()
+
+    def stats(self):
+        return {"keys": len(self.windows), "hosts": len(self.scores), "escalations": self.escalations,
+                "expired_keys": self.expired_keys, "evicted_hosts": self.evicted_hosts}
+
+CORRELATION = CorrelationEngine()
+
+def correlate_alert(alert):
+    """Enhanced alert correlation with threat scoring"""
+    src_ip = alert.get("src", "")
+    dst_ip = alert.get("dst", "")
+    now = alert.get("timestamp") or time.time()
+    
+    # Calculate threat score
+    threat_score = check_threat_intelligence(src_ip, alert.get("domain")) + check_threat_intelligence(dst_ip)
+    counts, escalated = CORRELATION.correlate(alert, threat_score, now)
+    alert["correlation"] = counts
+    
+    # Escalation logic
+    if escalated:
+        alert["escalated"] = True
+        alert["escalated_by"] = escalated
+        alert["msg"] = f"[ESCALATED] {alert['msg']}"
+        alert["threat_score"] = threat_score + 50
+    else:
+        alert["escalated"] = False
+        alert["threat_score"] = threat_score
+    
+    # Add behavioral analysis
+    alert["behavioral_anomalies"] = []
+    
+    return alert
+
+# ============================
+# Top Talkers
+# ============================
+TOP_TALKER_DIMENSIONS = ("src", "dst", "pair")
+TOP_TALKER_METRICS = ("packets", "bytes")
+
+class CountMinSketch:
+    """depth x width counters; estimates never undercount and overcount by at most
+    e / width of the total with probability 1 - e ** -depth.
+
+    Keys arrive as 64-bit hashes, split into two halves for double hashing.
+    """
+
+    def __init__(self, width=TOP_TALKERS_WIDTH, depth=TOP_TALKERS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.cells = self.table.reshape(-1)  # row * width + column, a view of table
+        self.rows = np.arange(depth, dtype=np.uint64)[:, None]
+        self.row_starts = np.arange(depth, dtype=np.intp)[:, None] * width
+        self.total = 0
+
+    def slots(self, hashes):
+        """Flat cell index of each hash in every row, shaped (depth, len(hashes))"""
+        first = hashes & np.uint64(0xFFFFFFFF)
+        step = hashes >> np.uint64(32) | np.uint64(1)
+        return ((first + self.rows * step) % np.uint64(self.width)).astype(np.intp) + self.row_starts
+
+    def add(self, hashes, amounts):
+        np.add.at(self.cells, self.slots(hashes).ravel(), np.tile(amounts, self.depth))
+        self.total += int(amounts.sum())
+
+    def estimate(self, hashes):
+        return self.cells[self.slots(hashes)].min(axis=0)
+
+    def memory_bytes(self):
+        return self.table.nbytes
+
+class HeavyHitters:
+    """The k keys with the largest sketch estimates, behind a lazily cleaned min-heap"""
+
+    def __init__(self, k=TOP_TALKERS_K):
+        self.k = k
+        self.counts = {}
+        self.heap = []
+
+    def threshold(self):
+        """The smallest count held once there are k keys; 0 until then"""
+        counts = self.counts
+        if len(counts) < self.k:
+            return 0
+        heap = self.heap
+        # Entries whose count has moved on are stale; drop them until the top is current
+        while counts.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0][0]
+
+    def offer(self, key, estimate):
+        counts = self.counts
+        current = counts.get(key)
+        if current == estimate:
+            return
+        if current is None and len(counts) >= self.k:
+            if estimate <= self.threshold():
+                return
+            del counts[heapq.heappop(self.heap)[1]]
+        counts[key] = estimate
+        heapq.heappush(self.heap, (estimate, key))
+        if len(self.heap) > 4 * self.k:
+            self.heap = [(count, key) for key, count in counts.items()]
+            heapq.heapify(self.heap)
+
+    def top(self, limit=None):
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+class TopTalkers:
+    """Streaming top-K sources, destinations and pairs by packets and bytes in fixed memory.
+
+    Packets are buffered and folded in per batch: repeated keys are summed in
+    Python, then the sketches are updated and queried with one NumPy call per
+    dimension and metric.
+    """
+
+    def __init__(self, k=TOP_TALKERS_K, width=TOP_TALKERS_WIDTH, depth=TOP_TALKERS_DEPTH,
+                 batch_size=CAPTURE_BATCH_SIZE):
+        self.k = k
+        self.batch_size = batch_size
+        self.sketches = {(dimension, metric): CountMinSketch(width, depth)
+                         for dimension in TOP_TALKER_DIMENSIONS for metric in TOP_TALKER_METRICS}
+        self.hitters = {key: HeavyHitters(k) for key in self.sketches}
+        self.pending = []
+        self.exported_at = 0.0
+
+    def observe(self, info):
+        self.pending.append((info.src, info.dst, info.length))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        count = len(pending)
+        sources, destinations, lengths = zip(*pending)
+        lengths = np.array(lengths, dtype=np.int64)
+        for dimension, names in (("src", sources), ("dst", destinations), ("pair", list(zip(sources, destinations)))):
+            hashes = np.fromiter(map(hash, names), np.int64, count).view(np.uint64)
+            # One sketch update per distinct key in the batch
+            hashes, first, inverse = np.unique(hashes, return_index=True, return_inverse=True)
+            amounts = {"packets": np.bincount(inverse),
+                       "bytes": np.bincount(inverse, weights=lengths).astype(np.int64)}
+            for metric in TOP_TALKER_METRICS:
+                sketch = self.sketches[dimension, metric]
+                sketch.add(hashes, amounts[metric])
+                estimates = sketch.estimate(hashes)
+                hitters = self.hitters[dimension, metric]
+                # Only keys that could enter or are already in the top-K reach the heap
+                for j in np.flatnonzero(estimates >= hitters.threshold()).tolist():
+                    hitters.offer(names[first[j]], int(estimates[j]))
+
+    def top(self, dimension, metric, limit=None):
+        self.flush()
+        return self.hitters[dimension, metric].top(limit)
+
+    def snapshot(self, limit=None):
+        """Plain-data view of every top-K list plus totals and the error bound"""
+        self.flush()
+        sketch = self.sketches["src", "packets"]
+        snapshot = {
+            "timestamp": time.time(), "k": self.k, "width": sketch.width, "depth": sketch.depth,
+            "totals": {metric: self.sketches["src", metric].total for metric in TOP_TALKER_METRICS},
+            "memory_bytes": self.memory_bytes(),
+        }
+        snapshot["max_error"] = {metric: math.e / sketch.width * total for metric, total in snapshot["totals"].items()}
+        for dimension in TOP_TALKER_DIMENSIONS:
+            snapshot[dimension] = {
+                metric: [{"key": top_talker_label(key), "estimate": estimate}
+                         for key, estimate in self.top(dimension, metric, limit)]
+                for metric in TOP_TALKER_METRICS
+            }
+        return snapshot
+
+    def memory_bytes(self):
+        return sum(sketch.memory_bytes() for sketch in self.sketches.values())
+
+def top_talker_label(key):
+    return f"{key[0]} -> {key[1]}" if isinstance(key, tuple) else key
+
+def merge_top_talker_snapshots(snapshots, k=TOP_TALKERS_K):
+    """Combine per-worker snapshots by summing the estimates of each key.
+
+    Workers shard by flow, so a host's traffic is split between them; a key
+    missing from one worker's top-K is undercounted by that worker's share.
+    """
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    if not snapshots:
+        return None
+    merged = dict(snapshots[0], timestamp=time.time(), workers=len(snapshots))
+    for field in ("totals", "max_error"):
+        merged[field] = {metric: sum(snapshot[field][metric] for snapshot in snapshots)
+                         for metric in TOP_TALKER_METRICS}
+    merged["memory_bytes"] = sum(snapshot["memory_bytes"] for snapshot in snapshots)
+    for dimension in TOP_TALKER_DIMENSIONS:
+        merged[dimension] = {}
+        for metric in TOP_TALKER_METRICS:
+            sums = Counter()
+            for snapshot in snapshots:
+                for entry in snapshot[dimension][metric]:
+                    sums[entry["key"]] += entry["estimate"]
+            merged[dimension][metric] = [{"key": key, "estimate": estimate}
+                                         for key, estimate in sums.most_common(k)]
+    return merged
+
+def top_talkers_snapshot():
+    """The current snapshot: merged from the workers when they do the matching"""
+    if WORKER_POOL is not None:
+        return merge_top_talker_snapshots(row.get("top_talkers") for row in WORKER_POOL.worker_stats)
+    return TOP_TALKERS_TABLE.snapshot()
+
+def export_top_talkers(path=TOP_TALKERS_FILE, snapshot=None):
+    """Write the top talkers as JSON for the web dashboard; replaced atomically"""
+    snapshot = snapshot if snapshot is not None else top_talkers_snapshot()
+    if snapshot is None:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as f:
+        json.dump(snapshot, f, indent=2)
+    os.replace(temp, path)
+    return path
+
+def export_top_talkers_due(now):
+    """Periodic export from a capture loop"""
+    if TOP_TALKERS and now - TOP_TALKERS_TABLE.exported_at >= TOP_TALKERS_EXPORT_INTERVAL:
+        TOP_TALKERS_TABLE.exported_at = now
+        try:
+            export_top_talkers()
+        except OSError as e:
+            console.log(f"[red]Top talkers export failed: {e}[/red]")
+
+def show_top_talkers(snapshot, limit=5):
+    if snapshot is None:
+        return
+    for metric in TOP_TALKER_METRICS:
+        table = Table(title=f"Top Talkers by {metric.capitalize()} "
+                            f"(error <= {snapshot['max_error'][metric]:,.0f} of {snapshot['totals'][metric]:,})",
+                      show_header=True, header_style="bold green")
+        table.add_column("#")
+        for dimension in TOP_TALKER_DIMENSIONS:
+            table.add_column(dimension.capitalize())
+        columns = [snapshot[dimension][metric][:limit] for dimension in TOP_TALKER_DIMENSIONS]
+        for rank in range(max(map(len, columns))):
+            table.add_row(str(rank + 1), *(f"{column[rank]['key']} ({column[rank]['estimate']:,})"
+                                           if rank < len(column) else "" for column in columns))
+        console.print(table)
+
+TOP_TALKERS_TABLE = TopTalkers()
+
+# ============================
+# Flow Tracking
+# ============================
+TCP_FIN, TCP_SYN, TCP_RST, TCP_ACK = 0x01, 0x02, 0x04, 0x10
+FLOW_NEW, FLOW_SYN_SENT, FLOW_SYN_RECV, FLOW_ESTABLISHED, FLOW_CLOSING, FLOW_CLOSED = range(6)
+FLOW_STATE_NAMES = ("new", "syn_sent", "syn_recv", "established", "closing", "closed")
+
+class FlowRecord:
+    """Compact per-flow state for one normalized 5-tuple"""
+
+    __slots__ = ("client_addr", "client_port", "state", "last_seen", "packets_toserver",
+                 "packets_toclient", "bytes_toserver", "bytes_toclient", "streams", "flowbits")
+
+    def __init__(self, client_addr, client_port, state, now):
+        self.client_addr = client_addr
+        self.client_port = client_port
+        self.state = state
+        self.last_seen = now
+        self.packets_toserver = 0
+        self.packets_toclient = 0
+        self.bytes_toserver = 0
+        self.bytes_toclient = 0
+        self.streams = None
+        self.flowbits = 0
+
+    @property
+    def established(self):
+        return self.state in (FLOW_ESTABLISHED, FLOW_CLOSING)
+
+    def timeout_class(self):
+        """The FLOW_TIMEOUTS entry that applies in the current state"""
+        if self.state >= FLOW_CLOSING:
+            return "closed"
+        if self.state == FLOW_ESTABLISHED:
+            return "established"
+        return "new"
+
+class FlowTable:
+    """LRU-ordered flow table bounded by idle timeouts and a memory cap.
+
+    Besides the overall LRU used for the memory cap, flows are kept in one
+    LRU per timeout class, so a long-lived established flow at the head of
+    the overall order cannot hold back expiry of idle short-timeout flows.
+    """
+
+    def __init__(self, memcap=FLOW_MEMCAP):
+        self.flows = OrderedDict()
+        self.idle = {name: OrderedDict() for name in FLOW_TIMEOUTS}
+        sample_key = ("tcp", 1 << 31, 65535, (1 << 31) + 1, 65535)
+        # Record, key tuple, two boxed addresses and two OrderedDict entries/links
+        self.record_bytes = (sys.getsizeof(FlowRecord(1 << 31, 65535, FLOW_NEW, 0.0)) +
+                             sys.getsizeof(sample_key) + 2 * sys.getsizeof(1 << 31) + 320)
+        self.max_flows = max(1, memcap // self.record_bytes)
+        self.created = 0
+        self.evicted_idle = 0
+        self.evicted_memcap = 0
+        self.on_evict = None
+
+    def update(self, info):
+        """Find or create the flow for a packet, advance its state and return it"""
+        now = info.timestamp
+        a = (info.src_addr, info.sport or 0)
+        b = (info.dst_addr, info.dport or 0)
+        key = (info.proto,) + (a + b if a <= b else b + a)
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.create(key, info, now)
+            previous = None
+        else:
+            self.flows.move_to_end(key)
+            previous = flow.timeout_class()
+        to_server = info.src_addr == flow.client_addr and (info.sport or 0) == flow.client_port
+        self.advance(flow, info, to_server)
+        flow.last_seen = now
+        current = flow.timeout_class()
+        if current == previous:
+            self.idle[current].move_to_end(key)
+        else:
+            if previous is not None:
+                del self.idle[previous][key]
+            self.idle[current][key] = flow
+        if to_server:
+            flow.packets_toserver += 1
+            flow.bytes_toserver += info.length
+        else:
+            flow.packets_toclient += 1
+            flow.bytes_toclient += info.length
+        self.expire(now)
+        return flow, to_server
+
+    def create(self, key, info, now):
+        client = (info.src_addr, info.sport or 0)
+        state = FLOW_NEW
+        if info.proto == "tcp":
+            flags = info.tcp_flags
+            if flags & TCP_SYN and not flags & TCP_ACK:
+                state = FLOW_SYN_SENT
+            elif FLOW_MIDSTREAM and not flags & (TCP_SYN | TCP_RST):
+                state = FLOW_ESTABLISHED
+                # Mid-stream pickup: assume the lower port is the server
+                if info.sport is not None and info.dport is not None and info.sport < info.dport:
+                    client = (info.dst_addr, info.dport)
+        flow = FlowRecord(client[0], client[1], state, now)
+        self.flows[key] = flow
+        self.created += 1
+        while len(self.flows) > self.max_flows:
+            evicted_key, evicted = self.flows.popitem(last=False)
+            self.idle[evicted.timeout_class()].pop(evicted_key, None)
+            self.evicted_memcap += 1
+            if self.on_evict:
+                self.on_evict(evicted)
+        return flow
+
+    def advance(self, flow, info, to_server):
+        """Move the flow through the TCP handshake, or mark replies for other protocols"""
+        if info.proto != "tcp":
+            if not to_server and flow.state == FLOW_NEW:
+                flow.state = FLOW_ESTABLISHED
+            return
+        flags = info.tcp_flags
+        if flags & TCP_RST:
+            flow.state = FLOW_CLOSED
+        elif flags & TCP_FIN:
+            if flow.state < FLOW_CLOSING:
+                flow.state = FLOW_CLOSING
+        elif flow.state == FLOW_SYN_SENT and not to_server and flags & TCP_SYN and flags & TCP_ACK:
+            flow.state = FLOW_SYN_RECV
+        elif flow.state == FLOW_SYN_RECV and to_server and flags & TCP_ACK:
+            flow.state = FLOW_ESTABLISHED
+
+    def expire(self, now, limit=8):
+        """Evict a few idle flows from the least recently used end of each timeout class"""
+        for name, flows in self.idle.items():
+            timeout = FLOW_TIMEOUTS[name]
+            for _ in range(limit):
+                if not flows:
+                    break
+                key, flow = next(iter(flows.items()))
+                if now - flow.last_seen < timeout:
+                    break
+                del flows[key]
+                del self.flows[key]
+                self.evicted_idle += 1
+                if self.on_evict:
+                    self.on_evict(flow)
+
+    def stats(self):
+        states = Counter(FLOW_STATE_NAMES[flow.state] for flow in self.flows.values())
+        return {
+            "active": len(self.flows),
+            "max_flows": self.max_flows,
+            "created": self.created,
+            "evicted_idle": self.evicted_idle,
+            "evicted_memcap": self.evicted_memcap,
+            "memory_bytes": len(self.flows) * self.record_bytes,
+            "states": dict(states),
+        }
+
+FLOW_TABLE = FlowTable()
+
+# ============================
+# TCP Stream Reassembly
+# ============================
+class StreamBuffer:
+    """In-order bytes of one TCP direction plus its queued out-of-order segments"""
+
+    __slots__ = ("next_seq", "data", "data_lower", "ooo", "ooo_bytes", "scanned", "prefilter",
+                 "candidates", "verified", "new_from", "truncated")
+
+    def __init__(self, next_seq):
+        self.next_seq = next_seq
+        self.data = bytearray()
+        self.data_lower = bytearray()
+        self.ooo = {}
+        self.ooo_bytes = 0
+        self.scanned = 0
+        self.prefilter = None
+        self.candidates = set()
+        self.verified = 0
+        self.new_from = 0
+        self.truncated = False
+
+    def memory(self):
+        return len(self.data) + len(self.data_lower) + self.ooo_bytes
+
+    def scan(self, prefilter):
+        """Run the prefilter over bytes appended since the last scan only.
+
+        The previous scan's last max_length - 1 bytes are rescanned so patterns
+        split across segments are still found; hits accumulate per stream.
+        Rules are then verified only for matches ending at or after new_from.
+        """
+        self.new_from = self.verified
+        self.verified = len(self.data)
+        if prefilter is not self.prefilter:
+            self.prefilter = prefilter
+            self.scanned = 0
+            self.candidates = set()
+        start = max(0, self.scanned - prefilter.max_length + 1)
+        self.candidates |= prefilter.scan(self.data_lower[start:])
+        self.scanned = len(self.data)
+        return self.candidates
+
+class StreamReassembler:
+    """Per-flow TCP reassembly bounded by STREAM_DEPTH per direction and STREAM_MEMCAP overall"""
+
+    def __init__(self, depth=STREAM_DEPTH, memcap=STREAM_MEMCAP):
+        self.depth = depth
+        self.memcap = memcap
+        self.memory = 0
+        self.segments = 0
+        self.out_of_order = 0
+        self.overlaps = 0
+        self.ooo_dropped = 0
+        self.truncated = 0
+        self.memcap_drops = 0
+
+    def add_segment(self, info):
+        """Feed a TCP segment into its flow's stream.
+
+        Returns (stream, appended) where stream is None when the packet should
+        be inspected on its own (no payload, depth reached or memcap hit), and
+        appended tells whether new in-order bytes became available.
+        """
+        flow = info.flow
+        if info.tcp_flags & 0x02:
+            self.stream_for(flow, info.to_server, (info.seq + 1) & 0xFFFFFFFF)
+        if not info.payload:
+            return None, False
+        stream = self.stream_for(flow, info.to_server, info.seq)
+        if stream.truncated:
+            return None, False
+        self.segments += 1
+        ahead = (info.seq - stream.next_seq) & 0xFFFFFFFF
+        if 0 < ahead < 0x80000000:
+            self.queue_out_of_order(stream, info.seq, info.payload)
+            return stream, False
+        payload = info.payload
+        if ahead:
+            # Retransmission or overlap: keep only the bytes past next_seq
+            behind = 0x100000000 - ahead
+            self.overlaps += 1
+            if behind >= len(payload):
+                return stream, False
+            payload = payload[behind:]
+        before = len(stream.data)
+        appended = self.append(stream, payload)
+        while stream.ooo and appended:
+            segment = stream.ooo.pop(stream.next_seq, None)
+            if segment is None:
+                break
+            stream.ooo_bytes -= len(segment)
+            self.memory -= len(segment)
+            appended = self.append(stream, segment)
+        if len(stream.data) > before:
+            return stream, True
+        return (None, False) if stream.truncated else (stream, False)
+
+    def stream_for(self, flow, to_server, seq):
+        if flow.streams is None:
+            flow.streams = [None, None]
+        side = 0 if to_server else 1
+        stream = flow.streams[side]
+        if stream is None:
+            stream = flow.streams[side] = StreamBuffer(seq)
+        return stream
+
+    def append(self, stream, payload):
+        room = self.depth - len(stream.data)
+        if len(payload) > room:
+            payload = payload[:room]
+            stream.truncated = True
+            self.truncated += 1
+        if self.memory + 2 * len(payload) > self.memcap:
+            stream.truncated = True
+            self.memcap_drops += 1
+            return False
+        stream.data += payload
+        stream.data_lower += payload.lower()
+        stream.next_seq = (stream.next_seq + len(payload)) & 0xFFFFFFFF
+        self.memory += 2 * len(payload)
+        return bool(payload)
 
-# Simplified Snort/Suricata style parser
-def parse_rule(line):
-    if not line.startswith("alert"):
-        return None
-    try:
-        header, options = line.split("(", 1)
-        options = options.strip(")")
-        parts = header.split()
-        action, proto, src, sport, direction, dst, dport = parts[:7]
-        opt_dict = {}
-        for opt in options.split(";"):
-            opt = opt.strip()
-            if not opt:
-                continue
-            if ":" in opt:
-                k, v = opt.split(":", 1)
-                opt_dict[k.strip()] = v.strip().strip('"')
+    def queue_out_of_order(self, stream, seq, payload):
+        if (len(stream.ooo) >= STREAM_MAX_OOO_SEGMENTS or seq in stream.ooo or
+                self.memory + len(payload) > self.memcap):
+            self.ooo_dropped += 1
+            return
+        stream.ooo[seq] = payload
+        stream.ooo_bytes += len(payload)
+        self.memory += len(payload)
+        self.out_of_order += 1
+
+    def release(self, flow):
+        """Return an evicted flow's buffers to the memcap"""
+        if flow.streams:
+            for stream in flow.streams:
+                if stream is not None:
+                    self.memory -= stream.memory()
+            flow.streams = None
+
+    def stats(self):
         return {
-            "action": action,
-            "proto": proto,
-            "src": src,
-            "sport": sport,
-            "dst": dst,
-            "dport": dport,
-            "options": opt_dict
+            "memory_bytes": self.memory,
+            "segments": self.segments,
+            "out_of_order": self.out_of_order,
+            "overlaps": self.overlaps,
+            "ooo_dropped": self.ooo_dropped,
+            "truncated": self.truncated,
+            "memcap_drops": self.memcap_drops,
         }
-    except Exception as e:
-        console.log(f"[red]Error parsing rule:[/red] {line} ({e})")
-        return None
+
+STREAM_REASSEMBLER = StreamReassembler()
+FLOW_TABLE.on_evict = STREAM_REASSEMBLER.release
+
+def flow_matches(flow_option, info):
+    """Check a rule's compiled flow option against the packet's flow state"""
+    established, to_server = flow_option
+    if established is not None and info.flow.established != established:
+        return False
+    if to_server is not None and info.to_server != to_server:
+        return False
+    return True
 
 # ============================
-# Advanced Threat Intelligence
+# Alert Thresholding
 # ============================
-THREAT_INTEL = {
-    "malicious_ips": set(),
-    "malicious_domains": set(),
-    "malicious_hashes": set(),
-    "cve_database": {},
-    "reputation_cache": {}
-}
+class ThresholdTracker:
+    """Match counter for one (rule, tracked key) pair"""
 
-# Behavioral Analysis
-BEHAVIORAL_BASELINE = {
-    "normal_ports": defaultdict(int),
-    "normal_protocols": defaultdict(int),
-    "normal_traffic_volume": 0,
-    "normal_connection_patterns": defaultdict(list)
-}
+    __slots__ = ("window_start", "count", "next_alert")
+
+    def __init__(self, now, next_alert):
+        self.window_start = now
+        self.count = 0
+        self.next_alert = next_alert
+
+class ThresholdTable:
+    """threshold/detection_filter state in two rotating time buckets.
+
+    Trackers live in the current bucket while active; one touched after a
+    rotation is promoted from the previous bucket, and anything left there at
+    the next rotation is dropped. Memory is bounded by 2 * max_trackers.
+    """
+
+    def __init__(self, bucket_seconds=THRESHOLD_BUCKET_SECONDS, max_trackers=THRESHOLD_MAX_TRACKERS):
+        self.bucket_seconds = bucket_seconds
+        self.max_trackers = max_trackers
+        self.current = {}
+        self.previous = {}
+        self.rotated_at = None
+        self.suppressed = 0
+        self.passed = 0
+
+    def tracker(self, key, now, option):
+        if self.rotated_at is None:
+            self.rotated_at = now
+        if now - self.rotated_at >= self.bucket_seconds or len(self.current) >= self.max_trackers:
+            self.previous, self.current = self.current, {}
+            self.rotated_at = now
+        tracker = self.current.get(key)
+        if tracker is None:
+            tracker = self.previous.pop(key, None) or ThresholdTracker(now, option.count)
+            self.current[key] = tracker
+        return tracker
+
+    def allow(self, rule, index, info):
+        """Count a match against the rule's index-th threshold option and decide whether it may alert.
+
+        Trackers are keyed on (sid, option index), which survives a rule reload.
+        """
+        option = rule.thresholds[index]
+        now = info.timestamp
+        tracker = self.tracker((rule.sid, index, threshold_key(option.track, info)), now, option)
+        if option.kind != "backoff" and now - tracker.window_start >= option.seconds:
+            tracker.window_start = now
+            tracker.count = 0
+        tracker.count += 1
+        count = tracker.count
+        if option.kind == "limit":
+            allowed = count <= option.count
+        elif option.kind == "threshold":
+            allowed = count % option.count == 0
+        elif option.kind == "both":
+            allowed = count == option.count
+        elif option.kind == "backoff":
+            allowed = count == tracker.next_alert
+            if allowed:
+                tracker.next_alert *= option.multiplier
+        else:  # detection_filter
+            allowed = count > option.count
+        if allowed:
+            self.passed += 1
+        else:
+            self.suppressed += 1
+        return allowed
+
+    def stats(self):
+        return {"trackers": len(self.current) + len(self.previous),
+                "passed": self.passed, "suppressed": self.suppressed}
+
+def threshold_key(track, info):
+    if track == "by_src":
+        return info.src_addr
+    if track == "by_dst":
+        return info.dst_addr
+    if track == "by_flow":
+        a = (info.src_addr, info.sport)
+        b = (info.dst_addr, info.dport)
+        return a + b if a <= b else b + a
+    if track == "by_both":
+        return info.src_addr, info.dst_addr
+    return None  # by_rule
+
+THRESHOLD_TABLE = ThresholdTable()
 
 # ============================
-# Event / Alert Handling
+# Packet Matching
 # ============================
-ALERT_HISTORY = {}
-THREAT_SCORE = defaultdict(int)
+class PacketInfo:
+    """Header fields and payload bytes of one packet, decoded once for all rules.
 
-def load_threat_intelligence():
-    """Load threat intelligence feeds"""
-    # Load malicious IPs
-    malicious_ips_file = "threat_intel/malicious_ips.txt"
-    if os.path.exists(malicious_ips_file):
-        with open(malicious_ips_file, 'r') as f:
-            THREAT_INTEL["malicious_ips"] = set(line.strip() for line in f)
-    
-    # Load malicious domains
-    malicious_domains_file = "threat_intel/malicious_domains.txt"
-    if os.path.exists(malicious_domains_file):
-        with open(malicious_domains_file, 'r') as f:
-            THREAT_INTEL["malicious_domains"] = set(line.strip() for line in f)
-    
-    console.log(f"[green]Loaded {len(THREAT_INTEL['malicious_ips'])} malicious IPs and {len(THREAT_INTEL['malicious_domains'])} malicious domains[/green]")
+    Built either from a scapy packet or, by from_frame(), straight from the
+    fixed header offsets of a raw frame; in the latter case the scapy object
+    is only dissected if something asks for .pkt.
+    """
 
-def check_threat_intelligence(ip, domain=None):
-    """Check if IP/domain is in threat intelligence"""
-    threat_score = 0
-    if ip in THREAT_INTEL["malicious_ips"]:
-        threat_score += 100
-    if domain and domain in THREAT_INTEL["malicious_domains"]:
-        threat_score += 100
-    return threat_score
+    __slots__ = ("_pkt", "link", "timestamp", "src", "dst", "version", "src_addr", "dst_addr", "proto",
+                 "sport", "dport", "tcp_flags", "seq", "raw", "length", "payload", "payload_lower",
+                 "flow", "to_server")
 
-def update_behavioral_baseline(pkt):
-    """Update behavioral baseline for anomaly detection"""
-    if not IP in pkt:
-        return
+    def __init__(self, pkt=None):
+        self.tcp_flags = 0
+        self.seq = 0
+        self.flow = None
+        self.to_server = True
+        self.link = "ether"
+        self._pkt = pkt
+        if pkt is None:
+            return
+        ip = pkt[IP]
+        self.timestamp = float(pkt.time)
+        self.src = ip.src
+        self.dst = ip.dst
+        self.version = 4
+        self.src_addr = int(ipaddress.IPv4Address(ip.src))
+        self.dst_addr = int(ipaddress.IPv4Address(ip.dst))
+        self.sport = pkt.sport if hasattr(pkt, "sport") else None
+        self.dport = pkt.dport if hasattr(pkt, "dport") else None
+        if pkt.haslayer(TCP):
+            self.proto = "tcp"
+            layer = pkt[TCP]
+            self.tcp_flags = int(layer.flags)
+            self.seq = layer.seq
+        elif pkt.haslayer(UDP):
+            self.proto = "udp"
+            layer = pkt[UDP]
+        elif pkt.haslayer(ICMP):
+            self.proto = "icmp"
+            layer = pkt[ICMP]
+        else:
+            self.proto = "ip"
+            layer = ip
+        self.raw = bytes(pkt)
+        self.length = len(self.raw)
+        payload = bytes(layer.payload)
+        padding = pkt.getlayer(Padding)
+        if padding is not None:
+            payload = payload[:len(payload) - len(padding.load)]
+        self.payload = payload
+        self.payload_lower = payload.lower()
+
+    @property
+    def pkt(self):
+        """The scapy packet, dissected on first use for frames from the raw backend"""
+        if self._pkt is None:
+            self._pkt = Ether(self.raw) if self.link == "ether" else IP(self.raw)
+            self._pkt.time = self.timestamp
+        return self._pkt
+
+    @classmethod
+    def from_frame(cls, frame, timestamp, link="ether"):
+        """Decode IPv4/IPv6 and TCP/UDP/ICMP headers at fixed offsets; None if not IP"""
+        offset = 0
+        if link == "ether":
+            if len(frame) < 14:
+                return None
+            ethertype = struct.unpack_from("!H", frame, 12)[0]
+            offset = 14
+            while ethertype in (0x8100, 0x88A8) and len(frame) >= offset + 4:
+                ethertype = struct.unpack_from("!H", frame, offset + 2)[0]
+                offset += 4
+            if ethertype not in (0x0800, 0x86DD):
+                return None
+        if len(frame) < offset + 20:
+            return None
+        info = cls()
+        info.link = link
+        info.timestamp = timestamp
+        info.raw = frame
+        info.length = len(frame)
+        version = frame[offset] >> 4
+        if version == 4:
+            header_len = (frame[offset] & 0x0F) * 4
+            total_len = struct.unpack_from("!H", frame, offset + 2)[0]
+            fragment = struct.unpack_from("!H", frame, offset + 6)[0] & 0x1FFF
+            protocol = frame[offset + 9]
+            info.src = socket.inet_ntop(socket.AF_INET, frame[offset + 12:offset + 16])
+            info.dst = socket.inet_ntop(socket.AF_INET, frame[offset + 16:offset + 20])
+            info.src_addr = int.from_bytes(frame[offset + 12:offset + 16], "big")
+            info.dst_addr = int.from_bytes(frame[offset + 16:offset + 20], "big")
+        elif version == 6 and len(frame) >= offset + 40:
+            header_len = 40
+            total_len = 40 + struct.unpack_from("!H", frame, offset + 4)[0]
+            fragment = 0
+            protocol = frame[offset + 6]
+            info.src = socket.inet_ntop(socket.AF_INET6, frame[offset + 8:offset + 24])
+            info.dst = socket.inet_ntop(socket.AF_INET6, frame[offset + 24:offset + 40])
+            info.src_addr = int.from_bytes(frame[offset + 8:offset + 24], "big")
+            info.dst_addr = int.from_bytes(frame[offset + 24:offset + 40], "big")
+        else:
+            return None
+        info.version = version
+        end = min(len(frame), offset + total_len)
+        l4 = offset + header_len
+        info.sport = info.dport = None
+        if fragment:
+            protocol = None
+        if protocol == 6 and end >= l4 + 20:
+            info.proto = "tcp"
+            info.sport, info.dport, info.seq = struct.unpack_from("!HHI", frame, l4)
+            info.tcp_flags = frame[l4 + 13]
+            l4 += (frame[l4 + 12] >> 4) * 4
+        elif protocol == 17 and end >= l4 + 8:
+            info.proto = "udp"
+            info.sport, info.dport = struct.unpack_from("!HH", frame, l4)
+            l4 += 8
+        elif protocol in (1, 58) and end >= l4 + 8:
+            info.proto = "icmp"
+            l4 += 8
+        else:
+            info.proto = "ip"
+        info.payload = frame[l4:end]
+        info.payload_lower = info.payload.lower()
+        return info
+
+def header_matches(rule, version, src, sport, dst, dport):
+    """Check resolved address and port groups for one direction of a rule header"""
+    if rule.src_set is not None and not rule.src_set.contains(src, version):
+        return False
+    if rule.dst_set is not None and not rule.dst_set.contains(dst, version):
+        return False
+    if sport is not None and rule.sport_set is not None and not rule.sport_set.contains(sport):
+        return False
+    if dport is not None and rule.dport_set is not None and not rule.dport_set.contains(dport):
+        return False
+    return True
+
+def match_contents(contents, payload, payload_lower, index=0, prev_end=0, budget=None, min_end=0, new_from=0):
+    """Evaluate a rule's content chain with offset/depth/distance/within, Snort-style.
+
+    Returns the end offset of the last content match, or -1 if the chain fails.
+    When a relative content fails, earlier matches are retried at their next
+    occurrence, up to CONTENT_BACKTRACK_LIMIT retries per rule. On a stream
+    the chain must end at or after min_end, so only matches reaching into new
+    bytes count; earlier contents may still lie in the bytes before them. A
+    negated non-relative content is only looked for in bytes from new_from
+    on, plus a pattern-length overlap, so old bytes are not rescanned.
+    """
+    if budget is None:
+        budget = [CONTENT_BACKTRACK_LIMIT]
+    if index == len(contents):
+        return prev_end if prev_end >= min_end else -1
+    content = contents[index]
+    buf = payload_lower if content.nocase else payload
+    if content.relative:
+        start = max(prev_end + content.distance, 0)
+        end = len(buf) if content.within is None else start + content.within
+    else:
+        start = content.offset
+        end = len(buf) if content.depth is None else start + content.depth
+    if content.negated:
+        if not content.relative:
+            start = max(start, new_from - len(content.pattern) + 1)
+        if buf.find(content.pattern, start, end) != -1:
+            return -1
+        return match_contents(contents, payload, payload_lower, index + 1, prev_end, budget, min_end, new_from)
+    last = index + 1 == len(contents)
+    search_from = max(start, min_end - len(content.pattern)) if last else start
+    pos = buf.find(content.pattern, search_from, end)
+    # Only a later relative content, or the min_end test, depends on where this content matched
+    retry = not last and (min_end > 0 or anchors_later(contents, index))
+    while pos != -1:
+        matched_end = match_contents(contents, payload, payload_lower, index + 1,
+                                     pos + len(content.pattern), budget, min_end, new_from)
+        if matched_end >= 0:
+            return matched_end
+        budget[0] -= 1
+        if not retry or budget[0] <= 0:
+            return -1
+        pos = buf.find(content.pattern, pos + 1, end)
+    return -1
+
+def anchors_later(contents, index):
+    """Whether a later content is positioned relative to where contents[index] matched.
+
+    Negated contents keep the previous match end, so the position carries past
+    them to the next positive content.
+    """
+    for content in contents[index + 1:]:
+        if content.relative:
+            return True
+        if not content.negated:
+            return False
+    return False
+
+def match_pcres(pcres, payload, content_end, floor=0, min_end=0):
+    """Evaluate a rule's pcre options; only called once its contents matched.
+
+    On a stream, non-relative searches, negated ones included, start at floor
+    and the last positive pattern must end at or after min_end.
+    """
+    last = max((i for i, (_, negated) in enumerate(pcres) if not negated), default=-1)
+    for i, (pattern, negated) in enumerate(pcres):
+        found = pattern.search(payload, content_end if pattern.relative else floor,
+                               min_end if i == last else 0)
+        if found == negated:
+            return False
+    return True
+
+RULE_HEADER_FAIL, RULE_CONTENT_FAIL, RULE_PCRE_FAIL, RULE_MATCH = range(4)
+
+def rule_verdict(rule, rule_id, info, buf, buf_lower, candidates, stream):
+    """How far one rule gets against a packet: the first failing stage, or RULE_MATCH"""
+    # Flowbits conditions are a single integer test
+    if rule.flowbits is not None and not rule.flowbits.check(info.flow.flowbits):
+        return RULE_HEADER_FAIL
     
-    ip = pkt[IP]
-    src_ip = ip.src
-    dst_ip = ip.dst
+    # Header matching against the resolved address/port groups
+    if not header_matches(rule, info.version, info.src_addr, info.sport, info.dst_addr, info.dport) and not (
+            rule.direction == "<>" and
+            header_matches(rule, info.version, info.dst_addr, info.dport, info.src_addr, info.sport)):
+        return RULE_HEADER_FAIL
     
-    # Update port usage patterns
-    if hasattr(pkt, 'sport'):
-        BEHAVIORAL_BASELINE["normal_ports"][pkt.sport] += 1
-    if hasattr(pkt, 'dport'):
-        BEHAVIORAL_BASELINE["normal_ports"][pkt.dport] += 1
+    # Flow state and direction
+    if rule.flow is not None and not flow_matches(rule.flow, info):
+        return RULE_HEADER_FAIL
     
-    # Update protocol patterns
-    if pkt.haslayer(TCP):
-        BEHAVIORAL_BASELINE["normal_protocols"]["TCP"] += 1
-    elif pkt.haslayer(UDP):
-        BEHAVIORAL_BASELINE["normal_protocols"]["UDP"] += 1
+    # Size matching
+    if rule.dsize and not rule.dsize[0] <= len(info.payload) <= rule.dsize[1]:
+        return RULE_HEADER_FAIL
     
-    # Update traffic volume
-    BEHAVIORAL_BASELINE["normal_traffic_volume"] += len(pkt)
-
-def detect_anomalies(pkt):
-    """Detect behavioral anomalies"""
-    anomalies = []
-    if not IP in pkt:
-        return anomalies
+    # Content matching
+    if rule.contents or rule.pcres:
+        if buf is None:
+            return RULE_CONTENT_FAIL
+        if rule.fast_pattern is not None and rule_id not in candidates:
+            return RULE_CONTENT_FAIL
     
-    ip = pkt[IP]
+    # On a stream only matches reaching the new bytes count: the rule's last
+    # positive check (its last pcre, else its content chain) must end in them
+    min_end = new_from = pcre_floor = 0
+    if stream is not None:
+        min_end = stream.new_from + 1
+        new_from = stream.new_from
+        pcre_floor = max(0, stream.new_from - STREAM_PCRE_OVERLAP)
+    pcre_last = any(not negated for _, negated in rule.pcres)
+    content_end = 0
+    if rule.contents:
+        content_last = not pcre_last and any(not content.negated for content in rule.contents)
+        content_end = match_contents(rule.contents, buf, buf_lower,
+                                     min_end=min_end if content_last else 0, new_from=new_from)
+        if content_end < 0:
+            return RULE_CONTENT_FAIL
     
-    # Check for unusual port usage
-    if hasattr(pkt, 'dport'):
-        port = pkt.dport
-        if port not in BEHAVIORAL_BASELINE["normal_ports"] or BEHAVIORAL_BASELINE["normal_ports"][port] < 5:
-            anomalies.append({
-                "type": "unusual_port",
-                "severity": "medium",
-                "description": f"Unusual port {port} usage detected"
-            })
+    # PCRE is the most expensive check, so it runs last
+    if rule.pcres and not match_pcres(rule.pcres, buf, content_end, pcre_floor,
+                                      min_end if pcre_last else 0):
+        return RULE_PCRE_FAIL
+    return RULE_MATCH
+
+def packet_info(pkt):
+    """The PacketInfo for a scapy packet or an already decoded one; None if not IP"""
+    if isinstance(pkt, PacketInfo):
+        return pkt
+    if IP in pkt:
+        return PacketInfo(pkt)
+    return None
+
+def match_packet(pkt, rules, anomalies=None):
+    """Enhanced packet matching with behavioral analysis.
+
+    Accepts a scapy packet or a PacketInfo already decoded by the raw backend.
+    anomalies is given by match_batch, which updates the baseline for the
+    whole batch at once.
+    """
+    info = packet_info(pkt)
+    if info is None:
+        return []
     
-    # Check for large data transfers
-    if len(pkt) > 1000000:  # 1MB
-        anomalies.append({
-            "type": "large_transfer",
-            "severity": "high",
-            "description": f"Large data transfer detected: {len(pkt)} bytes"
-        })
+    if TOP_TALKERS:
+        TOP_TALKERS_TABLE.observe(info)
     
-    return anomalies
-
-def correlate_alert(alert):
-    """Enhanced alert correlation with threat scoring"""
-    sid = alert.get("sid", "0")
-    src_ip = alert.get("src", "")
-    dst_ip = alert.get("dst", "")
+    if anomalies is None:
+        # Update behavioral baseline
+        update_behavioral_baseline(info)
+        
+        # Check for behavioral anomalies
+        anomalies = detect_anomalies(info)
     
-    now = time.time()
-    ALERT_HISTORY.setdefault(sid, []).append(now)
-    window = [t for t in ALERT_HISTORY[sid] if now - t < 60]
-    ALERT_HISTORY[sid] = window
+    # DNS names are checked against the domain intel before any rule runs
+    alerts, domain = dns_intel_alerts(info, anomalies)
     
-    # Calculate threat score
-    threat_score = check_threat_intelligence(src_ip) + check_threat_intelligence(dst_ip)
-    THREAT_SCORE[src_ip] += threat_score
-    THREAT_SCORE[dst_ip] += threat_score
+    # Track the connection this packet belongs to
+    info.flow, info.to_server = FLOW_TABLE.update(info)
     
-    # Escalation logic
-    if len(window) >= 5:
-        alert["escalated"] = True
-        alert["msg"] = f"[ESCALATED] {alert['msg']}"
-        alert["threat_score"] = threat_score + 50
+    # Content is inspected on the reassembled stream when this segment extended
+    # it, otherwise on the packet's own payload
+    stream, appended = None, False
+    if STREAM_REASSEMBLY and info.proto == "tcp":
+        stream, appended = STREAM_REASSEMBLER.add_segment(info)
+    if stream is None:
+        buf, buf_lower = info.payload, info.payload_lower
+        candidates = rules.prefilter.scan(buf_lower)
+    elif appended:
+        buf, buf_lower = stream.data, stream.data_lower
+        candidates = stream.scan(rules.prefilter)
     else:
-        alert["escalated"] = False
-        alert["threat_score"] = threat_score
+        buf = buf_lower = None
+        candidates = ()
     
-    # Add behavioral analysis
-    alert["behavioral_anomalies"] = []
+    # Process only the rules indexed under this packet's protocol and ports
+    profile = RULE_PROFILE if RULE_PROFILING else None
+    for bucket in rules.index.lookup(info.proto, info.sport, info.dport):
+        for rule_id in bucket:
+            rule = rules.rules[rule_id]
+            if profile is None:
+                verdict = rule_verdict(rule, rule_id, info, buf, buf_lower, candidates, stream)
+            else:
+                verdict = profiled_verdict(profile, rule, rule_id, info, buf, buf_lower, candidates, stream)
+            if verdict != RULE_MATCH:
+                continue
+            
+            if rule.flowbits is not None:
+                info.flow.flowbits = rule.flowbits.apply(info.flow.flowbits)
+                if rule.flowbits.noalert:
+                    continue
+            
+            # Rate limiting happens before any alert is built; every option counts
+            # the match, so the list is built in full rather than short-circuited
+            if rule.thresholds and not all([THRESHOLD_TABLE.allow(rule, index, info)
+                                            for index in range(len(rule.thresholds))]):
+                continue
+            
+            alerts.append({
+                "msg": rule.msg,
+                "sid": rule.sid,
+                "src": info.src,
+                "dst": info.dst,
+                "sport": info.sport,
+                "dport": info.dport,
+                "proto": rule.proto,
+                "timestamp": time.time(),
+                "packet_size": info.length,
+                "rule_class": rule.classtype,
+                "behavioral_anomalies": anomalies
+            })
+            if domain is not None:
+                alerts[-1]["domain"] = domain
     
-    return alert
+    return alerts
+
+def match_batch(pkts, rules):
+    """match_packet over a capture batch, with the baseline updated and scored once for all of it"""
+    infos = [info for info in map(packet_info, pkts) if info is not None]
+    return [match_packet(info, rules, anomalies)
+            for info, anomalies in zip(infos, detect_batch_anomalies(infos))]
 
 # ============================
-# Packet Matching
+# Rule Profiling
 # ============================
-def match_packet(pkt, rules):
-    """Enhanced packet matching with behavioral analysis"""
-    if not IP in pkt:
-        return []
+class RuleProfile:
+    """Per-sid counters: how often a rule was tried, how far it got and what it cost"""
+
+    __slots__ = ("sid", "msg", "checks", "header_passes", "content_passes", "matches", "total_time")
+
+    def __init__(self, rule):
+        self.sid = rule.sid
+        self.msg = rule.msg
+        self.checks = 0
+        self.header_passes = 0
+        self.content_passes = 0
+        self.matches = 0
+        self.total_time = 0.0
+
+    def as_dict(self):
+        return {"sid": self.sid, "msg": self.msg, "checks": self.checks,
+                "header_passes": self.header_passes, "content_passes": self.content_passes,
+                "matches": self.matches, "total_ms": self.total_time * 1000,
+                "avg_us": self.total_time / self.checks * 1e6 if self.checks else 0.0}
+
+RULE_PROFILE = {}  # sid -> RuleProfile, kept across rule reloads
+
+def profiled_verdict(profile, rule, rule_id, info, buf, buf_lower, candidates, stream):
+    """rule_verdict with its outcome and time charged to the rule's sid"""
+    started = time.perf_counter()
+    verdict = rule_verdict(rule, rule_id, info, buf, buf_lower, candidates, stream)
+    elapsed = time.perf_counter() - started
+    entry = profile.get(rule.sid)
+    if entry is None:
+        entry = profile[rule.sid] = RuleProfile(rule)
+    entry.checks += 1
+    entry.total_time += elapsed
+    if verdict > RULE_HEADER_FAIL:
+        entry.header_passes += 1
+        if verdict > RULE_CONTENT_FAIL:
+            entry.content_passes += 1
+            if verdict == RULE_MATCH:
+                entry.matches += 1
+    return verdict
+
+def rule_profile_top(top=20, key="total"):
+    """Most expensive rules by cumulative ("total") or average ("avg") time"""
+    if key == "avg":
+        order = lambda entry: entry.total_time / entry.checks if entry.checks else 0.0
+    else:
+        order = lambda entry: entry.total_time
+    return sorted(RULE_PROFILE.values(), key=order, reverse=True)[:top]
+
+def dump_rule_profile(path=RULE_PROFILE_FILE, top=100):
+    """Write the top-N rules by cumulative time as JSON"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"generated": datetime.now().isoformat(timespec="seconds"),
+                   "rules_profiled": len(RULE_PROFILE),
+                   "total_ms": sum(entry.total_time for entry in RULE_PROFILE.values()) * 1000,
+                   "top": [entry.as_dict() for entry in rule_profile_top(top)]}, f, indent=2)
+    return path
+
+def show_rule_profile(top=20, key="total"):
+    """Print the profile table for the profile command"""
+    state = "on" if RULE_PROFILING else "off"
+    if not RULE_PROFILE:
+        console.print(f"[yellow]No rule profile yet (profiling is {state}; use 'profile on')[/yellow]")
+        return
+    table = Table(title=f"Most Expensive Rules (profiling {state})", show_header=True, header_style="bold green")
+    for column in ("SID", "Checks", "Hdr pass", "Content pass", "Matches", "Total ms", "Avg us", "Message"):
+        table.add_column(column)
+    for entry in rule_profile_top(top, key):
+        row = entry.as_dict()
+        table.add_row(str(row["sid"]), str(row["checks"]), str(row["header_passes"]), str(row["content_passes"]),
+                      str(row["matches"]), f"{row['total_ms']:.1f}", f"{row['avg_us']:.1f}", row["msg"][:40])
+    console.print(table)
+
+def rule_profile_command(cmd):
+    """profile [on|off|reset|top N|avg N|dump [FILE] [N]]"""
+    global RULE_PROFILING
+    words = cmd.split()[1:]
+    action = words[0].lower() if words else "top"
+    if action == "on":
+        RULE_PROFILING = True
+        console.print("[green]Rule profiling enabled[/green]")
+    elif action == "off":
+        RULE_PROFILING = False
+        console.print("[green]Rule profiling disabled[/green]")
+    elif action == "reset":
+        RULE_PROFILE.clear()
+        console.print("[green]Rule profile cleared[/green]")
+    elif action == "dump":
+        path = words[1] if len(words) > 1 else RULE_PROFILE_FILE
+        top = int(words[2]) if len(words) > 2 and words[2].isdigit() else 100
+        console.print(f"[green]Rule profile written to {dump_rule_profile(path, top)}[/green]")
+    elif action in ("top", "avg"):
+        top = int(words[1]) if len(words) > 1 and words[1].isdigit() else 20
+        show_rule_profile(top, "avg" if action == "avg" else "total")
+    else:
+        console.print("[red]Usage:[/red] profile [on|off|reset|top N|avg N|dump [FILE] [N]]")
+
+# ============================
+# IDS Packet Handler
+# ============================
+def handle_packet(pkt, rules, stage_times=None):
+    """Enhanced packet handler with advanced analytics; returns the alerts raised.
+
+    When stage_times is given, seconds spent matching and reporting are added to it.
+    """
+    if stage_times is None:
+        alerts = match_packet(pkt, rules)
+        for alert in alerts:
+            report_alert(alert)
+        return alerts
+    start = time.perf_counter()
+    alerts = match_packet(pkt, rules)
+    matched = time.perf_counter()
+    for alert in alerts:
+        report_alert(alert)
+    stage_times["match"] += matched - start
+    stage_times["report"] += time.perf_counter() - matched
+    return alerts
+
+def report_alert(alert):
+    """Correlate, display and log one alert"""
+    alert = correlate_alert(alert)
     
-    alerts = []
-    ip = pkt[IP]
-    sport = pkt.sport if hasattr(pkt, "sport") else None
-    dport = pkt.dport if hasattr(pkt, "dport") else None
+    # Enhanced alert display
+    severity_color = "red" if alert.get("threat_score", 0) > 100 else "yellow" if alert.get("threat_score", 0) > 50 else "green"
+    escalated_text = " [ESCALATED]" if alert.get("escalated", False) else ""
     
-    # Update behavioral baseline
-    update_behavioral_baseline(pkt)
+    console.print(f"[bold {severity_color}][!] ALERT{escalated_text}:[/bold {severity_color}] {alert['msg']}")
+    console.print(f"    [cyan]SID:[/cyan] {alert['sid']} | [cyan]Threat Score:[/cyan] {alert.get('threat_score', 0)}")
+    console.print(f"    [cyan]Traffic:[/cyan] {alert['src']}:{alert['sport']} -> {alert['dst']}:{alert['dport']} ({alert['proto']})")
+    console.print(f"    [cyan]Size:[/cyan] {alert.get('packet_size', 0)} bytes | [cyan]Class:[/cyan] {alert.get('rule_class', 'unknown')}")
     
-    # Check for behavioral anomalies
-    anomalies = detect_anomalies(pkt)
+    if alert.get('behavioral_anomalies'):
+        console.print(f"    [yellow]Behavioral Anomalies:[/yellow] {len(alert['behavioral_anomalies'])} detected")
     
-    # Process rules
-    for rule in rules:
-        if rule["proto"].lower() == "tcp" and not pkt.haslayer(TCP):
-            continue
-        if rule["proto"].lower() == "udp" and not pkt.haslayer(UDP):
+    logger.info(json.dumps(alert))
+
+# ============================
+# Raw AF_PACKET Capture
+# ============================
+ETH_P_ALL = 0x0003
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V2 = 1
+TP_STATUS_USER = 1
+TPACKET2_HDR = struct.Struct("IIIHHII")  # status, len, snaplen, mac, net, sec, nsec
+
+class RawSocketSniffer:
+    """AsyncSniffer stand-in reading AF_PACKET frames without scapy dissection.
+
+    Each frame is decoded with PacketInfo.from_frame and handed to prn. With
+    ring=True frames come from a TPACKET_V2 mmap ring instead of one recv()
+    per packet. Any object with recv() can be passed as sock, e.g. a fake
+    socket replaying a pcap for offline testing.
+    """
+
+    def __init__(self, prn, iface=None, ring=False, sock=None, link=None):
+        self.prn = prn
+        self.iface = iface
+        self.ring = ring
+        self.sock = sock
+        self.link = link or self.link_type(iface)
+        self.running = False
+        self.thread = None
+        self.received = 0
+        self.skipped = 0
+
+    @staticmethod
+    def link_type(iface):
+        """Ethernet framing unless the interface carries bare IP (tun, ARPHRD_NONE)"""
+        try:
+            with open(f"/sys/class/net/{iface}/type") as f:
+                return "raw" if int(f.read()) == 65534 else "ether"
+        except (OSError, ValueError, TypeError):
+            return "ether"
+
+    def open_socket(self):
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if self.iface:
+            sock.bind((self.iface, 0))
+        return sock
+
+    def start(self):
+        if self.sock is None:
+            self.sock = self.open_socket()
+        self.running = True
+        target = self.run_ring if self.ring else self.run_recv
+        self.thread = threading.Thread(target=target, name="netwatch-afpacket", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        if hasattr(self.sock, "close"):
+            self.sock.close()
+
+    def deliver(self, frame, timestamp):
+        info = PacketInfo.from_frame(frame, timestamp, self.link)
+        if info is None:
+            self.skipped += 1
+            return
+        self.received += 1
+        self.prn(info)
+
+    def run_recv(self):
+        if hasattr(self.sock, "settimeout"):
+            self.sock.settimeout(0.5)
+        while self.running:
+            try:
+                frame = self.sock.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not frame:
+                break
+            self.deliver(frame, time.time())
+
+    def run_ring(self):
+        frame_size = CAPTURE_RING_FRAME_SIZE
+        block_size = max(mmap.PAGESIZE, frame_size) * 16
+        frames_per_block = block_size // frame_size
+        blocks = max(1, CAPTURE_RING_FRAMES // frames_per_block)
+        frame_count = blocks * frames_per_block
+        self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V2)
+        self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING,
+                             struct.pack("IIII", block_size, blocks, frame_size, frame_count))
+        ring = mmap.mmap(self.sock.fileno(), block_size * blocks, mmap.MAP_SHARED,
+                         mmap.PROT_READ | mmap.PROT_WRITE)
+        poller = select.poll()
+        poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        index = 0
+        try:
+            while self.running:
+                base = index * frame_size
+                status, _, snaplen, mac, _, sec, nsec = TPACKET2_HDR.unpack_from(ring, base)
+                if not status & TP_STATUS_USER:
+                    poller.poll(500)
+                    continue
+                self.deliver(ring[base + mac:base + mac + snaplen], sec + nsec / 1e9)
+                struct.pack_into("I", ring, base, 0)  # hand the frame back to the kernel
+                index = (index + 1) % frame_count
+        finally:
+            ring.close()
+
+    def stats(self):
+        return {"backend": "afpacket-ring" if self.ring else "afpacket",
+                "received": self.received, "skipped": self.skipped}
+
+CAPTURE_FILTER = None  # CaptureFilter attached to the running capture, if any
+
+class ListeningSniffer(AsyncSniffer):
+    """AsyncSniffer on a socket opened for it, closed again on stop like RawSocketSniffer's"""
+
+    def stop(self, join=True):
+        try:
+            return super().stop(join=join)
+        finally:
+            self.kwargs["opened_socket"].close()
+
+def make_sniffer(prn, backend=CAPTURE_BACKEND, iface=None, ring=False, capture_filter=None):
+    """Build the capture object for the chosen backend, with the ruleset's BPF attached.
+
+    With CAPTURE_BPF the packet socket is opened here even for a pass-through
+    filter, so a reload can attach a narrower one to the running capture.
+    """
+    if backend == "afpacket":
+        sniffer = RawSocketSniffer(prn, iface=iface, ring=ring)
+        if CAPTURE_BPF and capture_filter is not None and sniffer.link == "ether":
+            sniffer.sock = sniffer.open_socket()
+    elif CAPTURE_BPF and capture_filter is not None:
+        # Attach our own program rather than passing filter=, which needs libpcap
+        sniffer = ListeningSniffer(prn=prn, store=0, opened_socket=conf.L2listen(iface=iface))
+    else:
+        sniffer = AsyncSniffer(prn=prn, store=0, iface=iface)
+    refresh_capture_filter(sniffer, capture_filter)
+    return sniffer
+
+def refresh_capture_filter(sniffer, capture_filter):
+    """Attach capture_filter to a sniffer's socket, replacing any earlier program"""
+    global CAPTURE_FILTER
+    CAPTURE_FILTER = None
+    if isinstance(sniffer, RawSocketSniffer):
+        sock = sniffer.sock if sniffer.link == "ether" else None
+    else:
+        sock = getattr(sniffer.kwargs.get("opened_socket"), "ins", None)
+    if sock is None or capture_filter is None:
+        return
+    if capture_filter.attach(sock):
+        CAPTURE_FILTER = capture_filter
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
+    except OSError:
+        pass  # no program was attached
+
+# ============================
+# Capture Queue
+# ============================
+class PacketRing:
+    """Bounded buffer between the capture thread and the asyncio matcher.
+
+    The producer only wakes the event loop when the ring goes from empty to
+    non-empty, and the consumer drains up to a batch per wakeup. When full,
+    the policy drops the new packet, drops the oldest one, or blocks capture.
+    """
+
+    POLICIES = ("drop-newest", "drop-oldest", "block")
+
+    def __init__(self, loop, capacity=CAPTURE_QUEUE_SIZE, policy=CAPTURE_QUEUE_POLICY):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown capture queue policy: {policy}")
+        self.loop = loop
+        self.capacity = capacity
+        self.policy = policy
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.not_full = threading.Condition(self.lock)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.high_watermark = 0
+
+    def put(self, pkt):
+        """Capture-thread side; never touches the event loop unless the ring was empty"""
+        with self.lock:
+            if len(self.items) >= self.capacity:
+                if self.policy == "drop-newest":
+                    self.dropped += 1
+                    return
+                if self.policy == "drop-oldest":
+                    self.items.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self.items) >= self.capacity and not self.closed:
+                        self.not_full.wait(0.1)
+                    if self.closed:
+                        return
+            was_empty = not self.items
+            self.items.append(pkt)
+            self.enqueued += 1
+            if len(self.items) > self.high_watermark:
+                self.high_watermark = len(self.items)
+        if was_empty:
+            self.loop.call_soon_threadsafe(self.ready.set)
+
+    async def get_batch(self, size=CAPTURE_BATCH_SIZE):
+        """Wait until packets are available and take up to size of them"""
+        while True:
+            self.ready.clear()
+            with self.lock:
+                if self.items:
+                    count = min(size, len(self.items))
+                    batch = [self.items.popleft() for _ in range(count)]
+                    self.not_full.notify_all()
+                    return batch
+            await self.ready.wait()
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.not_full.notify_all()
+
+    def stats(self):
+        return {"depth": len(self.items), "capacity": self.capacity, "policy": self.policy,
+                "enqueued": self.enqueued, "dropped": self.dropped,
+                "high_watermark": self.high_watermark}
+
+CAPTURE_RING = None
+
+# ============================
+# Multi-process Worker Pool
+# ============================
+def flow_shard(pkt, shards):
+    """Map a packet to a worker by a hash of its direction-independent 5-tuple"""
+    if isinstance(pkt, PacketInfo):
+        proto = pkt.proto
+        a = (pkt.src, pkt.sport or 0)
+        b = (pkt.dst, pkt.dport or 0)
+    elif IP in pkt:
+        ip = pkt[IP]
+        proto = ip.proto
+        a = (ip.src, pkt.sport if hasattr(pkt, "sport") else 0)
+        b = (ip.dst, pkt.dport if hasattr(pkt, "dport") else 0)
+    else:
+        return 0
+    return hash((proto,) + (a + b if a <= b else b + a)) % shards
+
+def ids_worker(index, rules, packets, results):
+    """Worker process: match its shard of packets with its own rules and flow state"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    processed = 0
+    last_report = time.time()
+    pending = []  # a stop or reload message met while draining a batch
+    while True:
+        if pending:
+            item = pending.pop()
+        else:
+            try:
+                item = packets.get(timeout=WORKER_STATS_INTERVAL)
+            except queue.Empty:
+                item = ()
+        if item is None:
+            break
+        if item and item[0] == "reload":
+            _, rules, flowbit_names = item
+            adopt_cached_rules(rules.rules, flowbit_names)
             continue
-        
-        opts = rule["options"]
-        match = True
-        
-        # Content matching
-        if "content" in opts:
-            raw = bytes(pkt).decode(errors="ignore")
-            if opts["content"] not in raw:
-                match = False
-        
-        # Size matching
-        if "dsize" in opts:
-            dsize_rule = opts["dsize"]
-            if dsize_rule.startswith(">"):
-                size_limit = int(dsize_rule[1:])
-                if len(pkt) <= size_limit:
-                    match = False
-            elif dsize_rule.startswith("<"):
-                size_limit = int(dsize_rule[1:])
-                if len(pkt) >= size_limit:
-                    match = False
-        
-        if match:
-            alert = {
-                "msg": opts.get("msg", "Suspicious traffic detected"),
-                "sid": opts.get("sid", "0"),
-                "src": ip.src,
-                "dst": ip.dst,
-                "sport": sport,
-                "dport": dport,
-                "proto": rule["proto"],
-                "timestamp": time.time(),
-                "packet_size": len(pkt),
-                "rule_class": opts.get("classtype", "unknown"),
-                "behavioral_anomalies": anomalies
-            }
-            alerts.append(alert)
-    
-    return alerts
+        if item:
+            # Drain what else is queued so the baseline is updated once per batch
+            batch = [item]
+            while len(batch) < CAPTURE_BATCH_SIZE:
+                try:
+                    item = packets.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None or item[0] == "reload":
+                    pending.append(item)
+                    break
+                batch.append(item)
+            pkts = []
+            for layer, raw, timestamp in batch:
+                if isinstance(layer, str):
+                    pkt = PacketInfo.from_frame(raw, timestamp, layer)
+                else:
+                    pkt = layer(raw)
+                    pkt.time = timestamp
+                if pkt is not None:
+                    pkts.append(pkt)
+            processed += len(batch)
+            alerts = [alert for packet_alerts in match_batch(pkts, rules) for alert in packet_alerts]
+            if alerts:
+                results.put(("alerts", index, alerts))
+        now = time.time()
+        if now - last_report >= WORKER_STATS_INTERVAL:
+            results.put(("stats", index, {"processed": processed, "flows": FLOW_TABLE.stats()["active"],
+                                          "suppressed": THRESHOLD_TABLE.suppressed,
+                                          "top_talkers": TOP_TALKERS_TABLE.snapshot() if TOP_TALKERS else None}))
+            last_report = now
+
+class WorkerPool:
+    """N matcher processes fed by the capture thread and merged into one alert stream"""
+
+    def __init__(self, rules, workers, queue_size=WORKER_QUEUE_SIZE):
+        self.rules = rules
+        self.workers = workers
+        self.packet_queues = [multiprocessing.Queue(queue_size) for _ in range(workers)]
+        self.results = multiprocessing.Queue()
+        self.dropped = [0] * workers
+        self.dispatched = [0] * workers
+        self.worker_stats = [{} for _ in range(workers)]
+        self.processes = []
+
+    def start(self):
+        for index in range(self.workers):
+            process = multiprocessing.Process(
+                target=ids_worker, args=(index, self.rules, self.packet_queues[index], self.results),
+                name=f"netwatch-worker-{index}", daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def dispatch(self, pkt):
+        """Capture-thread callback: hand the packet to its flow's worker or count a drop"""
+        shard = flow_shard(pkt, self.workers)
+        if isinstance(pkt, PacketInfo):
+            item = (pkt.link, pkt.raw, pkt.timestamp)
+        else:
+            item = (type(pkt), bytes(pkt), float(pkt.time))
+        try:
+            self.packet_queues[shard].put_nowait(item)
+            self.dispatched[shard] += 1
+        except queue.Full:
+            self.dropped[shard] += 1
+
+    def reload(self, rules):
+        """Ship a new RuleSet to every worker; each swaps it in between packets"""
+        self.rules = rules
+        for packets in self.packet_queues:
+            try:
+                packets.put(("reload", rules, list(FLOWBIT_INDEX)), timeout=5)
+            except queue.Full:
+                console.log("[red]Worker queue stayed full; worker keeps its old rules[/red]")
+
+    def next_alerts(self, timeout=0.5):
+        """Blocking read of merged worker output; returns the alerts it carried"""
+        try:
+            kind, index, payload = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        if kind == "stats":
+            self.worker_stats[index] = payload
+            return []
+        return payload
+
+    def stop(self):
+        for packets in self.packet_queues:
+            try:
+                packets.put_nowait(None)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+
+    def stats(self):
+        rows = []
+        for index in range(self.workers):
+            try:
+                depth = self.packet_queues[index].qsize()
+            except NotImplementedError:
+                depth = -1
+            rows.append({"worker": index, "queue_depth": depth, "dispatched": self.dispatched[index],
+                         "dropped": self.dropped[index], **self.worker_stats[index]})
+        return rows
+
+WORKER_POOL = None
 
 # ============================
-# IDS Packet Handler
+# Hot Rule Reload
 # ============================
-def handle_packet(pkt, rules):
-    """Enhanced packet handler with advanced analytics"""
-    alerts = match_packet(pkt, rules)
-    for alert in alerts:
-        alert = correlate_alert(alert)
-        
-        # Enhanced alert display
-        severity_color = "red" if alert.get("threat_score", 0) > 100 else "yellow" if alert.get("threat_score", 0) > 50 else "green"
-        escalated_text = " [ESCALATED]" if alert.get("escalated", False) else ""
-        
-        console.print(f"[bold {severity_color}][!] ALERT{escalated_text}:[/bold {severity_color}] {alert['msg']}")
-        console.print(f"    [cyan]SID:[/cyan] {alert['sid']} | [cyan]Threat Score:[/cyan] {alert.get('threat_score', 0)}")
-        console.print(f"    [cyan]Traffic:[/cyan] {alert['src']}:{alert['sport']} -> {alert['dst']}:{alert['dport']} ({alert['proto']})")
-        console.print(f"    [cyan]Size:[/cyan] {alert.get('packet_size', 0)} bytes | [cyan]Class:[/cyan] {alert.get('rule_class', 'unknown')}")
-        
-        if alert.get('behavioral_anomalies'):
-            console.print(f"    [yellow]Behavioral Anomalies:[/yellow] {len(alert['behavioral_anomalies'])} detected")
-        
-        logger.info(json.dumps(alert))
+class RuleReloader:
+    """Owns the live RuleSet and rebuilds it on a background thread.
+
+    The matcher reads .ruleset between packets; a reload replaces it with a
+    single assignment, so capture and matching never wait on compilation.
+    Files unchanged since the last load come from the compiled rule cache.
+    """
+
+    def __init__(self, ruleset=None):
+        self.ruleset = ruleset
+        self.listeners = []  # called with the new RuleSet after each swap
+        self.thread = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_seconds = None
+
+    def request(self):
+        """Start a reload unless one is already running; True if started"""
+        if self.thread is not None and self.thread.is_alive():
+            console.log("[yellow]Rule reload already in progress[/yellow]")
+            return False
+        self.thread = threading.Thread(target=self.run, name="netwatch-reload", daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        old = self.ruleset
+        started = time.perf_counter()
+        try:
+            ruleset = load_rules()
+        except Exception as e:
+            self.failures += 1
+            console.log(f"[red]Rule reload failed, keeping the current rules: {e}[/red]")
+            return
+        self.last_seconds = time.perf_counter() - started
+        self.ruleset = ruleset
+        self.reloads += 1
+        for listener in list(self.listeners):
+            try:
+                listener(ruleset)
+            except Exception as e:
+                console.log(f"[red]Rule reload listener failed: {e}[/red]")
+        console.log(f"[green]Rules reloaded: {len(old) if old is not None else 0} -> {len(ruleset)} rules, "
+                    f"compiled in {self.last_seconds * 1000:.0f} ms[/green]")
+
+RULE_RELOADER = RuleReloader()
+
+def install_reload_signal():
+    """Reload rules on SIGHUP where the platform has it"""
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: RULE_RELOADER.request())
 
 # ============================
 # Live Async IDS
 # ============================
-async def async_ids(rules):
+async def async_ids(rules, workers=0, queue_size=CAPTURE_QUEUE_SIZE, queue_policy=CAPTURE_QUEUE_POLICY,
+                    backend=CAPTURE_BACKEND, iface=None, ring_buffer=False):
+    global CAPTURE_RING
+    if workers > 0:
+        await async_ids_workers(rules, workers, backend, iface, ring_buffer)
+        return
+
     loop = asyncio.get_event_loop()
-    queue = asyncio.Queue()
+    CAPTURE_RING = ring = PacketRing(loop, queue_size, queue_policy)
+
+    sniffer = make_sniffer(ring.put, backend, iface, ring_buffer, rules.capture_filter)
+    sniffer.start()
+    refresh = lambda ruleset: refresh_capture_filter(sniffer, ruleset.capture_filter)
+    RULE_RELOADER.listeners.append(refresh)
 
-    def scapy_callback(pkt):
-        loop.call_soon_threadsafe(queue.put_nowait, pkt)
+    try:
+        while True:
+            batch = await ring.get_batch(CAPTURE_BATCH_SIZE)
+            if RULE_RELOADER.ruleset is not None:
+                rules = RULE_RELOADER.ruleset
+            for alerts in match_batch(batch, rules):
+                for alert in alerts:
+                    report_alert(alert)
+            export_top_talkers_due(time.time())
+            await asyncio.sleep(0)
+    except asyncio.CancelledError:
+        RULE_RELOADER.listeners.remove(refresh)
+        sniffer.stop()
+        ring.close()
+        console.log("[red]IDS Stopped.[/red]")
 
-    sniffer = AsyncSniffer(prn=scapy_callback, store=0)
+async def async_ids_workers(rules, workers, backend=CAPTURE_BACKEND, iface=None, ring_buffer=False):
+    """Capture in this process and shard matching across worker processes by flow"""
+    global WORKER_POOL
+    loop = asyncio.get_event_loop()
+    WORKER_POOL = pool = WorkerPool(rules, workers)
+    pool.start()
+    sniffer = make_sniffer(pool.dispatch, backend, iface, ring_buffer, rules.capture_filter)
     sniffer.start()
+    console.log(f"[green]Matching on {workers} worker processes[/green]")
+    listeners = [pool.reload, lambda ruleset: refresh_capture_filter(sniffer, ruleset.capture_filter)]
+    RULE_RELOADER.listeners.extend(listeners)
 
     try:
         while True:
-            pkt = await queue.get()
-            handle_packet(pkt, rules)
+            for alert in await loop.run_in_executor(None, pool.next_alerts):
+                report_alert(alert)
+            export_top_talkers_due(time.time())
     except asyncio.CancelledError:
+        for listener in listeners:
+            RULE_RELOADER.listeners.remove(listener)
         sniffer.stop()
+        try:
+            pool.stop()
+        finally:
+            # Stats and top talkers fall back to this process once the pool is gone
+            WORKER_POOL = None
         console.log("[red]IDS Stopped.[/red]")
 
+# ============================
+# Offline Pcap Replay
+# ============================
+PCAP_RAW_LINKTYPES = {1: "ether", 12: "raw", 101: "raw", 228: "raw", 229: "raw"}
+
+def pcap_timestamp(reader, meta):
+    """Packet time in seconds from pcap or pcapng record metadata"""
+    if hasattr(meta, "tshigh"):
+        return ((meta.tshigh << 32) + meta.tslow) / meta.tsresol
+    return meta.sec + meta.usec * (1e-9 if getattr(reader, "nano", False) else 1e-6)
+
+def replay_pcap(path, rules, loop=1, speed="max", backend=CAPTURE_BACKEND):
+    """Stream a pcap/pcapng file through handle_packet and report throughput.
+
+    Records are read one at a time, so memory does not grow with the file.
+    backend "afpacket" decodes with PacketInfo.from_frame like the raw
+    capture path; "scapy" dissects every packet. speed "realtime" sleeps to
+    honour the gaps between capture timestamps.
+    """
+    stage_times = {"read": 0.0, "decode": 0.0, "match": 0.0, "report": 0.0}
+    alert_counts = Counter()
+    packets = total_bytes = skipped = 0
+    started = time.perf_counter()
+    try:
+        for _ in range(max(1, loop)):
+            first_timestamp = None
+            loop_start = time.perf_counter()
+            with RawPcapReader(path) as reader:
+                records = iter(reader)
+                while True:
+                    read_start = time.perf_counter()
+                    record = next(records, None)
+                    if record is None:
+                        break
+                    data, meta = record
+                    decode_start = time.perf_counter()
+                    timestamp = pcap_timestamp(reader, meta)
+                    linktype = getattr(meta, "linktype", None) or reader.linktype
+                    if backend == "afpacket":
+                        link = PCAP_RAW_LINKTYPES.get(linktype)
+                        pkt = PacketInfo.from_frame(data, timestamp, link) if link else None
+                    else:
+                        pkt = conf.l2types.num2layer.get(linktype, conf.raw_layer)(data)
+                        pkt.time = timestamp
+                    decoded = time.perf_counter()
+                    stage_times["read"] += decode_start - read_start
+                    stage_times["decode"] += decoded - decode_start
+                    if pkt is None:
+                        skipped += 1
+                        continue
+                    if speed == "realtime":
+                        if first_timestamp is None:
+                            first_timestamp = timestamp
+                        delay = (timestamp - first_timestamp) - (decoded - loop_start)
+                        if delay > 0:
+                            time.sleep(delay)
+                    packets += 1
+                    total_bytes += len(data)
+                    for alert in handle_packet(pkt, rules, stage_times):
+                        alert_counts[alert["sid"]] += 1
+    except KeyboardInterrupt:
+        console.log("[yellow]Replay interrupted; reporting packets processed so far[/yellow]")
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    summary = {
+        "file": path, "loops": loop, "speed": speed, "backend": backend,
+        "packets": packets, "bytes": total_bytes, "skipped": skipped, "seconds": elapsed,
+        "pps": packets / elapsed, "mbps": total_bytes * 8 / elapsed / 1e6,
+        "stage_seconds": stage_times, "alerts": sum(alert_counts.values()),
+        "alerts_by_sid": dict(alert_counts.most_common()),
+    }
+    if TOP_TALKERS:
+        summary["top_talkers"] = TOP_TALKERS_TABLE.snapshot(10)
+        export_top_talkers(snapshot=TOP_TALKERS_TABLE.snapshot())
+    show_replay_summary(summary)
+    return summary
+
+def show_replay_summary(summary):
+    """Print the throughput, stage timing and alert tables for a replay"""
+    console.print(f"[green]Replayed:[/green] {summary['packets']} packets, {summary['bytes']} bytes "
+                  f"in {summary['seconds']:.2f}s ({summary['skipped']} skipped)")
+    console.print(f"[green]Throughput:[/green] {summary['pps']:,.0f} pps, {summary['mbps']:.2f} Mbps")
+    stage_table = Table(title="Time per Stage", show_header=True, header_style="bold green")
+    for column in ("Stage", "Seconds", "us/packet", "Share"):
+        stage_table.add_column(column)
+    busy = sum(summary["stage_seconds"].values()) or 1e-9
+    for stage, seconds in summary["stage_seconds"].items():
+        stage_table.add_row(stage, f"{seconds:.3f}", f"{seconds / max(summary['packets'], 1) * 1e6:.1f}",
+                            f"{seconds / busy:.1%}")
+    console.print(stage_table)
+    alert_table = Table(title=f"Alerts ({summary['alerts']})", show_header=True, header_style="bold green")
+    for column in ("SID", "Count"):
+        alert_table.add_column(column)
+    for sid, count in list(summary["alerts_by_sid"].items())[:10]:
+        alert_table.add_row(str(sid), str(count))
+    console.print(alert_table)
+    show_top_talkers(summary.get("top_talkers"))
+
 # ============================
 # Real-time Dashboard
 # ============================
@@ -383,11 +3863,11 @@ async def update_dashboard(layout, rules):
             alerts_table.add_column("Threat Score", style="red", width=12)
             
             # Add recent alerts (last 10)
-            recent_alerts = list(ALERT_HISTORY.items())[-10:]
-            for sid, timestamps in recent_alerts:
-                if timestamps:
-                    latest_time = datetime.fromtimestamp(timestamps[-1]).strftime("%H:%M:%S")
-                    alerts_table.add_row(latest_time, "HIGH", f"SID: {sid}", "Unknown", "100")
+            for key, last, count, src in CORRELATION.recent(10):
+                latest_time = datetime.fromtimestamp(last).strftime("%H:%M:%S")
+                label = f"SID: {key[1]} x{count}" if key[0] != "src" else f"{count} alerts"
+                alerts_table.add_row(latest_time, "HIGH", label, src or "Unknown",
+                                     f"{CORRELATION.score(src):.0f}")
             
             layout["alerts"].update(Panel(alerts_table, title="[bold blue]Active Alerts[/bold blue]", border_style="blue"))
             
@@ -397,10 +3877,10 @@ async def update_dashboard(layout, rules):
             stats_table.add_column("Value", style="cyan", width=15)
             
             stats_table.add_row("Rules Loaded", str(len(rules)))
-            stats_table.add_row("Active Alerts", str(len(ALERT_HISTORY)))
+            stats_table.add_row("Active Alerts", str(CORRELATION.active()))
             stats_table.add_row("Threat IPs", str(len(THREAT_INTEL["malicious_ips"])))
             stats_table.add_row("Threat Domains", str(len(THREAT_INTEL["malicious_domains"])))
-            stats_table.add_row("Packets Analyzed", str(BEHAVIORAL_BASELINE["normal_traffic_volume"]))
+            stats_table.add_row("Packets Analyzed", str(BEHAVIORAL_BASELINE.packets))
             
             layout["stats"].update(Panel(stats_table, title="[bold green]System Stats[/bold green]", border_style="green"))
             
@@ -409,20 +3889,158 @@ async def update_dashboard(layout, rules):
 # ============================
 # Main Menu / Console Loop
 # ============================
+def show_stats(rules):
+    """Print engine statistics for the stats command"""
+    console.print(f"[green]Rules loaded:[/green] {len(rules)}")
+    console.print(f"[green]Threat IPs:[/green] {len(THREAT_INTEL['malicious_ips'])}")
+    domains = THREAT_INTEL["malicious_domains"]
+    console.print(f"[green]Threat Domains:[/green] {len(domains)} "
+                  f"(lookup cache {len(domains.cache)}/{domains.cache_size}, {domains.hits} hits, "
+                  f"{domains.misses} misses)")
+    console.print(f"[green]DNS:[/green] {DNS_STATS['messages']} messages, {DNS_STATS['names']} names, "
+                  f"{DNS_STATS['intel_hits']} intel hits")
+    for kind in INTEL_FEEDS:
+        bloom = getattr(THREAT_INTEL[kind], "bloom", None)
+        if bloom is not None:
+            stats = bloom.stats()
+            console.print(f"[green]Bloom {kind}:[/green] {stats['entries']} entries, "
+                          f"{stats['bytes'] / 1048576:.1f} MB, {stats['hashes']} hashes, "
+                          f"{stats['queries']} queries, {stats['passes']} passed, "
+                          f"{stats['false_positives']} false positives")
+    baseline_stats = BEHAVIORAL_BASELINE.stats()
+    console.print(f"[green]Baseline:[/green] {baseline_stats['packets']} packets, "
+                  f"{baseline_stats['ports_seen']} usual ports, {baseline_stats['anomalies']} anomalies, "
+                  f"{baseline_stats['decayed_bytes'] / 1048576:.1f} MB recent volume, "
+                  f"{baseline_stats['memory_bytes'] / 1024:.0f} KB arrays")
+    correlation_stats = CORRELATION.stats()
+    console.print(f"[green]Active alerts:[/green] {CORRELATION.active()} correlation keys "
+                  f"({', '.join(CORRELATION.keys)}), {correlation_stats['escalations']} escalations, "
+                  f"{correlation_stats['hosts']} scored hosts, {correlation_stats['expired_keys']} keys expired, "
+                  f"{correlation_stats['evicted_hosts']} hosts evicted")
+    flow_stats = FLOW_TABLE.stats()
+    console.print(f"[green]Flows:[/green] {flow_stats['active']}/{flow_stats['max_flows']} active, "
+                  f"{flow_stats['created']} created, {flow_stats['evicted_idle']} idle evictions, "
+                  f"{flow_stats['evicted_memcap']} memcap evictions, "
+                  f"~{flow_stats['memory_bytes'] / 1048576:.1f} MB")
+    threshold_stats = THRESHOLD_TABLE.stats()
+    console.print(f"[green]Thresholds:[/green] {threshold_stats['trackers']} trackers, "
+                  f"{threshold_stats['passed']} passed, {threshold_stats['suppressed']} suppressed")
+    stream_stats = STREAM_REASSEMBLER.stats()
+    console.print(f"[green]Reassembly:[/green] {stream_stats['segments']} segments, "
+                  f"{stream_stats['out_of_order']} out-of-order, {stream_stats['overlaps']} overlaps, "
+                  f"{stream_stats['ooo_dropped']} OOO dropped, {stream_stats['truncated']} truncated, "
+                  f"{stream_stats['memcap_drops']} memcap drops, "
+                  f"{stream_stats['memory_bytes'] / 1048576:.1f} MB buffered")
+    if RULE_RELOADER.reloads or RULE_RELOADER.failures:
+        console.print(f"[green]Rule reloads:[/green] {RULE_RELOADER.reloads} "
+                      f"(last compiled in {(RULE_RELOADER.last_seconds or 0) * 1000:.0f} ms), "
+                      f"{RULE_RELOADER.failures} failed")
+    capture_filter = rules.capture_filter
+    if capture_filter.program is None:
+        console.print("[green]Capture filter:[/green] pass-through (no narrower filter fits)")
+    else:
+        state = "attached" if CAPTURE_FILTER is capture_filter else "not attached"
+        console.print(f"[green]Capture filter:[/green] {capture_filter.expression} "
+                      f"({len(capture_filter.program)} BPF instructions, {state}, "
+                      f"{capture_filter.unfiltered} rules not protocol-bound left out)")
+    dropped, total = capture_filter.estimate(FLOW_TABLE.flows)
+    if total:
+        console.print(f"[green]Filter estimate:[/green] {dropped}/{total} packets in tracked flows "
+                      f"({dropped / total:.1%}) would be dropped in the kernel")
+    bucket_table = Table(title="Hottest Rule Buckets", show_header=True, header_style="bold green")
+    for column in ("Proto", "Kind", "Port", "Rules", "Visits"):
+        bucket_table.add_column(column)
+    for proto, kind, port, size, visits in rules.index.bucket_sizes(top=10):
+        bucket_table.add_row(proto, kind, "-" if port is None else str(port), str(size), str(visits))
+    console.print(bucket_table)
+    pcre_table = Table(title="Most Expensive PCRE", show_header=True, header_style="bold green")
+    for column in ("Pattern", "Evals", "Matches", "Total ms", "Avg us"):
+        pcre_table.add_column(column)
+    for pattern in pcre_stats(top=10):
+        if not pattern.evaluations:
+            break
+        pcre_table.add_row(pattern.source[:60], str(pattern.evaluations), str(pattern.matches),
+                           f"{pattern.total_time * 1000:.1f}",
+                           f"{pattern.total_time / pattern.evaluations * 1e6:.1f}")
+    console.print(pcre_table)
+    if CAPTURE_RING is not None:
+        ring_stats = CAPTURE_RING.stats()
+        console.print(f"[green]Capture queue:[/green] {ring_stats['depth']}/{ring_stats['capacity']} "
+                      f"({ring_stats['policy']}), {ring_stats['enqueued']} enqueued, "
+                      f"{ring_stats['dropped']} dropped, high watermark {ring_stats['high_watermark']}")
+    if TOP_TALKERS:
+        snapshot = top_talkers_snapshot()
+        if snapshot is not None:
+            console.print(f"[green]Top talkers:[/green] {snapshot['memory_bytes'] / 1024:.0f} KB of sketches, "
+                          f"exported to {export_top_talkers(snapshot=snapshot)}")
+            show_top_talkers(snapshot)
+    if WORKER_POOL is not None:
+        worker_table = Table(title="Workers", show_header=True, header_style="bold green")
+        for column in ("Worker", "Queue", "Dispatched", "Dropped", "Processed", "Flows"):
+            worker_table.add_column(column)
+        for row in WORKER_POOL.stats():
+            worker_table.add_row(str(row["worker"]), str(row["queue_depth"]), str(row["dispatched"]),
+                                 str(row["dropped"]), str(row.get("processed", "-")), str(row.get("flows", "-")))
+        console.print(worker_table)
+
+def is_ids_command(cmd):
+    """Whether a console line is "ids ..." or "start ids ...", with or without options"""
+    words = cmd.lower().split()
+    return words[:1] == ["ids"] or words[:2] == ["start", "ids"]
+
+def parse_ids_args(cmd):
+    """Parse the options of the ids console command; None if they are invalid"""
+    parser = argparse.ArgumentParser(prog="ids", add_help=False)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="match in N worker processes sharded by flow")
+    parser.add_argument("--queue-size", type=int, default=CAPTURE_QUEUE_SIZE,
+                        help="packets buffered between capture and matching")
+    parser.add_argument("--queue-policy", choices=PacketRing.POLICIES, default=CAPTURE_QUEUE_POLICY,
+                        help="what to do when the capture queue is full")
+    parser.add_argument("--backend", choices=("scapy", "afpacket"), default=CAPTURE_BACKEND,
+                        help="capture with scapy or raw AF_PACKET sockets")
+    parser.add_argument("--iface", default=None, help="interface to capture on")
+    parser.add_argument("--ring", action="store_true",
+                        help="use a TPACKET_V2 mmap ring with the afpacket backend")
+    parser.add_argument("--pcap", default=None, help="replay a pcap/pcapng file instead of capturing")
+    parser.add_argument("--loop", type=int, default=1, help="replay the pcap N times")
+    parser.add_argument("--speed", choices=("max", "realtime"), default="max",
+                        help="replay as fast as possible or at capture timing")
+    words = shlex.split(cmd)
+    words = words[2:] if [word.lower() for word in words[:2]] == ["start", "ids"] else words[1:]
+    try:
+        return parser.parse_args(words)
+    except SystemExit:
+        console.print(f"[red]Usage:[/red] {parser.format_usage().strip()}")
+        return None
+
 async def main():
     banner()
-    rules = load_rules()
+    RULE_RELOADER.ruleset = load_rules()
     load_threat_intelligence()
+    install_reload_signal()
 
     while True:
         console.print("[bold cyan]netwatch> [/bold cyan]", end="")
         cmd = input().strip()
+        rules = RULE_RELOADER.ruleset
         if cmd.lower() in ["exit", "quit"]:
             break
-        elif cmd.lower() in ["ids", "start ids"]:
+        elif is_ids_command(cmd):
+            args = parse_ids_args(cmd)
+            if args is None:
+                continue
+            if args.pcap:
+                if not os.path.exists(args.pcap):
+                    console.print(f"[red]No such pcap:[/red] {args.pcap}")
+                    continue
+                replay_pcap(args.pcap, rules, loop=args.loop, speed=args.speed, backend=args.backend)
+                continue
             console.log("[green]Starting live IDS... Press Ctrl+C to exit IDS.[/green]")
             try:
-                await async_ids(rules)
+                await async_ids(rules, workers=args.workers, queue_size=args.queue_size,
+                                queue_policy=args.queue_policy, backend=args.backend,
+                                iface=args.iface, ring_buffer=args.ring)
             except KeyboardInterrupt:
                 console.log("[yellow]Returning to main console...[/yellow]")
         elif cmd.lower() == "dashboard":
@@ -433,12 +4051,16 @@ async def main():
             except KeyboardInterrupt:
                 console.log("[yellow]Returning to main console...[/yellow]")
         elif cmd.lower() == "stats":
-            console.print(f"[green]Rules loaded:[/green] {len(rules)}")
-            console.print(f"[green]Threat IPs:[/green] {len(THREAT_INTEL['malicious_ips'])}")
-            console.print(f"[green]Threat Domains:[/green] {len(THREAT_INTEL['malicious_domains'])}")
-            console.print(f"[green]Active alerts:[/green] {len(ALERT_HISTORY)}")
+            show_stats(rules)
+        elif cmd.lower() == "reload":
+            RULE_RELOADER.request()
+        elif cmd.lower().split()[:1] == ["profile"]:
+            rule_profile_command(cmd)
         elif cmd.lower() == "help":
-            console.print("Commands: ids, dashboard, stats, help, exit")
+            console.print("Commands: ids [--workers N] [--queue-size N] [--queue-policy P] "
+                          "[--backend scapy|afpacket] [--iface IF] [--ring] "
+                          "[--pcap FILE [--loop N] [--speed max|realtime]], dashboard, stats, reload, "
+                          "profile [on|off|reset|top N|avg N|dump [FILE] [N]], help, exit")
         else:
             console.print(f"Unknown command: {cmd}")
 
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+import ids_dashboard as ids
+from scapy.all import IP, TCP, UDP, Ether, Raw
+
+@pytest.fixture(autouse=True)
+def engine_state():
+    """Every test starts with cold flow, stream and threshold state"""
+    benchmark.reset_engine_state()
+
+@pytest.fixture
+def ruleset():
+    """Compile rule lines into a RuleSet, failing on anything that did not compile"""
+    def build(*lines):
+        rules, skipped = ids.compile_rule_lines(lines, {})
+        assert not skipped, lines
+        return ids.RuleSet(rules)
+    return build
+
+@pytest.fixture
+def udp_packet():
+    def build(payload, timestamp=1000.0, src="10.0.0.1"):
+        frame = Ether() / IP(src=src, dst="10.0.0.2") / UDP(sport=4000, dport=9000) / Raw(payload)
+        return ids.PacketInfo.from_frame(bytes(frame), timestamp, "ether")
+    return build
+
+@pytest.fixture
+def packet():
+    """One IPv4 packet of any shape as a PacketInfo"""
+    def build(proto="tcp", src="10.0.0.1", sport=4000, dst="10.0.0.2", dport=80, flags="PA",
+              payload=b"", timestamp=1000.0, seq=1000):
+        if proto == "tcp":
+            layer = TCP(sport=sport, dport=dport, flags=flags, seq=seq)
+        else:
+            layer = UDP(sport=sport, dport=dport)
+        frame = Ether() / IP(src=src, dst=dst) / layer / Raw(payload)
+        return ids.PacketInfo.from_frame(bytes(frame), timestamp, "ether")
+    return build
+
+@pytest.fixture
+def tcp_flow():
+    """One client to server TCP flow, one segment per payload with consecutive sequence numbers"""
+    def build(payloads, seq=1000, start=1000.0, sport=4000):
+        infos = []
+        for i, payload in enumerate(payloads):
+            frame = (Ether() / IP(src="10.0.0.1", dst="10.0.0.2")
+                     / TCP(sport=sport, dport=80, flags="PA", seq=seq) / Raw(payload))
+            infos.append(ids.PacketInfo.from_frame(bytes(frame), start + i, "ether"))
+            seq += len(payload)
+        return infos
+    return build
+
+def alerted_sids(rules, packets):
+    """sids alerted per packet"""
+    return [[alert["sid"] for alert in ids.match_packet(packet, rules)] for packet in packets]
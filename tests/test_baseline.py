@@ -0,0 +1,60 @@
+import random
+
+import numpy as np
+import pytest
+
+import ids_dashboard as ids
+
+def scalar_anomalies(infos):
+    """The per-packet path: observe, then score against the updated baseline"""
+    results = []
+    for info in infos:
+        ids.update_behavioral_baseline(info)
+        results.append(ids.detect_anomalies(info))
+    return results
+
+def kinds(results):
+    return [[anomaly["type"] for anomaly in anomalies] for anomalies in results]
+
+def test_burst_to_a_new_port_flags_the_first_four(packet):
+    infos = [packet(dport=9999, timestamp=1000.0 + n) for n in range(6)]
+    flagged = kinds(ids.detect_batch_anomalies(infos))
+    assert flagged == [["unusual_port"]] * (ids.BASELINE_MIN_PORT_COUNT - 1) + [[]] * 2
+
+def test_batch_agrees_with_the_scalar_path(packet, monkeypatch):
+    rng = random.Random(11)
+    infos = [packet(rng.choice(("tcp", "udp")), sport=rng.choice((53, 80, 4000, 4001)),
+                    dport=rng.choice((53, 80, 443, 8080, 4000)), timestamp=1000.0 + n * 0.01)
+             for n in range(200)]
+    batched = []
+    for start in range(0, len(infos), 32):
+        batched += ids.detect_batch_anomalies(infos[start:start + 32])
+    batch_state = ids.BEHAVIORAL_BASELINE
+    monkeypatch.setattr(ids, "BEHAVIORAL_BASELINE", ids.BehavioralBaseline())
+    assert kinds(batched) == kinds(scalar_anomalies(infos))
+    assert np.array_equal(batch_state.ports, ids.BEHAVIORAL_BASELINE.ports)
+    assert np.array_equal(batch_state.protocols, ids.BEHAVIORAL_BASELINE.protocols)
+    assert (batch_state.packets, batch_state.anomalies) == (200, ids.BEHAVIORAL_BASELINE.anomalies)
+
+def test_large_transfer(packet, monkeypatch):
+    monkeypatch.setattr(ids, "BASELINE_LARGE_TRANSFER", 1000)
+    infos = [packet(dport=80, payload=b"x" * size) for size in (10, 2000)]
+    assert [("large_transfer" in found) for found in kinds(ids.detect_batch_anomalies(infos))] == [False, True]
+
+def test_counts_decay_by_half_life(packet):
+    baseline = ids.BehavioralBaseline(half_life=100, decay_interval=10)
+    for n in range(8):
+        baseline.observe(packet(sport=4000, dport=80, timestamp=1000.0))
+    assert baseline.port_count("tcp", 80) == 8
+    baseline.observe(packet(sport=4000, dport=443, timestamp=1005.0))
+    assert baseline.port_count("tcp", 80) == 8  # within the decay interval
+    baseline.observe(packet(sport=4000, dport=443, timestamp=1100.0))
+    assert baseline.port_count("tcp", 80) == pytest.approx(4.0)
+    assert baseline.port_count("icmp", 80) is None
+
+def test_fixed_memory(packet):
+    baseline = ids.BehavioralBaseline()
+    before = baseline.memory_bytes()
+    baseline.observe_batch([packet(sport=port, dport=port, timestamp=1000.0) for port in range(1024, 1280)])
+    assert baseline.memory_bytes() == before
+    assert baseline.stats()["ports_seen"] == 0
@@ -0,0 +1,44 @@
+import random
+
+import pytest
+from scapy.all import IP, Raw
+
+import benchmark
+import ids_dashboard as ids
+
+def test_traffic_is_deterministic_per_seed():
+    first = [frame[:2] for frame in benchmark.generate_traffic(40, seed=3)]
+    again = [frame[:2] for frame in benchmark.generate_traffic(40, seed=3)]
+    other = [frame[:2] for frame in benchmark.generate_traffic(40, seed=4)]
+    assert first == again
+    assert first != other
+
+def test_traffic_dissects_into_the_mix():
+    frames = benchmark.generate_traffic(60, seed=1)
+    assert {kind for kind, _, _ in frames} <= set(benchmark.TRAFFIC_MIX)
+    packets = benchmark.dissect(frames)
+    assert [float(pkt.time) for pkt in packets] == [timestamp for _, _, timestamp in frames]
+    assert all(IP in pkt for pkt in packets)
+
+@pytest.mark.parametrize("size", [64, 1460, 9000])
+def test_http_payload_is_padded_to_size(size):
+    pkt = benchmark.make_http(random.Random(1), size)
+    assert len(bytes(pkt[Raw])) == size
+
+@pytest.mark.parametrize("fraction, expected", [(0.0, 1), (0.5, 6), (0.99, 10), (1.0, 10)])
+def test_percentile(fraction, expected):
+    assert benchmark.percentile(list(range(1, 11)), fraction) == expected
+
+def test_percentile_of_nothing():
+    assert benchmark.percentile([], 0.5) == 0.0
+
+def test_rule_counts_double_up_to_total():
+    assert benchmark.rule_counts(750) == [100, 200, 400, 750]
+    assert benchmark.rule_counts(50) == [50]
+
+def test_time_packets_counts_alerts(ruleset, udp_packet):
+    rules = ruleset('alert udp any any -> any any (msg:"x"; content:"evil"; sid:1;)')
+    packets = [udp_packet(b"evil"), udp_packet(b"fine"), udp_packet(b"more evil")]
+    result = benchmark.time_packets(ids.match_packet, packets, rules)
+    assert (result["packets"], result["alerts"]) == (3, 2)
+    assert result["p50_us"] <= result["p99_us"] <= result["max_us"]
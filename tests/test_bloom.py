@@ -0,0 +1,85 @@
+import os
+import random
+
+import pytest
+
+import ids_dashboard as ids
+
+DIGEST = bytes(32)
+
+@pytest.fixture
+def feeds(tmp_path, monkeypatch):
+    """Feed files of the test's own, with Bloom filters for feeds of any size"""
+    rng = random.Random(7)
+    ips = [f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}" for _ in range(300)]
+    ips += ["172.16.0.0/12", "192.168.4.0/24", "2001:db8::/48"]
+    paths = {kind: tmp_path / f"{kind}.txt" for kind in ids.INTEL_FEEDS}
+    paths["malicious_ips"].write_text("\n".join(ips) + "\n")
+    paths["malicious_domains"].write_text("evil.com\nbad.example.org  # phishing\n")
+    paths["malicious_hashes"].write_text("D41D8CD98F00B204E9800998ECF8427E\n")
+    monkeypatch.setattr(ids, "INTEL_FEEDS", {kind: str(path) for kind, path in paths.items()})
+    monkeypatch.setattr(ids, "INTEL_BLOOM_DIR", str(tmp_path / "bloom"))
+    monkeypatch.setattr(ids, "INTEL_BLOOM_MIN_ENTRIES", 1)
+    monkeypatch.setattr(ids, "THREAT_INTEL", dict(ids.THREAT_INTEL))
+    return ips
+
+def build(tmp_path, keys, fp_rate=0.01):
+    return ids.BloomFilter.build(str(tmp_path / "test.bloom"), keys, len(keys), fp_rate, DIGEST)
+
+def test_no_false_negatives_and_bounded_false_positives(tmp_path):
+    keys = [f"member-{n}".encode() for n in range(5000)]
+    bloom = build(tmp_path, keys)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"other-{n}".encode() in bloom for n in range(20000))
+    assert false_positives < 20000 * 0.01 * 2
+
+def test_lookup_uses_the_build_positions(tmp_path):
+    bloom = build(tmp_path, [b"a", b"b"])
+    for key in (b"a", b"b", b"c", b"zzz"):
+        data = bloom.map[bloom.HEADER.size:]
+        expected = all(data[bit >> 3] >> (bit & 7) & 1 for bit in bloom.positions(key, bloom.bits, bloom.hashes))
+        assert (key in bloom) is expected
+
+def test_header_round_trip_and_bad_files(tmp_path):
+    bloom = build(tmp_path, [b"x"] * 10, fp_rate=0.001)
+    reopened = ids.BloomFilter(bloom.path)
+    assert (reopened.bits, reopened.hashes, reopened.entries, reopened.fp_rate, reopened.digest) == \
+        (bloom.bits, bloom.hashes, 10, 0.001, DIGEST)
+    (tmp_path / "junk.bloom").write_bytes(b"x" * 200)
+    with pytest.raises(ValueError):
+        ids.BloomFilter(str(tmp_path / "junk.bloom"))
+
+def test_small_feeds_get_no_filter(feeds, monkeypatch):
+    monkeypatch.setattr(ids, "INTEL_BLOOM_MIN_ENTRIES", 1000)
+    assert ids.load_intel_bloom("malicious_ips", ids.INTEL_FEEDS["malicious_ips"]) is None
+
+def test_filter_is_reused_until_the_feed_changes(feeds):
+    path = ids.INTEL_FEEDS["malicious_domains"]
+    first = ids.load_intel_bloom("malicious_domains", path)
+    built = os.stat(first.path).st_mtime_ns
+    assert ids.load_intel_bloom("malicious_domains", path).digest == first.digest
+    assert os.stat(first.path).st_mtime_ns == built
+    with open(path, "a") as f:
+        f.write("worse.net\n")
+    rebuilt = ids.load_intel_bloom("malicious_domains", path)
+    assert rebuilt.digest != first.digest and rebuilt.entries == 3
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_tiered_stores_have_no_false_negatives(feeds, monkeypatch, exact):
+    monkeypatch.setattr(ids, "INTEL_EXACT_CHECK", exact)
+    ids.load_threat_intelligence()
+    ips = ids.THREAT_INTEL["malicious_ips"]
+    assert ips.bloom is not None and (ips.ranges() > 0) is exact
+    for address in feeds[:300] + ["172.20.1.1", "192.168.4.77", "2001:db8::5"]:
+        assert address in ips
+    domains = ids.THREAT_INTEL["malicious_domains"]
+    assert domains.match("a.b.evil.com") == "evil.com"
+    assert domains.match("x.bad.example.org") == "bad.example.org"
+    assert "d41d8cd98f00b204e9800998ecf8427e" in ids.THREAT_INTEL["malicious_hashes"]
+
+def test_exact_check_rejects_bloom_false_positives(feeds):
+    ids.load_threat_intelligence()
+    ips = ids.THREAT_INTEL["malicious_ips"]
+    assert "192.168.5.1" not in ips and "11.0.0.1" not in ips
+    assert ids.THREAT_INTEL["malicious_domains"].match("evil.co") is None
+    assert ips.bloom.queries == 2 and ips.bloom.false_positives == ips.bloom.passes
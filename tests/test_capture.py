@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+from scapy.all import ARP, ICMP, IP, TCP, UDP, Dot1Q, Ether, IPv6, Raw
+
+import ids_dashboard as ids
+
+ETHER = Ether(src="02:00:00:00:00:01", dst="02:00:00:00:00:02")
+
+FRAMES = [
+    ETHER / IP(src="10.0.0.1", dst="10.0.0.2") / TCP(sport=4000, dport=80, flags="PA", seq=7) / Raw(b"GET /"),
+    ETHER / IP(src="10.0.0.1", dst="10.0.0.2") / UDP(sport=5353, dport=53) / Raw(b"query"),
+    ETHER / IP(src="10.0.0.1", dst="10.0.0.2") / ICMP() / Raw(b"ping"),
+    ETHER / IPv6(src="fd00::1", dst="fd00::2") / TCP(sport=4000, dport=443, flags="S") / Raw(b"v6"),
+]
+
+FIELDS = ("src", "dst", "src_addr", "dst_addr", "version", "proto", "sport", "dport", "payload")
+
+@pytest.mark.parametrize("frame", FRAMES[:3], ids=["tcp", "udp", "icmp"])
+def test_lazy_decode_matches_scapy(frame):
+    fast = ids.PacketInfo.from_frame(bytes(frame), 1.0, "ether")
+    slow = ids.PacketInfo(ETHER.__class__(bytes(frame)))
+    assert [getattr(fast, name) for name in FIELDS] == [getattr(slow, name) for name in FIELDS]
+
+def test_lazy_decode_ipv6():
+    info = ids.PacketInfo.from_frame(bytes(FRAMES[3]), 1.0, "ether")
+    assert (info.version, info.src, info.proto, info.dport, info.payload) == (6, "fd00::1", "tcp", 443, b"v6")
+    assert info.src_addr == 0xFD00 << 112 | 1
+
+def test_vlan_tag_and_padding():
+    frame = bytes(ETHER / Dot1Q(vlan=7) / IP(src="10.0.0.1", dst="10.0.0.2") / UDP(sport=1, dport=2) / Raw(b"x"))
+    info = ids.PacketInfo.from_frame(frame + b"\x00" * 12, 1.0, "ether")
+    assert (info.proto, info.dport, info.payload) == ("udp", 2, b"x")
+
+def test_raw_ip_link_and_non_ip():
+    packet = IP(src="10.0.0.1", dst="10.0.0.2") / UDP(sport=1, dport=2) / Raw(b"x")
+    assert ids.PacketInfo.from_frame(bytes(packet), 1.0, "raw").payload == b"x"
+    assert ids.PacketInfo.from_frame(bytes(ETHER / ARP()), 1.0, "ether") is None
+    assert ids.PacketInfo.from_frame(b"\x00" * 10, 1.0, "ether") is None
+
+def test_fragments_carry_no_ports():
+    frame = bytes(ETHER / IP(src="10.0.0.1", dst="10.0.0.2", proto=6, frag=4) / Raw(b"x" * 24))
+    info = ids.PacketInfo.from_frame(frame, 1.0, "ether")
+    assert (info.proto, info.sport, info.dport) == ("ip", None, None)
+
+class ReplaySocket:
+    """recv() hands out the queued frames, then reports end of capture"""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.closed = False
+
+    def recv(self, size):
+        return self.frames.pop(0) if self.frames else b""
+
+    def close(self):
+        self.closed = True
+
+def test_raw_socket_sniffer_delivers_decoded_frames():
+    seen = []
+    done = threading.Event()
+    frames = [bytes(frame) for frame in FRAMES] + [bytes(ETHER / ARP())]
+    sock = ReplaySocket(frames)
+    sniffer = ids.RawSocketSniffer(lambda info: seen.append(info.proto), sock=sock, link="ether")
+    sniffer.start()
+    sniffer.thread.join(timeout=5)
+    sniffer.stop()
+    assert seen == ["tcp", "udp", "icmp", "tcp"]
+    assert sniffer.stats()["skipped"] == 1
+    assert sock.closed
+
+def test_scapy_backend_closes_its_socket(monkeypatch):
+    opened = []
+    class ListenSocket(ReplaySocket):
+        ins = None
+    def listen(iface=None):
+        opened.append(ListenSocket([]))
+        return opened[-1]
+    monkeypatch.setattr(ids.conf, "L2listen", listen)
+    monkeypatch.setattr(ids, "CAPTURE_BPF", True)
+    monkeypatch.setattr(ids.AsyncSniffer, "stop", lambda self, join=True: None)
+    rules, _ = ids.compile_rule_lines(['alert tcp any any -> any 80 (msg:"x"; content:"x"; sid:1;)'], {})
+    for _ in range(2):
+        ids.make_sniffer(lambda pkt: None, "scapy", capture_filter=ids.CaptureFilter(rules)).stop()
+    assert [sock.closed for sock in opened] == [True, True]
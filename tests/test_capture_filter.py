@@ -0,0 +1,111 @@
+import os
+import struct
+
+import pytest
+from scapy.all import ARP, ICMP, IP, TCP, UDP, Ether, IPv6, Raw
+
+import ids_dashboard as ids
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ETHER = Ether(src="02:00:00:00:00:01", dst="02:00:00:00:00:02")
+
+def run_bpf(program, frame):
+    """Minimal classic BPF interpreter for the instructions CaptureFilter emits"""
+    a = x = pc = 0
+    def load(offset, size):
+        if offset + size > len(frame):
+            raise IndexError
+        return int.from_bytes(frame[offset:offset + size], "big")
+    try:
+        while True:
+            code, jt, jf, k = program[pc]
+            pc += 1
+            if code == ids.BPF_LD_H_ABS:
+                a = load(k, 2)
+            elif code == ids.BPF_LD_B_ABS:
+                a = load(k, 1)
+            elif code == ids.BPF_LD_H_IND:
+                a = load(x + k, 2)
+            elif code == ids.BPF_LDX_IMM:
+                x = k
+            elif code == ids.BPF_LDX_B_MSH:
+                x = 4 * (load(k, 1) & 0x0F)
+            elif code == ids.BPF_JA:
+                pc += k
+            elif code == ids.BPF_RET:
+                return k != 0
+            else:
+                taken = {ids.BPF_JEQ: a == k, ids.BPF_JGT: a > k,
+                         ids.BPF_JGE: a >= k, ids.BPF_JSET: bool(a & k)}[code]
+                pc += jt if taken else jf
+    except IndexError:
+        return False
+
+def capture_filter(*lines):
+    rules, skipped = ids.compile_rule_lines(lines, {})
+    assert not skipped
+    return ids.CaptureFilter(rules)
+
+RULES = [
+    'alert tcp any any -> any [80,8080:8090] (msg:"web"; content:"x"; sid:1;)',
+    'alert udp any 53 -> any any (msg:"dns"; content:"x"; sid:2;)',
+    'alert icmp any any -> any any (msg:"icmp"; content:"x"; sid:3;)',
+]
+
+FRAMES = [
+    ("tcp", 40000, 80), ("tcp", 80, 40000), ("tcp", 40000, 8085), ("tcp", 40000, 8091),
+    ("tcp", 40000, 443), ("udp", 53, 40000), ("udp", 40000, 53), ("udp", 40000, 123),
+    ("icmp", None, None),
+]
+
+def frame(proto, sport, dport, version=4):
+    layer = {"tcp": lambda: TCP(sport=sport, dport=dport), "udp": lambda: UDP(sport=sport, dport=dport),
+             "icmp": ICMP}[proto]()
+    ip = IP(src="10.0.0.1", dst="10.0.0.2") if version == 4 else IPv6(src="fd00::1", dst="fd00::2")
+    if proto == "icmp" and version == 6:
+        layer = Raw(b"\x80\x00\x00\x00")
+        ip.nh = 58
+    return bytes(ETHER / ip / layer / Raw(b"payload"))
+
+@pytest.mark.parametrize("version", [4, 6])
+def test_program_agrees_with_accepts(version):
+    bpf = capture_filter(*RULES)
+    assert bpf.program is not None
+    for proto, sport, dport in FRAMES:
+        expected = bpf.accepts(proto, sport, dport)
+        assert run_bpf(bpf.program, frame(proto, sport, dport, version)) == expected, (proto, sport, dport)
+
+def test_expected_ports_pass():
+    bpf = capture_filter(*RULES)
+    assert bpf.accepts("tcp", 40000, 8085) and bpf.accepts("udp", 53, 40000)
+    assert not bpf.accepts("tcp", 40000, 443) and not bpf.accepts("udp", 40000, 123)
+
+def test_non_ip_dropped_and_fragments_passed():
+    bpf = capture_filter(*RULES)
+    assert not run_bpf(bpf.program, bytes(ETHER / ARP()))
+    fragment = bytes(ETHER / IP(src="10.0.0.1", dst="10.0.0.2", proto=6, frag=10) / Raw(b"x" * 16))
+    assert run_bpf(bpf.program, fragment)
+
+def test_unbounded_transport_passes_every_port():
+    bpf = capture_filter('alert tcp any any -> any any (msg:"all"; content:"x"; sid:1;)')
+    assert bpf.expression == "tcp"
+    assert run_bpf(bpf.program, frame("tcp", 1, 2))
+    assert not run_bpf(bpf.program, frame("udp", 1, 2))
+
+def test_ip_rules_are_left_out():
+    bpf = capture_filter(RULES[0], 'alert ip any any -> any any (msg:"ip"; content:"x"; sid:9;)')
+    assert bpf.unfiltered == 1
+    assert bpf.program is not None
+    assert bpf.expression == "(tcp and (port 80 or portrange 8080-8090))"
+
+def test_too_many_ranges_pass_the_transport():
+    ports = ",".join(str(port) for port in range(1000, 1000 + 2 * ids.BPF_MAX_PORT_RANGES + 2, 2))
+    bpf = capture_filter(f'alert udp any any -> any [{ports}] (msg:"many"; content:"x"; sid:1;)')
+    assert bpf.transports == {"udp": None}
+
+def test_shipped_ruleset_produces_a_program(monkeypatch):
+    monkeypatch.chdir(REPO)
+    ruleset = ids.load_rules(use_cache=False)
+    assert len(ruleset)
+    assert ruleset.capture_filter.program is not None
+    assert ruleset.capture_filter.expression
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+
+import ids_dashboard as ids
+
+def run(scenario):
+    async def session():
+        return await scenario(asyncio.get_running_loop())
+    return asyncio.run(session())
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        ids.PacketRing(None, policy="drop-all")
+
+@pytest.mark.parametrize("policy, kept, enqueued", [("drop-newest", [0, 1, 2], 3),
+                                                    ("drop-oldest", [2, 3, 4], 5)])
+def test_full_ring_drops_by_policy(policy, kept, enqueued):
+    async def scenario(loop):
+        ring = ids.PacketRing(loop, capacity=3, policy=policy)
+        for n in range(5):
+            ring.put(n)
+        return ring, await ring.get_batch(10)
+    ring, batch = run(scenario)
+    assert batch == kept
+    assert (ring.enqueued, ring.dropped, ring.high_watermark) == (enqueued, 2, 3)
+
+def test_batches_are_bounded_and_ordered():
+    async def scenario(loop):
+        ring = ids.PacketRing(loop, capacity=100)
+        for n in range(10):
+            ring.put(n)
+        return [await ring.get_batch(4) for _ in range(3)]
+    assert run(scenario) == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+
+def test_consumer_wakes_for_producer_thread():
+    async def scenario(loop):
+        ring = ids.PacketRing(loop, capacity=10)
+        threading.Timer(0.05, ring.put, args=("pkt",)).start()
+        return await asyncio.wait_for(ring.get_batch(), 2)
+    assert run(scenario) == ["pkt"]
+
+def test_block_policy_waits_for_space():
+    async def scenario(loop):
+        ring = ids.PacketRing(loop, capacity=2, policy="block")
+        ring.put(0)
+        ring.put(1)
+        producer = threading.Thread(target=ring.put, args=(2,))
+        producer.start()
+        await asyncio.sleep(0.05)
+        assert producer.is_alive()
+        first = await ring.get_batch(1)
+        await loop.run_in_executor(None, producer.join, 2)
+        return ring, first + await ring.get_batch(10)
+    ring, seen = run(scenario)
+    assert seen == [0, 1, 2] and ring.dropped == 0
+
+def test_close_releases_blocked_producer():
+    async def scenario(loop):
+        ring = ids.PacketRing(loop, capacity=1, policy="block")
+        ring.put(0)
+        producer = threading.Thread(target=ring.put, args=(1,))
+        producer.start()
+        ring.close()
+        await loop.run_in_executor(None, producer.join, 2)
+        return ring, producer.is_alive()
+    ring, alive = run(scenario)
+    assert not alive and ring.stats()["depth"] == 1
@@ -0,0 +1,119 @@
+import pytest
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+def rule(options, sid=1):
+    return f'alert udp any any -> any any (msg:"test"; {options} sid:{sid};)'
+
+@pytest.mark.parametrize("text, expected", [
+    ("plain", b"plain"),
+    ("|41 42|", b"AB"),
+    ("GET|20|/", b"GET /"),
+    ("|0d0a|", b"\r\n"),
+    ("a\\;b", b"a;b"),
+    ("back\\\\slash", b"back\\slash"),
+    ("pipe\\|", b"pipe|"),
+])
+def test_decode_content(text, expected):
+    assert ids.decode_content(text) == expected
+
+@pytest.mark.parametrize("value, expected", [
+    ('"abc"', "abc"),
+    ('"end\\""', 'end\\"'),
+    ('""', ""),
+    ('"', '"'),
+    ("7", "7"),
+])
+def test_unquote_strips_one_pair(value, expected):
+    assert ids.unquote(value) == expected
+
+@pytest.mark.parametrize("option, expected", [
+    ('content:"end\\"";', b'end"'),
+    ('content:"say \\"hi\\"";', b'say "hi"'),
+    ('content:"\\"quoted\\"";', b'"quoted"'),
+    ('content:"a|3b|b";', b"a;b"),
+    ('content:"a\\;b";', b"a;b"),
+])
+def test_quote_escapes_survive_compilation(option, expected):
+    rules, skipped = ids.compile_rule_lines([rule(option)], {})
+    assert not skipped
+    assert rules[0].contents[0].pattern == expected
+
+def test_negated_content_flag(ruleset):
+    rules = ruleset(rule('content:"GET"; content:!"admin";'))
+    assert [content.negated for content in rules.rules[0].contents] == [False, True]
+
+@pytest.mark.parametrize("options, payload, matches", [
+    ('content:"Attack";', b"an Attack here", True),
+    ('content:"Attack";', b"an attack here", False),
+    ('content:"Attack"; nocase;', b"an aTTACK here", True),
+    ('content:"abc"; offset:2;', b"abcabc", True),
+    ('content:"abc"; offset:4;', b"abcabc", False),
+    ('content:"abc"; depth:3;', b"abcxyz", True),
+    ('content:"abc"; depth:3;', b"xabcyz", False),
+    ('content:"abc"; offset:1; depth:3;', b"xabcyz", True),
+    ('content:"GET"; content:"HTTP"; distance:1;', b"GET / HTTP", True),
+    ('content:"GET"; content:"HTTP"; distance:8;', b"GET / HTTP", False),
+    ('content:"GET"; content:"HTTP"; within:7;', b"GET / HTTP", True),
+    ('content:"GET"; content:"HTTP"; within:6;', b"GET / HTTP", False),
+    ('content:"HTTP"; content:"GET"; distance:0;', b"GET / HTTP", False),
+    # A later occurrence of the first content can satisfy the relative one
+    ('content:"ab"; content:"cd"; within:2;', b"ab..ab cd abcd", True),
+    ('content:"GET"; content:!"admin";', b"GET /index", True),
+    ('content:"GET"; content:!"admin";', b"GET /admin", False),
+    ('content:"|de ad be ef|";', b"\x00\xde\xad\xbe\xef\x00", True),
+    ('content:"say \\"hi\\"";', b'they say "hi"', True),
+    ('content:"end\\"";', b'the end"', True),
+    ('content:"end\\"";', b"the end\\", False),
+])
+def test_content_modifiers(ruleset, udp_packet, options, payload, matches):
+    rules = ruleset(rule(options))
+    assert alerted_sids(rules, [udp_packet(payload)]) == [[1] if matches else []]
+
+@pytest.mark.parametrize("options, expected", [
+    ('content:"short"; content:"muchlonger";', b"muchlonger"),
+    ('content:"short"; fast_pattern; content:"muchlonger";', b"short"),
+    ('content:!"muchlonger"; content:"short";', b"short"),
+    ('content:"abcdefgh"; fast_pattern:2,4;', b"cdef"),
+])
+def test_select_fast_pattern(options, expected):
+    rules, _ = ids.compile_rule_lines([rule(options)], {})
+    assert ids.select_fast_pattern(rules[0].contents) == expected
+
+@pytest.mark.parametrize("options", [
+    'byte_test:4,>,1000,0;',
+    'content:"GET"; http_method;',
+    'app-layer-event:http.invalid_header;',
+    'decode-event:ipv4.trunc_pkt;',
+    'flowint:count,+,1;',
+])
+def test_unsupported_keyword_skips_rule(options):
+    rules, skipped = ids.compile_rule_lines([rule(options)], {})
+    assert (rules, skipped) == ([], 1)
+
+def test_backslash_continued_rule_is_joined():
+    lines = ['# comment', 'alert udp any any -> any any (msg:"split"; \\',
+             '      content:"abc"; \\', '      sid:7; rev:1;)']
+    rules, skipped = ids.compile_rule_lines(lines, {})
+    assert skipped == 0
+    assert [(rule.sid, rule.contents[0].pattern) for rule in rules] == [(7, b"abc")]
+
+def test_noalert_rule_does_not_alert(ruleset, udp_packet):
+    rules = ruleset(rule('content:"abc"; noalert;'))
+    assert alerted_sids(rules, [udp_packet(b"abc")]) == [[]]
+
+@pytest.mark.parametrize("options, payload, matches", [
+    # The relative content only fits after the second anchor; the negated
+    # content between them must not stop the retry
+    ('content:"A"; content:!"Z"; content:"C"; distance:0; within:2;', b"A....AC", True),
+    ('content:"A"; content:!"Z"; content:"C"; distance:0; within:2;', b"A....AC Z", False),
+    ('content:"A"; content:!"Z"; depth:3; content:"C"; distance:0; within:2;', b"A....AC Z", True),
+    ('content:"A"; content:!"B"; distance:0; within:1; content:"C"; distance:0; within:2;',
+     b"AB..AC", True),
+    ('content:"A"; content:!"B"; distance:0; within:1; content:"C"; distance:0; within:2;',
+     b"AB..ABC", False),
+])
+def test_backtracking_past_negated_content(ruleset, udp_packet, options, payload, matches):
+    rules = ruleset(rule(options))
+    assert alerted_sids(rules, [udp_packet(payload)]) == [[1] if matches else []]
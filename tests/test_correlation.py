@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+import ids_dashboard as ids
+
+def alert(sid=1, src="10.0.0.1", dst="10.0.0.2", timestamp=1000.0):
+    return {"msg": "test", "sid": sid, "src": src, "dst": dst, "timestamp": timestamp}
+
+def test_counts_agree_with_a_sliding_window():
+    engine = ids.CorrelationEngine({"sid": 10 ** 9}, window=10)
+    rng = random.Random(3)
+    times = sorted(1000 + rng.random() * 60 for _ in range(500))
+    for now in times:
+        counts, _ = engine.correlate(alert(), 0, now)
+        # Buckets are whole seconds, so the window covers the last ten of them
+        assert counts["sid"] == sum(1 for t in times if t <= now and int(t) > int(now) - 10)
+
+def test_escalation_per_key():
+    engine = ids.CorrelationEngine({"sid": 3, "sid_src": 2, "src": 4}, window=60)
+    escalated = [engine.correlate(alert(src=src), 0, 1000.0 + n)[1]
+                 for n, src in enumerate(["10.0.0.1", "10.0.0.9", "10.0.0.1", "10.0.0.9"])]
+    assert escalated == [[], [], ["sid", "sid_src"], ["sid", "sid_src"]]
+    assert engine.escalations == 2
+
+def test_unknown_key_is_rejected():
+    with pytest.raises(ValueError):
+        ids.CorrelationEngine({"dst": 5})
+
+def test_counts_restart_after_the_window():
+    engine = ids.CorrelationEngine({"sid": 2}, window=60)
+    assert engine.correlate(alert(), 0, 1000.0)[1] == []
+    assert engine.correlate(alert(), 0, 1030.0)[1] == ["sid"]
+    assert engine.correlate(alert(), 0, 1100.0) == ({"sid": 1}, [])
+
+def test_idle_keys_expire():
+    engine = ids.CorrelationEngine({"sid": 5}, window=60)
+    for sid in range(10):
+        engine.correlate(alert(sid=sid), 0, 1000.0 + sid)
+    engine.correlate(alert(sid=99), 0, 1065.0)
+    assert sorted(key[1] for key in engine.windows) == [6, 7, 8, 9, 99]
+    assert engine.stats()["expired_keys"] == 6
+
+def test_max_keys_drops_the_least_recent():
+    engine = ids.CorrelationEngine({"sid_src": 5}, window=60, max_keys=3)
+    for n in range(6):
+        engine.correlate(alert(src=f"10.0.0.{n % 4}"), 0, 1000.0 + n)
+    assert [key[2] for key in engine.windows] == ["10.0.0.3", "10.0.0.0", "10.0.0.1"]
+
+def test_host_scores_decay_and_are_evicted():
+    engine = ids.CorrelationEngine({"sid": 5}, half_life=100, min_score=1.0, max_hosts=2)
+    engine.correlate(alert(src="a", dst="b"), 8, 1000.0)
+    assert engine.score("a", 1100.0) == pytest.approx(4.0)
+    engine.correlate(alert(src="a", dst="c"), 8, 1100.0)
+    assert engine.score("a", 1100.0) == pytest.approx(12.0)
+    assert set(engine.scores) == {"a", "c"} and engine.evicted_hosts == 1
+    engine.correlate(alert(src="d", dst="c"), 1, 1500.0)
+    assert "a" not in engine.scores
+
+def test_correlate_alert_marks_escalations(monkeypatch):
+    monkeypatch.setattr(ids, "CORRELATION", ids.CorrelationEngine({"sid": 2}))
+    first = ids.correlate_alert(alert(timestamp=1000.0))
+    second = ids.correlate_alert(alert(timestamp=1001.0))
+    assert (first["escalated"], first["correlation"]) == (False, {"sid": 1})
+    assert (second["escalated"], second["escalated_by"]) == (True, ["sid"])
+    assert second["msg"].startswith("[ESCALATED]") and second["threat_score"] == first["threat_score"] + 50
@@ -0,0 +1,79 @@
+import struct
+
+import pytest
+from scapy.all import DNS, DNSQR, DNSRR
+
+import ids_dashboard as ids
+
+def header(questions=1, answers=0):
+    return struct.pack("!HHHHHH", 0x1234, 0x0100, questions, answers, 0, 0)
+
+def labels(name):
+    return b"".join(bytes([len(label)]) + label.encode() for label in name.split(".")) + b"\0"
+
+@pytest.fixture
+def listed(monkeypatch):
+    intel = ids.DomainIntel(["evil.com", "Bad.Example.org."])
+    monkeypatch.setitem(ids.THREAT_INTEL, "malicious_domains", intel)
+    return intel
+
+def test_query_name():
+    message = bytes(DNS(rd=1, qd=DNSQR(qname="WWW.Example.com")))
+    assert ids.parse_dns_names(message) == ["www.example.com"]
+
+def test_compressed_answer_and_cname_target():
+    # answer owner points at the question name; the CNAME target is "cdn" + a pointer to "example.com"
+    question = labels("www.example.com")
+    target = b"\x03cdn\xc0\x10"
+    answer = b"\xc0\x0c" + struct.pack("!HHIH", 5, 1, 60, len(target)) + target
+    message = header(1, 1) + question + b"\0\x01\0\x01" + answer
+    assert ids.parse_dns_names(message) == ["www.example.com", "cdn.example.com"]
+
+@pytest.mark.parametrize("name", [
+    b"\xc0\x0c",              # a pointer to itself
+    b"\x01a\xc0\x0c",         # a label then a pointer back to the start
+    b"\x01a\xc0\x10\x01b\xc0\x0c",  # two names pointing at each other
+])
+def test_compression_loops_terminate(name):
+    assert ids.parse_dns_names(header() + name + b"\0\x01\0\x01") == []
+
+@pytest.mark.parametrize("message", [
+    b"\x12\x34",                                  # shorter than a header
+    header() + b"\x05abc",                        # label runs past the end
+    header() + b"\xc0\xff",                       # pointer past the end
+    header() + b"\x80abc\0",                      # reserved label type
+])
+def test_malformed_messages(message):
+    assert ids.parse_dns_names(message) == []
+
+def test_tcp_length_prefix():
+    message = bytes(DNS(qd=DNSQR(qname="evil.com")))
+    assert ids.parse_dns_names(struct.pack("!H", len(message)) + message, tcp=True) == ["evil.com"]
+
+@pytest.mark.parametrize("name, match", [
+    ("evil.com", "evil.com"), ("a.b.EVIL.com.", "evil.com"), ("notevil.com", None),
+    ("evil.com.au", None), ("x.bad.example.org", "bad.example.org"), ("example.org", None),
+])
+def test_suffix_trie_matching(listed, name, match):
+    assert listed.match(name) == match
+
+def test_verdicts_are_cached(listed):
+    listed.match("a.evil.com")
+    listed.match("A.evil.com")
+    assert (listed.hits, listed.misses) == (1, 1)
+    listed.add("other.net")
+    assert listed.match("a.evil.com") == "evil.com" and listed.misses == 2
+
+def test_dns_intel_alerts(listed, packet):
+    message = bytes(DNS(rd=1, qd=DNSQR(qname="c2.evil.com")))
+    alerts, domain = ids.dns_intel_alerts(packet("udp", dport=53, payload=message), [])
+    assert domain == "c2.evil.com"
+    assert [(alert["sid"], alert["domain"]) for alert in alerts] == [(ids.DNS_INTEL_SID, "c2.evil.com")]
+
+def test_dns_intel_ignores_other_ports(listed, packet):
+    message = bytes(DNS(qd=DNSQR(qname="c2.evil.com")))
+    assert ids.dns_intel_alerts(packet("udp", dport=5353, payload=message), []) == ([], None)
+
+def test_clean_lookup_reports_the_domain(listed, packet):
+    response = bytes(DNS(qr=1, qd=DNSQR(qname="example.net"), an=DNSRR(rrname="example.net", rdata="1.2.3.4")))
+    assert ids.dns_intel_alerts(packet("udp", sport=53, dport=4000, payload=response), []) == ([], "example.net")
@@ -0,0 +1,57 @@
+import pytest
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+def rule(options, sid):
+    return f'alert tcp any any -> any any (msg:"fb"; {options} sid:{sid};)'
+
+def bit(name):
+    return ids.flowbit_mask(name, "&")
+
+def test_set_isset_unset_on_one_flow(ruleset, tcp_flow):
+    rules = ruleset(
+        rule('content:"LOGIN"; flowbits:set,fb_auth; flowbits:noalert;', 1),
+        rule('content:"LOGOUT"; flowbits:unset,fb_auth; flowbits:noalert;', 2),
+        rule('content:"CMD"; flowbits:isset,fb_auth;', 3),
+        rule('content:"CMD"; flowbits:isnotset,fb_auth;', 4))
+    payloads = [b"CMD a ", b"LOGIN ", b"CMD b ", b"LOGOUT ", b"CMD c "]
+    assert alerted_sids(rules, tcp_flow(payloads)) == [[4], [], [3], [], [4]]
+
+def test_bits_are_per_flow(ruleset, tcp_flow):
+    rules = ruleset(rule('content:"LOGIN"; flowbits:set,fb_other; flowbits:noalert;', 1),
+                    rule('content:"CMD"; flowbits:isset,fb_other;', 2))
+    packets = tcp_flow([b"LOGIN "], sport=4000) + tcp_flow([b"CMD "], sport=4001)
+    assert alerted_sids(rules, packets) == [[], []]
+
+def test_any_and_all_conditions():
+    any_option, all_option = ids.FlowbitsOption(), ids.FlowbitsOption()
+    any_option.add("isset,fb_x|fb_y")
+    all_option.add("isset,fb_x&fb_y")
+    for bits, any_ok, all_ok in [(0, False, False), (bit("fb_x"), True, False),
+                                 (bit("fb_x") | bit("fb_y"), True, True)]:
+        assert (any_option.check(bits), all_option.check(bits)) == (any_ok, all_ok)
+
+def test_actions_fold_into_one_expression():
+    option = ids.FlowbitsOption()
+    for value in ("set,fb_s", "unset,fb_u", "toggle,fb_t"):
+        option.add(value)
+    bits = option.apply(bit("fb_u"))
+    assert bits == bit("fb_s") | bit("fb_t")
+    assert option.apply(bits) == bit("fb_s")
+
+def test_cached_masks_are_renumbered():
+    ids.flowbit_mask("fb_cached", "&")
+    foreign_names = ["fb_foreign_only", "fb_cached"]
+    option = ids.FlowbitsOption()
+    option.set = 1 << 1  # fb_cached in the compiling process
+    option.isnotset = 1 << 0
+    cached = ids.CompiledRule(flowbits=option, pcres=())
+    ids.adopt_cached_rules([cached], foreign_names)
+    assert option.set == bit("fb_cached")
+    assert option.isnotset == bit("fb_foreign_only")
+
+def test_noalert_still_sets_bits(ruleset, tcp_flow):
+    rules = ruleset(rule('content:"A"; flowbits:set,fb_n; noalert;', 1),
+                    rule('content:"B"; flowbits:isset,fb_n;', 2))
+    assert alerted_sids(rules, tcp_flow([b"A", b"B"])) == [[], [2]]
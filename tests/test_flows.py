@@ -0,0 +1,84 @@
+import pytest
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+def handshake(packet, start=1000.0):
+    return [packet(flags="S", timestamp=start),
+            packet(src="10.0.0.2", sport=80, dst="10.0.0.1", dport=4000, flags="SA", timestamp=start + 0.1),
+            packet(flags="A", timestamp=start + 0.2)]
+
+def test_handshake_establishes_flow(packet):
+    table = ids.FlowTable()
+    states = []
+    for info in handshake(packet):
+        flow, _ = table.update(info)
+        states.append(ids.FLOW_STATE_NAMES[flow.state])
+    assert states == ["syn_sent", "syn_recv", "established"]
+    assert table.stats()["active"] == 1
+
+def test_direction_is_tracked_from_the_client(packet):
+    table = ids.FlowTable()
+    _, forward = table.update(packet(flags="S"))
+    flow, reply = table.update(packet(src="10.0.0.2", sport=80, dst="10.0.0.1", dport=4000, flags="SA"))
+    assert (forward, reply) == (True, False)
+    assert (flow.packets_toserver, flow.packets_toclient) == (1, 1)
+
+def test_midstream_pickup_assumes_lower_port_is_server(packet):
+    table = ids.FlowTable()
+    flow, to_server = table.update(packet(src="10.0.0.2", sport=80, dst="10.0.0.1", dport=4000))
+    assert flow.established and not to_server
+
+def test_udp_reply_establishes_flow(packet):
+    table = ids.FlowTable()
+    flow, _ = table.update(packet("udp", dport=53))
+    assert not flow.established
+    table.update(packet("udp", src="10.0.0.2", sport=53, dst="10.0.0.1", dport=4000))
+    assert flow.established
+
+@pytest.mark.parametrize("option, expected", [
+    ("flow:to_server,established;", [[], [], [1], [1], []]),
+    ("flow:established,to_client;", [[], [], [], [], [1]]),
+    ("flow:not_established;", [[1], [1], [], [], []]),
+])
+def test_flow_option(ruleset, packet, option, expected):
+    rules = ruleset(f'alert tcp any any <> any any (msg:"f"; {option} sid:1;)')
+    packets = handshake(packet) + [
+        packet(payload=b"GET", timestamp=1001.0, seq=1001),
+        packet(src="10.0.0.2", sport=80, dst="10.0.0.1", dport=4000, payload=b"200", timestamp=1001.1)]
+    assert alerted_sids(rules, packets) == expected
+
+def test_idle_flows_expire_behind_a_long_lived_flow(packet):
+    table = ids.FlowTable()
+    evicted = []
+    table.on_evict = evicted.append
+    # An established TCP flow first in LRU order, then short-lived UDP flows
+    for info in handshake(packet):
+        table.update(info)
+    for port in range(5000, 5005):
+        table.update(packet("udp", sport=port, dport=53, timestamp=1001.0))
+    later = 1001.0 + ids.FLOW_TIMEOUTS["new"] + 1
+    table.update(packet("udp", sport=6000, dport=53, timestamp=later))
+    assert len(evicted) == 5
+    assert table.stats()["active"] == 2
+    assert table.stats()["evicted_idle"] == 5
+
+def test_established_flow_outlives_new_timeout(packet):
+    table = ids.FlowTable()
+    for info in handshake(packet):
+        table.update(info)
+    table.update(packet("udp", sport=6000, dport=53, timestamp=1000.5 + ids.FLOW_TIMEOUTS["new"] + 1))
+    assert table.stats()["active"] == 2
+
+def test_memcap_evicts_least_recently_used(packet):
+    table = ids.FlowTable(memcap=1)
+    table.max_flows = 2
+    evicted = []
+    table.on_evict = evicted.append
+    first, _ = table.update(packet("udp", sport=5000))
+    second, _ = table.update(packet("udp", sport=5001))
+    table.update(packet("udp", sport=5000))
+    table.update(packet("udp", sport=5002))
+    assert evicted == [second]
+    assert table.stats()["evicted_memcap"] == 1
+    assert sum(len(flows) for flows in table.idle.values()) == 2
@@ -0,0 +1,57 @@
+import random
+import socket
+
+import pytest
+
+import ids_dashboard as ids
+
+FEED = """
+# threat feed
+10.0.0.5
+10.0.0.6
+10.0.0.7, c2 server
+192.168.0.0/24   # scanner block
+192.168.1.0/24
+192.168.0.128/25
+not-an-address
+10.0.0.0/33
+2001:db8::/32
+2001:db8::1
+"""
+
+def ipv4(text):
+    return int.from_bytes(socket.inet_aton(text), "big")
+
+@pytest.fixture
+def intel():
+    return ids.IntelRangeSet.from_lines(FEED.splitlines())
+
+def test_entries_and_invalid_lines_are_counted(intel):
+    assert (len(intel), intel.invalid) == (8, 2)
+
+def test_adjacent_and_overlapping_ranges_merge(intel):
+    assert list(intel.starts[4]) == [ipv4("10.0.0.5"), ipv4("192.168.0.0")]
+    assert list(intel.ends[4]) == [ipv4("10.0.0.7"), ipv4("192.168.1.255")]
+    assert intel.ranges() == 3
+
+@pytest.mark.parametrize("address, listed", [
+    ("10.0.0.4", False), ("10.0.0.5", True), ("10.0.0.7", True), ("10.0.0.8", False),
+    ("192.168.1.200", True), ("192.168.2.0", False), ("2001:db8:ffff::9", True),
+    ("2001:db9::", False), ("garbage", False), (None, False),
+])
+def test_contains(intel, address, listed):
+    assert (address in intel) is listed
+
+def test_agrees_with_a_linear_scan():
+    rng = random.Random(5)
+    networks = [f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.0/{rng.choice((24, 28, 32))}" for _ in range(300)]
+    intel = ids.IntelRangeSet.from_lines(networks)
+    ranges = [ids.parse_intel_network(network)[1:] for network in networks]
+    for _ in range(2000):
+        address = (10 << 24) | rng.getrandbits(18) << 6
+        expected = any(low <= address <= high for low, high in ranges)
+        assert intel.contains(address) is expected
+    assert list(intel.starts[4]) == sorted(intel.starts[4])
+
+def test_ipv4_ranges_are_compact_arrays(intel):
+    assert intel.starts[4].typecode == intel.ends[4].typecode == "I"
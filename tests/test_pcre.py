@@ -0,0 +1,47 @@
+import pytest
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+def rule(options, sid=1):
+    return f'alert udp any any -> any any (msg:"pcre"; {options} sid:{sid};)'
+
+def test_identical_pcre_text_shares_one_pattern():
+    first = ids.compile_pcre("/cache-me\\d+/i")
+    assert ids.compile_pcre("/cache-me\\d+/i") is first
+    assert ids.compile_pcre("/cache-me\\d+/") is not first
+
+@pytest.mark.parametrize("source, payload, found", [
+    ("/user=(?<name>\\w+)&pass=\\k<name>/", b"user=bob&pass=bob", True),
+    ("/user=(?<name>\\w+)&pass=\\k<name>/", b"user=bob&pass=eve", False),
+    ("/id=[[:digit:]]+\\z/", b"id=42", True),
+    ("/id=[[:digit:]]+\\z/", b"id=42x", False),
+    ("/select.+from/i", b"SELECT * FROM t", True),
+    ("/a.b/s", b"a\nb", True),
+    ("/a.b/", b"a\nb", False),
+])
+def test_pcre_translation(source, payload, found):
+    assert ids.compile_pcre(source).search(payload) == found
+
+@pytest.mark.parametrize("options, payload, matches", [
+    ('content:"GET"; pcre:"/^ \\/admin/R";', b"GET /admin", True),
+    ('content:"GET"; pcre:"/^ \\/admin/R";', b"GET /index /admin", False),
+    ('pcre:"/admin/A";', b"admin page", True),
+    ('pcre:"/admin/A";', b"the admin page", False),
+    ('content:"GET"; pcre:!"/admin/";', b"GET /index", True),
+    ('content:"GET"; pcre:!"/admin/";', b"GET /admin", False),
+])
+def test_pcre_in_rules(ruleset, udp_packet, options, payload, matches):
+    assert alerted_sids(ruleset(rule(options)), [udp_packet(payload)]) == [[1] if matches else []]
+
+def test_pcre_only_runs_after_content_hits(ruleset, udp_packet):
+    rules = ruleset(rule('content:"login"; pcre:"/gated-\\d+/";'))
+    pattern = rules.rules[0].pcres[0][0]
+    before = pattern.evaluations
+    assert alerted_sids(rules, [udp_packet(b"nothing here gated-1")]) == [[]]
+    assert pattern.evaluations == before
+    assert alerted_sids(rules, [udp_packet(b"login gated-1")]) == [[1]]
+    assert pattern.evaluations == before + 1
+
+def test_untranslatable_pcre_skips_rule():
+    assert ids.compile_rule_lines([rule('content:"x"; pcre:"/(?<=a+)b/";')], {}) == ([], 1)
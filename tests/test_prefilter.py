@@ -0,0 +1,43 @@
+import random
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+def build(patterns):
+    prefilter = ids.ContentPrefilter()
+    for rule_id, pattern in enumerate(patterns):
+        prefilter.add(pattern, rule_id)
+    prefilter.build()
+    return prefilter
+
+def test_overlapping_and_nested_patterns():
+    prefilter = build([b"he", b"she", b"his", b"hers", b"xyz"])
+    assert prefilter.scan(b"ushers") == {0, 1, 3}
+    assert prefilter.scan(b"this") == {2}
+    assert prefilter.scan(b"") == set()
+    assert prefilter.max_length == 4
+
+def test_agrees_with_brute_force():
+    rng = random.Random(5)
+    alphabet = b"abc"
+    patterns = [bytes(rng.choice(alphabet) for _ in range(rng.randint(1, 5))) for _ in range(40)]
+    prefilter = build(patterns)
+    for _ in range(200):
+        data = bytes(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        expected = {rule_id for rule_id, pattern in enumerate(patterns) if pattern in data}
+        assert prefilter.scan(data) == expected
+
+def test_duplicate_patterns_report_every_rule():
+    assert build([b"dup", b"dup"]).scan(b"a dup") == {0, 1}
+
+def test_empty_prefilter_scans_nothing():
+    assert build([]).scan(b"anything") == set()
+
+def test_ruleset_prefilters_on_fast_pattern(ruleset, udp_packet):
+    rules = ruleset(
+        'alert udp any any -> any any (msg:"a"; content:"Alpha"; sid:1;)',
+        'alert udp any any -> any any (msg:"b"; content:"beta"; nocase; sid:2;)',
+        'alert udp any any -> any any (msg:"c"; dsize:>0; sid:3;)')
+    assert rules.prefilter.pattern_count == 2
+    # The prefilter is case-insensitive; the case-sensitive content is then verified
+    assert alerted_sids(rules, [udp_packet(b"alpha BETA"), udp_packet(b"Alpha")]) == [[2, 3], [1, 3]]
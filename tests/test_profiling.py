@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import ids_dashboard as ids
+
+WEB = 'alert tcp any any -> 10.0.0.2 80 (msg:"web"; content:"GET"; content:"attack"; sid:1;)'
+LAN = 'alert tcp any any -> 192.168.0.0/16 80 (msg:"lan"; content:"GET"; sid:2;)'
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(ids, "RULE_PROFILING", True)
+    monkeypatch.setattr(ids, "RULE_PROFILE", {})
+    return ids.RULE_PROFILE
+
+def test_counts_how_far_each_rule_got(profiling, ruleset, packet):
+    rules = ruleset(WEB, LAN)
+    for payload in (b"GET /", b"GET /attack", b"POST /"):
+        ids.match_packet(packet(payload=payload), rules)
+    web, lan = profiling[1].as_dict(), profiling[2].as_dict()
+    assert [web[key] for key in ("checks", "header_passes", "content_passes", "matches")] == [3, 3, 1, 1]
+    assert [lan[key] for key in ("checks", "header_passes", "matches")] == [3, 0, 0]
+    assert web["total_ms"] > 0 and web["avg_us"] > 0
+
+def test_profiling_off_records_nothing(monkeypatch, ruleset, packet):
+    monkeypatch.setattr(ids, "RULE_PROFILE", {})
+    assert ids.match_packet(packet(payload=b"GET /attack"), ruleset(WEB))
+    assert ids.RULE_PROFILE == {}
+
+def test_profiled_verdicts_match_unprofiled(profiling, ruleset, packet, monkeypatch):
+    rules = ruleset(WEB, LAN)
+    payloads = [b"GET /attack", b"GET /", b"attack"]
+    profiled = [ids.match_packet(packet(sport=5000 + n, payload=payload), rules)
+                for n, payload in enumerate(payloads)]
+    monkeypatch.setattr(ids, "RULE_PROFILING", False)
+    plain = [ids.match_packet(packet(sport=6000 + n, payload=payload), rules)
+             for n, payload in enumerate(payloads)]
+    sids = lambda results: [[alert["sid"] for alert in alerts] for alerts in results]
+    assert sids(profiled) == sids(plain) == [[1], [], []]
+
+def test_command_toggles_resets_and_dumps(monkeypatch, tmp_path, ruleset, packet):
+    monkeypatch.setattr(ids, "RULE_PROFILING", False)
+    monkeypatch.setattr(ids, "RULE_PROFILE", {})
+    ids.rule_profile_command("profile on")
+    assert ids.RULE_PROFILING
+    ids.match_packet(packet(payload=b"GET /attack"), ruleset(WEB, LAN))
+    path = tmp_path / "profile.json"
+    ids.rule_profile_command(f"profile dump {path} 1")
+    dump = json.loads(path.read_text())
+    assert dump["rules_profiled"] == 2 and len(dump["top"]) == 1
+    ids.rule_profile_command("profile reset")
+    ids.rule_profile_command("profile off")
+    assert ids.RULE_PROFILE == {} and not ids.RULE_PROFILING
+
+def test_top_orders_by_total_or_average(monkeypatch, ruleset):
+    cheap, costly = ruleset(WEB, LAN).rules
+    monkeypatch.setattr(ids, "RULE_PROFILE", {1: ids.RuleProfile(cheap), 2: ids.RuleProfile(costly)})
+    ids.RULE_PROFILE[1].checks, ids.RULE_PROFILE[1].total_time = 100, 0.5
+    ids.RULE_PROFILE[2].checks, ids.RULE_PROFILE[2].total_time = 1, 0.1
+    assert [entry.sid for entry in ids.rule_profile_top(key="total")] == [1, 2]
+    assert [entry.sid for entry in ids.rule_profile_top(key="avg")] == [2, 1]
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+import ids_dashboard as ids
+
+RULE = 'alert tcp any any -> any 80 (msg:"web"; content:"attack"; sid:{sid};)\n'
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "rules"
+    directory.mkdir()
+    (directory / "web.rules").write_text(RULE.format(sid=1))
+    monkeypatch.setattr(ids, "RULES_DIR", str(directory))
+    monkeypatch.setattr(ids, "RULE_VARS_FILE", str(directory / "snort.conf"))
+    monkeypatch.setattr(ids, "RULE_CACHE_DIR", str(tmp_path / "cache"))
+    return directory
+
+def reload(reloader):
+    assert reloader.request()
+    reloader.thread.join(5)
+    assert not reloader.thread.is_alive()
+
+def test_reload_swaps_in_edited_rules(rules_dir, packet):
+    reloader = ids.RuleReloader(ids.load_rules())
+    seen = []
+    reloader.listeners.append(seen.append)
+    (rules_dir / "web.rules").write_text(RULE.format(sid=1) + RULE.format(sid=2))
+    reload(reloader)
+    assert seen == [reloader.ruleset]
+    assert (reloader.reloads, reloader.failures) == (1, 0)
+    alerts = ids.match_packet(packet(payload=b"attack"), reloader.ruleset)
+    assert sorted(alert["sid"] for alert in alerts) == [1, 2]
+
+def test_failed_reload_keeps_the_old_rules(monkeypatch, ruleset):
+    old = ruleset(RULE.format(sid=1))
+    reloader = ids.RuleReloader(old)
+    seen = []
+    reloader.listeners.append(seen.append)
+    def broken():
+        raise OSError("rules directory vanished")
+    monkeypatch.setattr(ids, "load_rules", broken)
+    reload(reloader)
+    assert reloader.ruleset is old
+    assert (reloader.reloads, reloader.failures, seen) == (0, 1, [])
+
+def test_failing_listener_does_not_stop_the_others(monkeypatch, ruleset):
+    new = ruleset(RULE.format(sid=2))
+    monkeypatch.setattr(ids, "load_rules", lambda: new)
+    reloader = ids.RuleReloader()
+    seen = []
+    reloader.listeners.extend([lambda rules: 1 / 0, seen.append])
+    reload(reloader)
+    assert reloader.ruleset is new and seen == [new]
+
+def test_one_reload_at_a_time(monkeypatch, ruleset):
+    release = threading.Event()
+    new = ruleset(RULE.format(sid=2))
+    def slow():
+        release.wait(5)
+        return new
+    monkeypatch.setattr(ids, "load_rules", slow)
+    reloader = ids.RuleReloader()
+    assert reloader.request()
+    assert not reloader.request()
+    release.set()
+    reloader.thread.join(5)
+    assert (reloader.ruleset, reloader.reloads) == (new, 1)
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import ids_dashboard as ids
+
+WEB = 'alert tcp any any -> $HOME_NET 80 (msg:"web"; content:"attack"; sid:1;)\n'
+DNS = 'alert udp any any -> any 53 (msg:"dns"; content:"evil"; sid:2;)\n'
+
+@pytest.fixture
+def rules_tree(tmp_path, monkeypatch):
+    """A rules directory, variables file and cache directory of the test's own"""
+    rules_dir = tmp_path / "rules"
+    rules_dir.mkdir()
+    (rules_dir / "web.rules").write_text(WEB)
+    (rules_dir / "dns.rules").write_text(DNS)
+    (rules_dir / "snort.conf").write_text("ipvar HOME_NET any\n")
+    monkeypatch.setattr(ids, "RULES_DIR", str(rules_dir))
+    monkeypatch.setattr(ids, "RULE_VARS_FILE", str(rules_dir / "snort.conf"))
+    monkeypatch.setattr(ids, "RULE_CACHE_DIR", str(tmp_path / "cache"))
+    return rules_dir
+
+def cache_files(rules_tree):
+    cache_dir = rules_tree.parent / "cache"
+    return sorted(os.listdir(cache_dir)) if cache_dir.exists() else []
+
+def test_rule_cache_setting_is_read_at_call_time(rules_tree, monkeypatch):
+    monkeypatch.setattr(ids, "RULE_CACHE", False)
+    assert len(ids.load_rules()) == 2
+    assert cache_files(rules_tree) == []
+    monkeypatch.setattr(ids, "RULE_CACHE", True)
+    assert len(ids.load_rules()) == 2
+    assert cache_files(rules_tree)
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """The first rule line of every file load_rules actually compiles"""
+    calls = []
+    compile_rule_lines = ids.compile_rule_lines
+    def recording(lines, variables):
+        calls.append(lines[0])
+        return compile_rule_lines(lines, variables)
+    monkeypatch.setattr(ids, "compile_rule_lines", recording)
+    return calls
+
+def sids(rules):
+    return sorted(rule.sid for rule in rules.rules)
+
+def test_warm_load_comes_from_the_cache(rules_tree, compiled, packet):
+    cold = ids.load_rules(use_cache=True)
+    assert len(compiled) == 2
+    assert [name.split(".")[0] for name in cache_files(rules_tree)] == ["dns", "ruleset", "web"]
+    warm = ids.load_rules(use_cache=True)
+    assert len(compiled) == 2
+    assert sids(warm) == sids(cold) == [1, 2]
+    attack = packet(payload=b"attack")
+    assert [alert["sid"] for alert in ids.match_packet(attack, warm)] == [1]
+
+def test_editing_one_file_recompiles_only_that_file(rules_tree, compiled):
+    ids.load_rules(use_cache=True)
+    (rules_tree / "web.rules").write_text(WEB + WEB.replace("sid:1", "sid:3"))
+    compiled.clear()
+    assert sids(ids.load_rules(use_cache=True)) == [1, 2, 3]
+    assert compiled == [WEB.strip()]
+    assert len([name for name in cache_files(rules_tree) if name.startswith("web.")]) == 1
+
+def test_variables_change_the_key(rules_tree, compiled, packet):
+    ids.load_rules(use_cache=True)
+    (rules_tree / "snort.conf").write_text("ipvar HOME_NET 192.168.0.0/16\n")
+    compiled.clear()
+    rules = ids.load_rules(use_cache=True)
+    assert len(compiled) == 2
+    assert ids.match_packet(packet(dst="10.0.0.2", payload=b"attack"), rules) == []
+
+@pytest.mark.parametrize("setting", ["PORT_BUCKET_EXPAND_LIMIT", "BPF_MAX_PORT_RANGES", "ENGINE_VERSION"])
+def test_indexing_limits_invalidate_the_cache(rules_tree, compiled, monkeypatch, setting):
+    ids.load_rules(use_cache=True)
+    value = getattr(ids, setting)
+    monkeypatch.setattr(ids, setting, value + ".1" if isinstance(value, str) else value + 1)
+    compiled.clear()
+    ids.load_rules(use_cache=True)
+    assert len(compiled) == 2
+
+def test_unreadable_cache_is_recompiled(rules_tree, compiled):
+    ids.load_rules(use_cache=True)
+    for name in cache_files(rules_tree):
+        (rules_tree.parent / "cache" / name).write_bytes(b"not a pickle")
+    compiled.clear()
+    assert sids(ids.load_rules(use_cache=True)) == [1, 2]
+    assert len(compiled) == 2
@@ -0,0 +1,63 @@
+import random
+
+import ids_dashboard as ids
+
+def compile_rules(*headers):
+    lines = [f'alert {header} (msg:"r"; sid:{sid};)' for sid, header in enumerate(headers, 1)]
+    rules, skipped = ids.compile_rule_lines(lines, {})
+    assert not skipped
+    return rules
+
+def candidates(index, proto, sport, dport):
+    return sorted(rule_id for bucket in index.lookup(proto, sport, dport) for rule_id in bucket)
+
+def test_rules_are_filed_by_port_kind():
+    rules = compile_rules("tcp any any -> any [80,8080]", "tcp any 53 -> any any",
+                          "tcp any any -> any any", "udp any any -> any 53")
+    index = ids.RuleIndex(rules)
+    assert sorted(index.buckets) == [("tcp", "any", None), ("tcp", "dport", 80), ("tcp", "dport", 8080),
+                                     ("tcp", "sport", 53), ("udp", "dport", 53)]
+    assert candidates(index, "tcp", 4000, 80) == [0, 2]
+    assert candidates(index, "tcp", 53, 4000) == [1, 2]
+    assert candidates(index, "tcp", 4000, 443) == [2]
+    assert candidates(index, "udp", 4000, 53) == [3]
+    assert candidates(index, "icmp", None, None) == []
+
+def test_protocol_mapping():
+    rules = compile_rules("http any any -> any any", "dns any any -> any any", "ip any any -> any any")
+    index = ids.RuleIndex(rules)
+    assert candidates(index, "tcp", 1, 2) == [0, 1, 2]
+    assert candidates(index, "udp", 1, 2) == [1, 2]
+    assert candidates(index, "icmp", None, None) == [2]
+
+def test_bidirectional_and_wide_ranges_use_the_any_bucket():
+    rules = compile_rules("tcp any any <> any 80", "tcp any any -> any 1:60000")
+    index = ids.RuleIndex(rules)
+    assert list(index.buckets) == [("tcp", "any", None)]
+
+def test_lookup_never_misses_a_header_match():
+    rng = random.Random(2)
+    headers = []
+    for _ in range(60):
+        proto = rng.choice(["tcp", "udp", "icmp", "ip", "http", "dns"])
+        sport = rng.choice(["any", str(rng.randint(1, 100)), f"[{rng.randint(1, 50)}:{rng.randint(50, 100)}]"])
+        dport = rng.choice(["any", str(rng.randint(1, 100)), "!1:50"])
+        headers.append(f"{proto} any {sport} {rng.choice(['->', '<>'])} any {dport}")
+    rules = compile_rules(*headers)
+    index = ids.RuleIndex(rules)
+    for _ in range(500):
+        proto = rng.choice(["tcp", "udp"])
+        sport, dport = rng.randint(1, 100), rng.randint(1, 100)
+        found = set(candidates(index, proto, sport, dport))
+        for rule_id, rule in enumerate(rules):
+            if proto not in ids.rule_transports(rule.proto):
+                continue
+            forward = ids.header_matches(rule, 4, 1, sport, 2, dport)
+            backward = rule.direction == "<>" and ids.header_matches(rule, 4, 2, dport, 1, sport)
+            if forward or backward:
+                assert rule_id in found, (headers[rule_id], sport, dport)
+
+def test_bucket_sizes_reports_visits():
+    index = ids.RuleIndex(compile_rules("tcp any any -> any 80", "tcp any any -> any 80"))
+    index.lookup("tcp", 4000, 80)
+    assert index.bucket_sizes() == [("tcp", "dport", 80, 2, 1)]
@@ -0,0 +1,57 @@
+import pytest
+
+import ids_dashboard as ids
+
+LINE = ('alert TCP $HOME_NET any -> any [80,443] (msg:"web attack"; flow:to_server,established; '
+        'content:"evil"; nocase; dsize:>10; threshold:type limit, track by_dst, count 2, seconds 30; '
+        'classtype:web-application-attack; sid:1001; rev:3;)')
+
+def compile_one(line, variables=None):
+    rules, skipped = ids.compile_rule_lines([line], variables or {})
+    assert skipped == 0
+    return rules[0]
+
+def test_options_are_decoded_at_compile_time():
+    rule = compile_one(LINE, {"HOME_NET": "10.0.0.0/8"})
+    assert (rule.sid, rule.rev, rule.msg, rule.classtype) == (1001, 3, "web attack", "web-application-attack")
+    assert (rule.proto, rule.direction) == ("tcp", "->")
+    assert rule.flow == (True, True)
+    assert rule.dsize == (11, ids.sys.maxsize)
+    assert [c.pattern for c in rule.contents] == [b"evil"] and rule.contents[0].nocase
+    assert rule.fast_pattern == b"evil"
+    option = rule.thresholds[0]
+    assert (option.kind, option.track, option.count, option.seconds) == ("limit", "by_dst", 2, 30)
+    assert rule.sport_set is None and rule.dport_set.ports() == [80, 443]
+
+def test_compiled_rules_have_no_instance_dict():
+    rule = compile_one(LINE)
+    assert not hasattr(rule, "__dict__")
+    assert not hasattr(rule.contents[0], "__dict__")
+    with pytest.raises(AttributeError):
+        rule.unknown_option = 1
+
+def test_repeated_strings_are_interned():
+    first = compile_one(LINE)
+    second = compile_one(LINE.replace("sid:1001", "sid:1002"))
+    assert first.classtype is second.classtype and first.proto is second.proto
+
+@pytest.mark.parametrize("spec, expected", [
+    ("10", (10, 10)), ("=10", (10, 10)), (">10", (11, ids.sys.maxsize)), ("<10", (0, 9)),
+    (">=10", (10, ids.sys.maxsize)), ("<=10", (0, 10)), ("5<>10", (6, 9)), ("5<=>10", (5, 10)),
+])
+def test_dsize(spec, expected):
+    assert ids.compile_dsize(spec) == expected
+
+@pytest.mark.parametrize("spec, expected", [
+    ("established,to_server", (True, True)), ("from_server", (None, False)),
+    ("not_established", (False, None)), ("stateless", None),
+])
+def test_flow_option_parsing(spec, expected):
+    assert ids.compile_flow(spec) == expected
+
+def test_non_alert_and_malformed_lines():
+    lines = ["# alert tcp any any -> any any (sid:1;)", "", "drop tcp any any -> any any (sid:2;)",
+             "alert tcp any any (sid:3;)", 'alert tcp any any -> any any (msg:"ok"; sid:4;)']
+    rules, skipped = ids.compile_rule_lines(lines, {})
+    assert [rule.sid for rule in rules] == [4]
+    assert skipped == 1
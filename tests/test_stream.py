@@ -0,0 +1,66 @@
+import pytest
+
+import ids_dashboard as ids
+from conftest import alerted_sids
+
+ATTACK = 'alert tcp any any -> any any (msg:"attack"; content:"attack"; sid:1;)'
+
+@pytest.mark.parametrize("payloads, expected", [
+    ([b"xx att", b"ack yy"], [[], [1]]),
+    ([b"at", b"ta", b"ck"], [[], [], [1]]),
+    ([b"attack", b"benign", b"benign"], [[1], [], []]),
+])
+def test_match_spans_segments(ruleset, tcp_flow, payloads, expected):
+    assert alerted_sids(ruleset(ATTACK), tcp_flow(payloads)) == expected
+
+def test_each_new_occurrence_alerts(ruleset, tcp_flow):
+    payloads = [b"xx attack yy", b"zz", b"attack", b"no", b"at", b"tack"]
+    assert alerted_sids(ruleset(ATTACK), tcp_flow(payloads)) == [[1], [], [1], [], [], [1]]
+
+def test_split_match_needs_reassembly(ruleset, tcp_flow, monkeypatch):
+    monkeypatch.setattr(ids, "STREAM_REASSEMBLY", False)
+    assert alerted_sids(ruleset(ATTACK), tcp_flow([b"xx att", b"ack yy"])) == [[], []]
+
+def test_relative_contents_across_segments(ruleset, tcp_flow):
+    rules = ruleset('alert tcp any any -> any any (msg:"login"; content:"USER"; '
+                    'content:"PASS"; distance:0; sid:1;)')
+    assert alerted_sids(rules, tcp_flow([b"USER bob\r\n", b"PA", b"SS x"])) == [[], [], [1]]
+
+def test_pcre_across_segments(ruleset, tcp_flow):
+    rules = ruleset('alert tcp any any -> any any (msg:"pcre"; pcre:"/at+ack/"; sid:1;)')
+    assert alerted_sids(rules, tcp_flow([b"xx at", b"tack", b"zz", b"attack"])) == [[], [1], [], [1]]
+
+def test_out_of_order_segment_is_matched_once_filled(ruleset, tcp_flow):
+    opening, first, second = tcp_flow([b"hello ", b"xx att", b"ack yy"])
+    assert alerted_sids(ruleset(ATTACK), [opening, second, first]) == [[], [], [1]]
+
+def test_retransmission_does_not_realert(ruleset, tcp_flow):
+    packets = tcp_flow([b"attack"]) * 2
+    assert alerted_sids(ruleset(ATTACK), packets) == [[1], []]
+
+def test_flows_are_reassembled_separately(ruleset, tcp_flow):
+    client_a = tcp_flow([b"xx att"], sport=4000)
+    client_b = tcp_flow([b"ack yy"], sport=4001, seq=1006)
+    assert alerted_sids(ruleset(ATTACK), client_a + client_b) == [[], []]
+
+def test_flowbits_follow_stream_order(ruleset, tcp_flow):
+    rules = ruleset(
+        'alert tcp any any -> any any (msg:"login"; content:"LOGIN"; flowbits:set,auth; flowbits:noalert; sid:2;)',
+        'alert tcp any any -> any any (msg:"pass"; content:"PASS"; flowbits:isset,auth; sid:3;)')
+    payloads = [b"PASS x", b"LOGIN y", b"zz", b"PASS again"]
+    assert alerted_sids(rules, tcp_flow(payloads)) == [[], [], [], [3]]
+
+def test_relative_pcre_on_growing_stream(ruleset, tcp_flow):
+    rules = ruleset('alert tcp any any -> any any (msg:"r"; content:"GET"; pcre:"/^ \\/adm/R"; sid:1;)')
+    assert alerted_sids(rules, tcp_flow([b"GET /ad", b"min", b"more"])) == [[], [1], []]
+
+@pytest.mark.parametrize("gap, expected", [(16, []), (ids.STREAM_PCRE_OVERLAP + 16, [1])])
+def test_negated_pcre_only_scans_the_overlap_window(ruleset, tcp_flow, gap, expected):
+    rules = ruleset('alert tcp any any -> any any (msg:"n"; content:"GET"; pcre:!"/forbidden/"; sid:1;)')
+    packets = tcp_flow([b"forbidden" + b"." * gap, b"GET /"])
+    assert alerted_sids(rules, packets) == [[], expected]
+
+def test_negated_content_only_scans_new_bytes(ruleset, tcp_flow):
+    rules = ruleset('alert tcp any any -> any any (msg:"n"; content:"GET"; content:!"admin"; sid:1;)')
+    packets = tcp_flow([b"admin ", b"GET /", b"GET /ad", b"min"])
+    assert alerted_sids(rules, packets) == [[], [1], [1], []]
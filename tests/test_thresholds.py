@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import alerted_sids
+
+def rule(options, sid=1):
+    return f'alert udp any any -> any any (msg:"hit"; content:"hit"; {options} sid:{sid};)'
+
+def alerting_hits(rules, packets):
+    """1-based positions of the packets that alerted"""
+    return [hit for hit, sids in enumerate(alerted_sids(rules, packets), 1) if sids]
+
+@pytest.mark.parametrize("options, hits, expected", [
+    ("threshold:type limit, track by_src, count 2, seconds 60;", 5, [1, 2]),
+    ("threshold:type threshold, track by_src, count 3, seconds 60;", 7, [3, 6]),
+    ("threshold:type both, track by_src, count 3, seconds 60;", 7, [3]),
+    ("threshold:type backoff, track by_flow, count 1, multiplier 2;", 10, [1, 2, 4, 8]),
+    ("threshold:type backoff, track by_rule, count 1, multiplier 3;", 10, [1, 3, 9]),
+    ("detection_filter:track by_src, count 3, seconds 60;", 6, [4, 5, 6]),
+])
+def test_threshold_counts(ruleset, udp_packet, options, hits, expected):
+    packets = [udp_packet(b"hit", 1000.0 + i) for i in range(hits)]
+    assert alerting_hits(ruleset(rule(options)), packets) == expected
+
+def test_window_restarts_after_seconds(ruleset, udp_packet):
+    rules = ruleset(rule("threshold:type limit, track by_src, count 1, seconds 10;"))
+    packets = [udp_packet(b"hit", timestamp) for timestamp in (1000.0, 1005.0, 1011.0, 1012.0)]
+    assert alerting_hits(rules, packets) == [1, 3]
+
+def test_tracked_per_source(ruleset, udp_packet):
+    rules = ruleset(rule("threshold:type limit, track by_src, count 1, seconds 60;"))
+    packets = [udp_packet(b"hit", 1000.0 + i, src) for i, src in enumerate(["10.0.0.1", "10.0.0.3"] * 2)]
+    assert alerting_hits(rules, packets) == [1, 2]
+
+def test_every_option_counts_each_match(ruleset, udp_packet):
+    # The threshold must count the matches detection_filter still holds back
+    rules = ruleset(rule("detection_filter:track by_src, count 1, seconds 60; "
+                         "threshold:type threshold, track by_src, count 2, seconds 60;"))
+    packets = [udp_packet(b"hit", 1000.0 + i) for i in range(6)]
+    assert alerting_hits(rules, packets) == [2, 4, 6]
+
+def test_state_survives_rule_reload(ruleset, udp_packet):
+    line = rule("threshold:type limit, track by_src, count 1, seconds 60;")
+    assert alerting_hits(ruleset(line), [udp_packet(b"hit", 1000.0)]) == [1]
+    assert alerting_hits(ruleset(line), [udp_packet(b"hit", 1001.0)]) == []
+
+def test_sids_tracked_separately(ruleset, udp_packet):
+    options = "threshold:type limit, track by_src, count 1, seconds 60;"
+    rules = ruleset(rule(options, sid=1), rule(options, sid=2))
+    assert alerted_sids(rules, [udp_packet(b"hit", 1000.0), udp_packet(b"hit", 1001.0)]) == [[1, 2], []]
@@ -0,0 +1,87 @@
+import math
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import ids_dashboard as ids
+
+def zipf_traffic(count, hosts=500, seed=1):
+    """(src, dst, length) records where a few sources send most packets"""
+    rng = random.Random(seed)
+    weights = [1 / rank ** 1.2 for rank in range(1, hosts + 1)]
+    sources = rng.choices([f"10.0.{n // 256}.{n % 256}" for n in range(hosts)], weights, k=count)
+    return [SimpleNamespace(src=src, dst=f"192.168.0.{rng.randint(1, 20)}", length=rng.randint(60, 1500))
+            for src in sources]
+
+def test_sketch_never_undercounts_and_stays_within_the_bound():
+    rng = random.Random(2)
+    keys = np.array([rng.getrandbits(64) for _ in range(2000)], dtype=np.uint64)
+    amounts = np.array([rng.randint(1, 50) for _ in keys], dtype=np.int64)
+    sketch = ids.CountMinSketch(width=512, depth=4)
+    for start in range(0, len(keys), 100):
+        sketch.add(keys[start:start + 100], amounts[start:start + 100])
+    estimates = sketch.estimate(keys)
+    assert sketch.total == amounts.sum()
+    assert (estimates >= amounts).all()
+    within = estimates - amounts <= math.e / sketch.width * sketch.total
+    assert within.mean() >= 1 - math.e ** -sketch.depth
+
+@pytest.mark.parametrize("metric", ["packets", "bytes"])
+def test_heavy_hitters_match_exact_counts(metric):
+    traffic = zipf_traffic(20000)
+    talkers = ids.TopTalkers(k=10, width=1024, depth=4, batch_size=256)
+    for info in traffic:
+        talkers.observe(info)
+    exact = Counter()
+    for info in traffic:
+        exact[info.src] += 1 if metric == "packets" else info.length
+    top = talkers.top("src", metric, 5)
+    assert [key for key, _ in top] == [key for key, _ in exact.most_common(5)]
+    bound = math.e / 1024 * sum(exact.values())
+    for key, estimate in top:
+        assert exact[key] <= estimate <= exact[key] + bound
+
+def test_pairs_and_destinations_are_tracked():
+    talkers = ids.TopTalkers(k=3)
+    for n in range(10):
+        talkers.observe(SimpleNamespace(src="10.0.0.1", dst="10.0.0.2", length=100))
+    talkers.observe(SimpleNamespace(src="10.0.0.3", dst="10.0.0.2", length=5000))
+    assert talkers.top("dst", "packets") == [("10.0.0.2", 11)]
+    assert talkers.top("pair", "bytes") == [(("10.0.0.3", "10.0.0.2"), 5000), (("10.0.0.1", "10.0.0.2"), 1000)]
+
+def test_heavy_hitters_keep_only_k():
+    hitters = ids.HeavyHitters(k=3)
+    for key, count in [("a", 5), ("b", 1), ("c", 3), ("d", 2), ("b", 9), ("e", 1)]:
+        hitters.offer(key, count)
+    assert hitters.top() == [("b", 9), ("a", 5), ("c", 3)]
+    assert hitters.threshold() == 3
+
+def test_snapshot_reports_totals_and_error_bound():
+    talkers = ids.TopTalkers(k=5, width=256)
+    for info in zipf_traffic(1000, hosts=50):
+        talkers.observe(info)
+    snapshot = talkers.snapshot(3)
+    assert snapshot["totals"]["packets"] == 1000
+    assert snapshot["max_error"]["packets"] == pytest.approx(math.e / 256 * 1000)
+    assert len(snapshot["src"]["packets"]) == 3
+    assert " -> " in snapshot["pair"]["bytes"][0]["key"]
+
+def test_merge_sums_worker_snapshots():
+    workers = []
+    for seed in (1, 2):
+        talkers = ids.TopTalkers(k=5)
+        for info in zipf_traffic(500, hosts=20, seed=seed):
+            talkers.observe(info)
+        workers.append(talkers.snapshot())
+    merged = ids.merge_top_talker_snapshots(workers + [None], k=5)
+    assert merged["workers"] == 2
+    assert merged["totals"]["packets"] == 1000
+    expected = Counter()
+    for snapshot in workers:
+        for entry in snapshot["src"]["packets"]:
+            expected[entry["key"]] += entry["estimate"]
+    assert [(entry["key"], entry["estimate"]) for entry in merged["src"]["packets"]] == expected.most_common(5)
+    assert ids.merge_top_talker_snapshots([None, {}]) is None
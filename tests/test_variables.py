@@ -0,0 +1,63 @@
+import ipaddress
+
+import pytest
+
+import ids_dashboard as ids
+
+def address(text):
+    parsed = ipaddress.ip_address(text)
+    return int(parsed), parsed.version
+
+def test_load_rule_variables(tmp_path):
+    conf = tmp_path / "snort.conf"
+    conf.write_text("# comment\nipvar HOME_NET [10.0.0.0/8,192.168.0.0/16]\n"
+                    "portvar HTTP_PORTS [80,8080]\nvar RULE_PATH ../rules\ninclude x.rules\n")
+    assert ids.load_rule_variables(str(conf)) == {
+        "HOME_NET": "[10.0.0.0/8,192.168.0.0/16]", "HTTP_PORTS": "[80,8080]", "RULE_PATH": "../rules"}
+
+def test_resolve_nested_and_undefined_variables():
+    variables = {"HOME_NET": "[10.0.0.0/8]", "DNS_SERVERS": "$HOME_NET"}
+    assert ids.resolve_variables("$DNS_SERVERS", variables) == "[10.0.0.0/8]"
+    assert ids.resolve_variables("$NOT_DEFINED", variables) == "any"
+
+def test_address_group_cidr_and_negation():
+    variables = {"HOME_NET": "[10.0.0.0/8,!10.1.0.0/16]"}
+    home = ids.compile_address_group("$HOME_NET", variables)
+    assert home.contains(*address("10.2.3.4"))
+    assert not home.contains(*address("10.1.2.3"))
+    assert not home.contains(*address("192.168.1.1"))
+    external = ids.compile_address_group("!$HOME_NET", variables)
+    assert external.contains(*address("192.168.1.1"))
+    assert external.contains(*address("10.1.2.3"))
+    assert not external.contains(*address("10.2.3.4"))
+    assert external.contains(*address("2001:db8::1"))
+
+def test_any_compiles_to_no_constraint():
+    assert ids.compile_address_group("any", {}) is None
+    assert ids.compile_address_group("$HOME_NET", {"HOME_NET": "any"}) is None
+    assert ids.compile_port_group("$HTTP_PORTS", {"HTTP_PORTS": "any"}) is None
+
+@pytest.mark.parametrize("src", ["!any", "!$HOME_NET", "[!$HOME_NET]"])
+def test_negated_any_address_skips_rule(src):
+    line = f'alert tcp {src} any -> any any (msg:"dead"; content:"x"; sid:1;)'
+    assert ids.compile_rule_lines([line], {"HOME_NET": "any"}) == ([], 1)
+
+def test_negated_any_port_skips_rule():
+    line = 'alert tcp any !any -> any any (msg:"dead"; content:"x"; sid:1;)'
+    assert ids.compile_rule_lines([line], {}) == ([], 1)
+
+def test_port_group_ranges_and_negation():
+    ports = ids.compile_port_group("[$HTTP_PORTS,1000:1999,!1500]", {"HTTP_PORTS": "[80,8080]"})
+    assert ports.count == 1001
+    assert ports.contains(80) and ports.contains(1999) and ports.contains(8080)
+    assert not ports.contains(1500) and not ports.contains(443)
+    assert ports.ranges() == [(80, 80), (1000, 1499), (1501, 1999), (8080, 8080)]
+    assert ids.compile_port_group("!1:65535", {}).ranges() == [(0, 0)]
+
+def test_rule_header_uses_resolved_variables(ruleset, udp_packet):
+    rules, skipped = ids.compile_rule_lines(
+        ['alert udp $HOME_NET any -> any $DNS_PORTS (msg:"x"; content:"abc"; sid:1;)'],
+        {"HOME_NET": "10.0.0.0/24", "DNS_PORTS": "9000"})
+    rules = ids.RuleSet(rules)
+    assert [a["sid"] for a in ids.match_packet(udp_packet(b"abc"), rules)] == [1]
+    assert ids.match_packet(udp_packet(b"abc", src="10.0.1.1"), rules) == []
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+import ids_dashboard as ids
+
+ATTACK = 'alert tcp any any -> any 80 (msg:"attack"; content:"attack"; sid:1;)'
+
+@pytest.mark.parametrize("cmd, expected", [
+    ("ids", True), ("start ids", True), ("Start IDS --pcap x.pcap", True), ("ids --workers 2", True),
+    ("idsx", False), ("start", False), ("stats", False),
+])
+def test_is_ids_command(cmd, expected):
+    assert ids.is_ids_command(cmd) == expected
+
+def test_start_ids_passes_options():
+    args = ids.parse_ids_args("start ids --pcap Capture.pcap --workers 2 --backend afpacket --ring")
+    assert (args.pcap, args.workers, args.backend, args.ring) == ("Capture.pcap", 2, "afpacket", True)
+    assert ids.parse_ids_args("ids --loop 3").loop == 3
+    assert ids.parse_ids_args("ids --backend nope") is None
+
+def test_flow_shard_is_direction_independent(tcp_flow):
+    forward = tcp_flow([b"x"])[0]
+    reply = ids.PacketInfo.from_frame(forward.raw, 0.0, "ether")
+    reply.src, reply.dst, reply.sport, reply.dport = forward.dst, forward.src, forward.dport, forward.sport
+    for shards in (2, 3, 8):
+        assert ids.flow_shard(forward, shards) == ids.flow_shard(reply, shards)
+
+def test_worker_pool_matches_and_merges_alerts(ruleset, tcp_flow):
+    pool = ids.WorkerPool(ruleset(ATTACK), 2)
+    pool.start()
+    try:
+        for packet in tcp_flow([b"an attack"]) + tcp_flow([b"benign"], sport=4001):
+            pool.dispatch(packet)
+        alerts = []
+        deadline = time.time() + 10
+        while not alerts and time.time() < deadline:
+            alerts = pool.next_alerts(timeout=0.5)
+        assert [alert["sid"] for alert in alerts] == [1]
+        assert sum(pool.dispatched) == 2 and sum(pool.dropped) == 0
+    finally:
+        pool.stop()
+    assert pool.processes == []
+
+class IdleSniffer:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+def test_worker_session_clears_the_pool(ruleset, monkeypatch):
+    monkeypatch.setattr(ids, "make_sniffer", lambda *args, **kwargs: IdleSniffer())
+    monkeypatch.setattr(ids, "export_top_talkers_due", lambda now: None)
+
+    async def session():
+        task = asyncio.ensure_future(ids.async_ids_workers(ruleset(ATTACK), 1))
+        await asyncio.sleep(0.2)
+        assert ids.WORKER_POOL is not None
+        task.cancel()
+        await task
+
+    asyncio.run(session())
+    assert ids.WORKER_POOL is None
+    assert ids.RULE_RELOADER.listeners == []
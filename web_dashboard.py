@@ -19,6 +19,7 @@ app.config['SECRET_KEY'] = 'netwatch-v2-secret-key'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Global data storage
+TOP_TALKERS_FILE = os.path.join('data', 'top_talkers.json')  # written by the IDS engine
 ALERTS_DATA = []
 THREAT_STATS = {
     'total_alerts': 0,
@@ -270,6 +271,23 @@ def get_protocol_stats():
     
     return jsonify(protocols)
 
+@app.route('/api/top-talkers')
+def get_top_talkers():
+    """Get the top sources, destinations and pairs exported by the IDS engine"""
+    if not os.path.exists(TOP_TALKERS_FILE):
+        return jsonify({'error': 'No top talkers exported yet'}), 404
+    
+    with open(TOP_TALKERS_FILE) as f:
+        top_talkers = json.load(f)
+    
+    limit = request.args.get('limit', type=int)
+    if limit:
+        for dimension in ('src', 'dst', 'pair'):
+            for metric, entries in top_talkers.get(dimension, {}).items():
+                top_talkers[dimension][metric] = entries[:limit]
+    
+    return jsonify(top_talkers)
+
 @app.route('/api/geo-threats')
 def get_geo_threats():
     """Get geographic threat data"""